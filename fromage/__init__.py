@@ -8,6 +8,7 @@ ONIOM calculations with different levels of sophistication in the embedding.
 """
 from fromage.utils.mol import make_mol
 from fromage.utils.dimer import make_dimer
+from fromage.utils.crystal import make_crystal
 from fromage.io.read_file import mol_from_file
 from fromage.io.read_file import dimer_from_file
 from fromage.io.read_file import read_vectors
@@ -2,6 +2,10 @@
 
 import numpy as np
 from random import randint
+from fromage.utils.lattice import get_lattice
+
+# lines of cube file values formatted in one go
+_cube_block_lines = 1 << 16
 
 
 def write_cp2k(in_name, file_name, vectors, atoms, temp_name):
@@ -118,20 +122,14 @@ def write_uc(in_name, vectors, aN, bN, cN, atoms):
     out_file.write("{:10.6f} {:10.6f} {:10.6f} {:10d}".format(*line2) + "\n")
     out_file.write("{:10.6f} {:10.6f} {:10.6f} {:10d}".format(*line3) + "\n")
 
-    # transpose to get the transformation matrix
-    M = np.transpose(vectors)
-    # inverse transformation matrix
-    U = np.linalg.inv(M)
+    # change of basis transformation for all atoms at once
+    positions = np.array([atom.get_pos() for atom in atoms]).reshape(-1, 3)
+    frac_arr = get_lattice(vectors).to_frac(positions)
+    # translate the coordinates out of range to the range [0,1]
+    out_range = (frac_arr < 0) | (frac_arr > 1)
+    frac_arr[out_range] %= 1
 
-    for atom in atoms:
-        # change of basis transformation
-        dir_pos = [atom.x, atom.y, atom.z]
-        frac_pos = np.dot(U, dir_pos).tolist()
-        for coord in frac_pos:
-            # if the coordinate is out of range
-            if coord < 0 or coord > 1:
-                # translate it to the range [0,1]
-                frac_pos[frac_pos.index(coord)] = coord % 1
+    for atom, frac_pos in zip(atoms, frac_arr.tolist()):
         str_line = "{:10.6f} {:10.6f} {:10.6f} {:14.10f} {:>6}".format(
             *frac_pos + [atom.q] + [atom.elem]) + "\n"
         out_file.write(str_line)
@@ -444,31 +442,35 @@ def write_cube(in_name, origin, vectors, x_num, y_num, z_num, atoms, vals, comme
     """
     bohrconv = 1.88973
 
-    out_file = open(in_name, "w")
-
-    # Header
-    out_file.write("Cube file generated by fromage, units in Angstrom\n")
-    out_file.write(comment + "\n")
-    orig_line = "{:6d} {:10.6f} {:10.6f} {:10.6f}\n".format(
-        len(atoms), origin[0] * bohrconv, origin[1] * bohrconv, origin[2] * bohrconv)
-    out_file.write(orig_line)
-
-    nums = [x_num, y_num, z_num]
-    xyz_lines = ["{:6d} {:10.6f} {:10.6f} {:10.6f}\n".format(
-        nums[i], vectors[i][0] * bohrconv, vectors[i][1] * bohrconv, vectors[i][2] * bohrconv) for i in list(range(3))]
-    out_file.write(xyz_lines[0] + xyz_lines[1] + xyz_lines[2])
-
-    # Atoms
-    for atom in atoms:
-        atom_line = "{:3d}{:10.6f}{:10.6f}{:10.6f}{:10.6f}\n".format(
-            atom.at_num, atom.at_num, atom.x * bohrconv, atom.y * bohrconv, atom.z * bohrconv)
-        out_file.write(atom_line)
-
-    # Values
-    for i, val in enumerate(vals):
-        out_file.write("{:10.6f}".format(val))
-        if (i + 1) % 6 == 0:
-            out_file.write("\n")
+    with open(in_name, "w") as out_file:
+        # Header
+        out_file.write("Cube file generated by fromage, units in Angstrom\n")
+        out_file.write(comment + "\n")
+        orig_line = "{:6d} {:10.6f} {:10.6f} {:10.6f}\n".format(
+            len(atoms), origin[0] * bohrconv, origin[1] * bohrconv, origin[2] * bohrconv)
+        out_file.write(orig_line)
+
+        nums = [x_num, y_num, z_num]
+        xyz_lines = ["{:6d} {:10.6f} {:10.6f} {:10.6f}\n".format(
+            nums[i], vectors[i][0] * bohrconv, vectors[i][1] * bohrconv, vectors[i][2] * bohrconv) for i in list(range(3))]
+        out_file.write(xyz_lines[0] + xyz_lines[1] + xyz_lines[2])
+
+        # Atoms
+        for atom in atoms:
+            atom_line = "{:3d}{:10.6f}{:10.6f}{:10.6f}{:10.6f}\n".format(
+                atom.at_num, atom.at_num, atom.x * bohrconv, atom.y * bohrconv, atom.z * bohrconv)
+            out_file.write(atom_line)
+
+        # Values, six per line and formatted a block of lines at a time
+        vals = np.asarray(vals, dtype=float).reshape(-1)
+        n_full = len(vals) // 6 * 6
+        block = _cube_block_lines * 6
+        for start in range(0, n_full, block):
+            chunk = vals[start:min(start + block, n_full)]
+            line_fmt = "{:10.6f}" * 6 + "\n"
+            out_file.write((line_fmt * (len(chunk) // 6)).format(*chunk.tolist()))
+        rest = vals[n_full:]
+        out_file.write(("{:10.6f}" * len(rest)).format(*rest.tolist()))
 
     return
 
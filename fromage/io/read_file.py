@@ -4,6 +4,7 @@ When it comes to energy and gradient values, the units generally
 the same as in the file being read. Keep further unit conversion
 outside of this file for clarity.
 """
+import os
 import numpy as np
 import fromage.utils.per_table as pt
 
@@ -11,7 +12,8 @@ from fromage.utils.mol import Mol
 from fromage.utils import per_table as per
 from fromage.utils.atom import Atom
 from fromage.utils.dimer import Dimer
-from fromage.utils.volume import CubeGrid
+from fromage.utils.volume import CubeGrid, ImplicitCubeGrid
+from fromage.io.trajectory import iter_xyz, XYZTrajectory
 
 
 def read_vasp(in_name):
@@ -76,7 +78,9 @@ def read_xyz(in_name):
     Read a .xyz file.
 
     Works for files containing several configurations e.g. a relaxation
-    trajectory.
+    trajectory. The frames are read one at a time with trajectory.iter_xyz,
+    which is also the way to go through large files without making Atom
+    objects.
 
     Parameters
     ----------
@@ -88,32 +92,21 @@ def read_xyz(in_name):
         Each element of the list represents a configuration of atoms
 
     """
-    with open(in_name) as xyz_file:
-        xyz_content = xyz_file.readlines()
-
     # main list where each element is a relaxation step
     atom_step = []
+    for elems, coords in iter_xyz(in_name):
+        atom_step.append([Atom(elem, *pos) for elem, pos in zip(elems, coords.tolist())])
 
-    for i, line in enumerate(xyz_content):
-
-        # if the line is the amount of atoms in the system
-        if line.strip():
-            if line.split()[0].isdigit():
-
-                # list of atom objects inside on relaxation step
-                atoms = []
-
-                # from 2 lines after the amount of atoms to the last atom line
-                # for the relaxation step
-                for line_in_step in xyz_content[i + 2:i + int(line) + 2]:
-                    elemAtom = line_in_step.split()[0]
-                    xAtom, yAtom, zAtom = map(float, line_in_step.split()[1:])
-                    atoms.append(Atom(elemAtom, xAtom, yAtom, zAtom))
+    return atom_step
 
-                atom_step.append(atoms)
 
-    xyz_file.close()
-    return atom_step
+def _last_xyz_frame(in_name):
+    """Return the elements and coordinates of the last frame of a .xyz file"""
+    # only the last frame is parsed
+    with XYZTrajectory(in_name, persist=False) as traj:
+        if len(traj) == 0:
+            raise ValueError("No atomic positions in " + in_name)
+        return traj[-1]
 
 
 def read_pos(in_name):
@@ -135,7 +128,8 @@ def read_pos(in_name):
         The last or only set of atomic positions in the file
 
     """
-    atoms = read_xyz(in_name)[-1]
+    elems, coords = _last_xyz_frame(in_name)
+    atoms = [Atom(elem, *pos) for elem, pos in zip(elems, coords.tolist())]
 
     return atoms
 
@@ -159,7 +153,8 @@ def mol_from_file(in_name, bonding='', vectors=np.zeros((3, 3))):
         The atomic positions in the file as a Mol object
 
     """
-    mol = Mol(read_pos(in_name))
+    # straight from the arrays, without Atom objects
+    mol = Mol.from_arrays(*_last_xyz_frame(in_name))
     mol.vectors = vectors
     mol.set_bonding_str(bonding)
 
@@ -901,59 +896,88 @@ def read_vectors(in_file):
     return vectors
 
 
-def read_cube(in_file):
+def read_cube(in_file, cache=False, implicit=False):
     """
     Read a cube file and return a Mol and a CubeGrid object
 
+    The values of the grid are read in one go from the text after the atoms.
+    With cache=True they are also saved in binary next to the cube file, named
+    after it with the extension .npy, and later reads of the same file load
+    that file memory mapped instead of parsing the text again. The cache is
+    ignored if it is older than the cube file or does not have its shape.
+
+    With implicit=True the grid is an ImplicitCubeGrid which keeps the values
+    and no coordinates.
+
     Parameters
     ----------
     in_file : str
         Input file name
+    cache : bool (optional)
+        Use and make a .npy file of the values. Default False
+    implicit : bool (optional)
+        Return an ImplicitCubeGrid. Default False
     Returns
     -------
+    out_cub : CubeGrid or ImplicitCubeGrid object
+        The grid in the cube file where all distances are in Angstrom
     out_mol : Mol object
         The atoms in the cube file
-    out_cub : CubeGrid object
-        The grid in the cube file where all distances are in Angstrom
 
     """
     vectors = np.zeros((3, 3))
     xyz_nums = [0, 0, 0]
-    values = []
-
-    out_mol = Mol([])
-    ind = 0
-    natoms = 0
-    with open(in_file) as lines:
-        for line in lines:
-            if ind == 2:
-                natoms = int(line.split()[0])
-                origin = np.array([float(i)
-                                   for i in line.split()[1:]]) / pt.bohrconv
-            if ind == 3:
-                xyz_nums[0] = int(line.split()[0])
-                vectors[0] = np.array([float(i)
-                                       for i in line.split()[1:]]) / pt.bohrconv
-            if ind == 4:
-                xyz_nums[1] = int(line.split()[0])
-                vectors[1] = np.array([float(i)
-                                       for i in line.split()[1:]]) / pt.bohrconv
-            if ind == 5:
-                xyz_nums[2] = int(line.split()[0])
-                vectors[2] = np.array([float(i)
-                                       for i in line.split()[1:]]) / pt.bohrconv
-                out_cub = CubeGrid(vectors, xyz_nums[0], xyz_nums[
-                                   1], xyz_nums[2], origin)
-                out_cub.set_grid_coord()
-            if 6 <= ind < (6 + natoms):
-                line_s = line.split()
-                new_atom = Atom()
-                new_atom.elem = per.num_to_elem(int(line_s[0]))
-                new_atom.set_pos([float(i) / pt.bohrconv for i in line_s[2:]])
-                out_mol.append(new_atom)
-            if ind >= (6 + natoms):
-                values.extend([float(i) for i in line.split()])
-            ind += 1
-    values_arr = np.array(values)
-    out_cub.grid[:, 3] = values_arr
+    with open(in_file) as cube_file:
+        # two comment lines
+        cube_file.readline()
+        cube_file.readline()
+        line_s = cube_file.readline().split()
+        natoms = int(line_s[0])
+        origin = np.array([float(i) for i in line_s[1:4]]) / pt.bohrconv
+        for i in range(3):
+            line_s = cube_file.readline().split()
+            xyz_nums[i] = int(line_s[0])
+            vectors[i] = np.array([float(j) for j in line_s[1:4]]) / pt.bohrconv
+        elems, coords = [], []
+        for i in range(natoms):
+            line_s = cube_file.readline().split()
+            elems.append(per.num_to_elem(int(line_s[0])))
+            coords.append([float(j) / pt.bohrconv for j in line_s[2:5]])
+        out_mol = Mol.from_arrays(elems, coords)
+        cache_name = in_file + ".npy"
+        values = _load_cube_cache(in_file, cache_name, xyz_nums) if cache else None
+        if values is None:
+            try:
+                values = np.array(cube_file.read().split(), dtype=float)
+            except ValueError as err:
+                raise ValueError("Unreadable value in " + in_file + ": " + str(err))
+            if len(values) != np.prod(xyz_nums):
+                raise ValueError("Expected " + str(np.prod(xyz_nums)) + " values in " +
+                                 in_file + " but found " + str(len(values)))
+            if cache:
+                try:
+                    np.save(cache_name, values.reshape(xyz_nums))
+                except OSError:
+                    pass
+    if implicit:
+        out_cub = ImplicitCubeGrid(vectors, xyz_nums[0], xyz_nums[1], xyz_nums[2], origin)
+        # copy on write if the values are memory mapped
+        out_cub.values = values.reshape(xyz_nums)
+    else:
+        out_cub = CubeGrid(vectors, xyz_nums[0], xyz_nums[1], xyz_nums[2], origin)
+        out_cub.set_grid_coord()
+        out_cub.grid[:, 3] = values.reshape(-1)
     return out_cub, out_mol
+
+
+def _load_cube_cache(in_file, cache_name, xyz_nums):
+    """Return the memory mapped values saved for a cube file, or None"""
+    try:
+        if os.stat(cache_name).st_mtime_ns < os.stat(in_file).st_mtime_ns:
+            return None
+        values = np.load(cache_name, mmap_mode="c")
+    except (OSError, ValueError):
+        return None
+    if values.shape != tuple(xyz_nums):
+        return None
+    return values
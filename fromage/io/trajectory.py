@@ -0,0 +1,256 @@
+"""Streaming and random access reading of multi-frame .xyz files
+
+Optimisations and molecular dynamics produce .xyz files with many frames which
+can be too large to read at once. iter_xyz goes through the frames of a file
+one at a time and XYZTrajectory gives access to any frame by its number through
+an index of where each frame starts in the file, which can be kept next to it
+for the next time. In both cases the frames are NumPy arrays and no Atom
+objects are made.
+
+"""
+import mmap
+import os
+import numpy as np
+
+# bytes of the file looked at in one go when indexing its lines
+_chunk_size = 1 << 26
+
+
+def _uniform_columns(lines, n_at):
+    """Return True if lines has n_at non blank lines with the same number of columns"""
+    buf = np.frombuffer(lines, dtype=np.uint8)
+    # the whitespace of bytes.split
+    space = np.isin(buf, np.frombuffer(b" \t\n\r\x0b\x0c", dtype=np.uint8))
+    token_starts = ~space
+    token_starts[1:] &= space[:-1]
+    line_of_byte = np.cumsum(buf == ord("\n"))
+    columns = np.bincount(line_of_byte[token_starts])
+    columns = columns[columns > 0]
+    return len(columns) == n_at and np.all(columns == columns[0])
+
+
+def _header_atoms(line):
+    """Return the number of atoms of a frame header line, or None if it is not one"""
+    tokens = line.split()
+    if tokens and tokens[0].isdigit():
+        return int(tokens[0])
+    return None
+
+
+def _parse_frame(lines, n_at):
+    """
+    Return the elements and coordinates of the atom lines of a frame
+
+    Parameters
+    ----------
+    lines : bytes
+        The n_at atom lines of the frame
+    n_at : int
+        The number of atoms of the frame
+    Returns
+    -------
+    elems : list of str
+        Element symbol of each atom
+    coords : n_at x 3 numpy array
+        Cartesian coordinates of each atom
+
+    """
+    tokens = lines.split()
+    # usually every line has the same columns and the whole block can be
+    # converted at once
+    if n_at and _uniform_columns(lines, n_at):
+        table = np.array(tokens).reshape(n_at, -1)
+        elems = table[:, 0].astype(str).tolist()
+        coords = table[:, 1:4].astype(float)
+    else:
+        rows = [line.split() for line in lines.split(b"\n") if line.strip()]
+        elems = [row[0].decode() for row in rows]
+        coords = np.array([row[1:4] for row in rows], dtype=float).reshape(-1, 3)
+    if len(elems) != n_at:
+        raise ValueError("Expected " + str(n_at) + " atoms in the frame but found " +
+                         str(len(elems)))
+    return elems, coords
+
+
+def iter_xyz(in_name):
+    """
+    Yield the frames of a .xyz file one after the other
+
+    The file is read line by line, so that only one frame is in memory at a
+    time. Each frame is the number of atoms, a comment line and one line per
+    atom. Blank lines and other lines which do not start with a number of atoms
+    between frames are ignored.
+
+    Parameters
+    ----------
+    in_name : str
+        Name of the file to read
+    Yields
+    ------
+    elems : list of str
+        Element symbol of each atom of the frame
+    coords : Nat x 3 numpy array
+        Cartesian coordinates of each atom of the frame
+
+    """
+    with open(in_name, "rb") as xyz_file:
+        for line in xyz_file:
+            n_at = _header_atoms(line)
+            if n_at is None:
+                continue
+            # comment line
+            xyz_file.readline()
+            lines = b"".join(xyz_file.readline() for i in range(n_at))
+            yield _parse_frame(lines, n_at)
+
+
+def _line_starts(mapped):
+    """Return the offset of the start of each line of a mapped file"""
+    starts = [np.zeros(1, dtype=np.int64)]
+    for start in range(0, len(mapped), _chunk_size):
+        chunk = np.frombuffer(mapped[start:start + _chunk_size], dtype=np.uint8)
+        starts.append(np.flatnonzero(chunk == ord("\n")).astype(np.int64) + start + 1)
+    starts = np.concatenate(starts)
+    # a final newline does not start a line
+    return starts[starts < len(mapped)]
+
+
+class XYZTrajectory(object):
+    """
+    Random access to the frames of a .xyz file
+
+    The first time a file is opened, the offsets of the lines of the file are
+    found in large vectorised chunks and the offset and number of atoms of each
+    frame are kept. If persist is True this index is saved in a file next to
+    the .xyz file, named after it with the extension .idx.npy, and reused as
+    long as the size and modification time of the .xyz file are unchanged. The
+    file is then memory mapped such that reading a frame only touches the bytes
+    of that frame.
+
+    Frames are read with traj[i], which also accepts negative numbers, slices
+    like traj[10:100:5] and lists of frame numbers.
+
+    Attributes
+    ----------
+    name : str
+        Name of the .xyz file
+    offsets : numpy array of ints
+        Offset in bytes of the first atom line of each frame
+    ends : numpy array of ints
+        Offset in bytes of the end of the last atom line of each frame
+    natoms : numpy array of ints
+        Number of atoms of each frame
+
+    """
+    def __init__(self, name, persist=True):
+        self.name = name
+        self._file = open(name, "rb")
+        stat = os.fstat(self._file.fileno())
+        self._stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        if stat.st_size:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mapped = b""
+        index_name = name + ".idx.npy"
+        index = self._load_index(index_name) if persist else None
+        if index is None:
+            index = self._make_index()
+            if persist:
+                try:
+                    # the first row identifies the version of the file
+                    stamp_row = np.append(self._stamp, 0)[np.newaxis]
+                    np.save(index_name, np.concatenate((stamp_row, index)))
+                except OSError:
+                    pass
+        self.offsets, self.ends, self.natoms = index.T
+
+    def _load_index(self, index_name):
+        """Return the saved index if it describes the file as it is, or None"""
+        try:
+            saved = np.load(index_name)
+        except (OSError, ValueError):
+            return None
+        if len(saved) == 0 or saved.ndim != 2 or saved.shape[1] != 3 or \
+                not np.array_equal(saved[0, :2], self._stamp):
+            return None
+        return saved[1:]
+
+    def _make_index(self):
+        """Return the offset, end and number of atoms of each frame"""
+        mapped = self._mapped
+        starts = _line_starts(mapped)
+        n_lines = len(starts)
+        # the end of each line, without the newline
+        ends = np.append(starts[1:] - 1, len(mapped))
+        frames = []
+        line = 0
+        while line < n_lines:
+            n_at = _header_atoms(mapped[starts[line]:ends[line]])
+            if n_at is None:
+                line += 1
+                continue
+            first = line + 2
+            last = first + n_at - 1
+            if last >= n_lines:
+                raise ValueError("The last frame of " + self.name + " is incomplete")
+            if n_at:
+                frames.append((starts[first], ends[last], n_at))
+            else:
+                frames.append((starts[line], starts[line], 0))
+            line = first + n_at
+        return np.array(frames, dtype=np.int64).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.natoms)
+
+    def frame(self, i):
+        """
+        Return one frame
+
+        Parameters
+        ----------
+        i : int
+            Number of the frame, negative numbers count from the end
+        Returns
+        -------
+        elems : list of str
+            Element symbol of each atom of the frame
+        coords : Nat x 3 numpy array
+            Cartesian coordinates of each atom of the frame
+
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError("Frame " + str(i) + " out of range for " +
+                             str(len(self)) + " frames")
+        i = i % len(self)
+        return _parse_frame(self._mapped[self.offsets[i]:self.ends[i]], int(self.natoms[i]))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.frame(i) for i in range(*key.indices(len(self)))]
+        if isinstance(key, (list, tuple, np.ndarray)):
+            return [self.frame(int(i)) for i in key]
+        return self.frame(int(key))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    def mol(self, i=-1):
+        """Return a frame as a Mol object, the last one by default"""
+        from fromage.utils.mol import Mol
+
+        elems, coords = self.frame(i)
+        return Mol.from_arrays(elems, coords)
+
+    def close(self):
+        """Release the file"""
+        if isinstance(self._mapped, mmap.mmap):
+            self._mapped.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
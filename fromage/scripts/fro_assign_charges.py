@@ -18,143 +18,170 @@ Includes options for Mulliken or RESP and ouptut file names.
 import numpy as np
 import sys
 import argparse
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
 
 import fromage.io.read_file as rf
 
 
-def detect_1_connect(in_atoms):
+def molecule_orders(in_mol):
     """
-    Make a matrix of first connectivities of a list of atoms.
+    Yield the orders of connection between the atoms of each molecule
+
+    The orders are the topological distances found by breadth-first searches
+    over the sparse bond graph of one molecule at a time, so the memory needed
+    is set by the size of the largest molecule and not that of the Mol.
 
     Parameters
     ----------
-    in_atoms : Mol object
-        Atoms which need their connectivity detected
-    vectors : 3x3 array-like or None
-        Lattice vectors of the system if it is periodic. If not use None
+    in_mol : Mol object
+        Atoms which need their connectivity detected. Bonds go through the
+        lattice vectors if there are any
+    Yields
+    ------
+    indices : numpy array of ints
+        The increasing indices of the atoms of one molecule
+    orders : Nmol x Nmol numpy array of ints
+        The order of connection between each pair of atoms of the molecule. The
+        diagonal is 1 if the radii of the atom overlap enough for it to be
+        bonded to itself, and 0 otherwise
+
+    """
+    periodic = np.count_nonzero(in_mol.vectors) != 0
+    graph = in_mol.bond_graph(periodic=periodic)
+    # an atom is bonded to itself if its radii overlap enough
+    self_bonded = -2 * in_mol.radii(in_mol.bonding) <= in_mol.thresh
+    for indices in in_mol.molecule_indices(periodic=periodic):
+        sub_graph = graph[indices][:, indices]
+        orders = shortest_path(sub_graph, directed=False, unweighted=True).astype(int)
+        np.fill_diagonal(orders, self_bonded[indices])
+        yield indices, orders
+
+
+def get_connectivity_mat(in_mol):
+    """
+    Return the connectivity matrix of the Mol
 
+    Parameters
+    ----------
+    in_mol : Mol object
+        Atoms which need their connectivity detected
     Returns
     -------
-    cnct : numpy matrix
-        The matrix where each row and each column correspond to one atom. If the
-        two atoms are bonded or the same, the matrix element is 1. Otherwise it
-        is 0
+    connect_mat : Nat x Nat scipy sparse CSR matrix of ints
+        The order of connection between each pair of atoms, with no entry for
+        atoms of different molecules. Only the blocks of the molecules are
+        stored
 
     """
-    nat_mol = len(in_atoms)
-    cnct = np.zeros((nat_mol, nat_mol),dtype=int)
-    for i, i_atom in enumerate(in_atoms):
-        for j, j_atom in enumerate(in_atoms):
-            if np.count_nonzero(in_atoms.vectors) == 0:
-                if in_atoms.bonded(i_atom, j_atom):
-                    cnct[i][j] = 1
-            else:
-                if in_atoms.per_bonded(i_atom, j_atom):
-                    cnct[i][j] = 1
-    return cnct
-
-
-def expand_connect(in_mat):
+    rows, cols, orders_all = [], [], []
+    for indices, orders in molecule_orders(in_mol):
+        pairs = np.nonzero(orders)
+        rows.append(indices[pairs[0]])
+        cols.append(indices[pairs[1]])
+        orders_all.append(orders[pairs])
+    n_at = len(in_mol)
+    if not rows:
+        return csr_matrix((n_at, n_at), dtype=int)
+    connect_mat = csr_matrix((np.concatenate(orders_all), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(n_at, n_at), dtype=int)
+    return connect_mat
+
+
+def get_connectivities(in_mol):
     """
-    Expand a connectivity matrix
+    Return the connectivity of each atom of the Mol
 
-    For one atom, checks which other atoms are connected to it (connectors) and
-    which are not (dangles). Then for each dangle checks if it has connectors in
-    common with the original atom and if so assigns that matrix element the
-    smallest combination of connectors.
+    This is the connectivity which Atom.set_connectivity would give from a row
+    of get_connectivity_mat, without making the full matrix.
 
     Parameters
     ----------
-    in_mat : 2-d array-like
-        Connectivity matrix to be expanded
-
+    in_mol : Mol object
+        Atoms which need their connectivity detected
     Returns
     -------
-    out_mat : 2-d array-like
-        Once-expanded connectivity matrix
+    connectivities : list of frozensets
+        For each atom, frozenset of ((element string,order of connection),
+        amount of connections)
 
     """
-    out_mat = np.copy(in_mat)
-    for i, row in enumerate(in_mat):
-        # indices of unconnected atoms
-        dangles = []
-        # indices of connected atoms
-        connectors = []
-        for j, element in enumerate(row):
-            if element == 0 and j > i:
-                dangles.append(j)
-            elif element != 0:
-                connectors.append(j)
-        for dangle in dangles:
-            orders = []
-            for k, dangle_element in enumerate(in_mat[dangle]):
-                if dangle_element != 0 and k in connectors:
-                    orders.append(dangle_element + in_mat[i][k])
-                # if orders is not empty
-                if orders:
-                    out_mat[i][dangle] = min(orders)
-                    out_mat[dangle][i] = min(orders)
-    return out_mat
-
-def complete_expand(in_mat):
-    """Expand a matrix until it stops expanding."""
-    mat = np.copy(in_mat)
-    i = 1
-    while True:
-        i += 1
-        temp_mat = expand_connect(mat)
-        if np.array_equal(mat, temp_mat):
-            break
-        mat = np.copy(temp_mat)
-
-    return mat
-
-def get_connectivity_mat(in_mol):
-    """Return the connectivity matrix of the Mol"""
-    first_connect = detect_1_connect(in_mol)
-    connect_mat = complete_expand(first_connect)
-
-    return connect_mat
-
-def charged_kinds(in_atoms, in_kinds):
+    elems = [str(elem) for elem in in_mol._elems[:len(in_mol)]]
+    symbols, elem_ids = np.unique(elems, return_inverse=True)
+    elem_ids = elem_ids.reshape(-1)
+    n_symb = len(symbols)
+    connectivities = [frozenset()] * len(in_mol)
+    for indices, orders in molecule_orders(in_mol):
+        n_mol = len(indices)
+        n_orders = orders.max() + 1
+        # one code per row and (elem,order) pair, counted all at once
+        codes = (np.arange(n_mol)[:, np.newaxis] * n_orders + orders) * n_symb \
+            + elem_ids[indices][np.newaxis, :]
+        codes, counts = np.unique(codes[orders != 0], return_counts=True)
+        rows, remainder = np.divmod(codes, n_orders * n_symb)
+        links = zip(rows.tolist(), (remainder // n_symb).tolist(),
+                    symbols[remainder % n_symb].tolist(), counts.tolist())
+        row_links = [[] for _ in range(n_mol)]
+        for row, order, symbol, count in links:
+            row_links[row].append(((symbol, order), count))
+        for row, atom_links in zip(indices, row_links):
+            connectivities[row] = frozenset(atom_links)
+    return connectivities
+
+
+def _kind_charges(in_mol, avg_charges):
+    """Return the charge of each atom's kind in avg_charges, or NaN if absent"""
+    kind_charges = np.full(len(in_mol), np.nan)
+    for kind, indices in in_mol.kind_indices().items():
+        if kind in avg_charges:
+            kind_charges[indices] = avg_charges[kind]
+    return kind_charges
+
+
+def template_charges(in_mol, avg_charges):
     """
-    Get charged atom kinds from charged atoms and kinds.
+    Return the charges of the kinds of the atoms, found molecule by molecule
 
-    For each kind of atom to be charged, goes through the list of atoms and
-    makes an average of the partial atomic charge of atoms of that type.
+    The molecules are grouped by a fingerprint of their bond graph, see
+    Mol.fingerprints. The kinds are only found for one template
+    molecule per group and its charges are copied to the atoms of the same
+    colour in the other molecules of the group.
 
     Parameters
     ----------
-    in_atoms : Mol object
-        The atoms should be charged and some of them at least should be of the
-        relevant kind
-    in_kinds : list of tuples
-        The tuples are of the form (a,b) where a is an element string (like 'C')
-        and b is a frozenset of ((element string,order of connection),amount of
-        connections). (a,b) is known as an atom kind
-
+    in_mol : Mol object
+        Atoms which need charges assigned to them
+    avg_charges : dict
+        Average charge by kind, as found in assign_charges
     Returns
     -------
-    q_kinds : list of tuples
-        Each tuple is now (average charge,kind). This tuple is known as a
-        charged kind
+    kind_charges : numpy array of floats
+        The charge of the kind of each atom, or NaN if it is not in avg_charges
 
     """
-    q_kinds = []
-    for kind in in_kinds:
-        charges = []
-        for atom in in_atoms:
-            if atom.kind == kind:
-                charges.append(atom.q)
-        if charges:  # if not empty
-            avg_charge = sum(charges) / float(len(charges))
+    periodic = np.count_nonzero(in_mol.vectors) != 0
+    colours = in_mol.refined_colours()
+    kind_charges = np.full(len(in_mol), np.nan)
+    groups = {}
+    molecules = in_mol.molecule_indices(periodic=periodic)
+    for fingerprint, indices in zip(in_mol.fingerprints(molecules), molecules):
+        groups.setdefault(fingerprint, []).append(indices)
+    for molecules in groups.values():
+        template = _kind_charges(in_mol.sub_mol(molecules[0]), avg_charges)
+        charge_of_colour = np.full(colours.max() + 1, np.nan)
+        charge_of_colour[colours[molecules[0]]] = template
+        if np.array_equal(charge_of_colour[colours[molecules[0]]], template, equal_nan=True):
+            indices = np.concatenate(molecules)
+            kind_charges[indices] = charge_of_colour[colours[indices]]
+        # if atoms of the same colour are of different kinds, which refined
+        # colours do not exclude, find the kinds of every molecule
         else:
-            avg_charge = 0
-        q_kinds.append((avg_charge, kind))
-    return q_kinds
+            for indices in molecules:
+                kind_charges[indices] = _kind_charges(in_mol.sub_mol(indices), avg_charges)
+    return kind_charges
 
 
-def assign_charges(char_atoms, unchar_atoms):
+def assign_charges(char_atoms, unchar_atoms, by_molecule=False):
     """
     Assign charges from one list of atoms to another list of atoms.
 
@@ -167,40 +194,35 @@ def assign_charges(char_atoms, unchar_atoms):
     ----------
     char_atoms : Mol object
         Atoms which already have assigned charge
-    char_vectors : 3x3 array-like or None
-        Lattice vectors of the input system if it is periodic. If not use None
     unchar_atoms : Mol object
         Atoms which need charges assigned to them
-    unchar_vectors : 3x3 array-like or None
-        See char_vectors
+    by_molecule : bool
+        If True, find the kinds of only one molecule of each sort in
+        unchar_atoms and copy its charges to the identical molecules, see
+        template_charges. Much faster for clusters or cells made of many copies
+        of the same molecules. The connectivity of unchar_atoms is then not set
 
     """
-    # detect the charged atom's connectivity matrix
-    char_first = detect_1_connect(char_atoms)
-    char_cnct = complete_expand(char_first)
-
-    # get charged atom kinds as a result
-    kinds = []
-    for i, atom in enumerate(char_atoms):
-        atom.set_connectivity(char_atoms, char_cnct[i])
-        kinds.append(atom.kind)
-    kinds = set(kinds)
-    q_kinds = charged_kinds(char_atoms, kinds)
-
-    # detect uncharged atom connectivity
-    unchar_first = detect_1_connect(unchar_atoms)
-    unchar_cnct = complete_expand(unchar_first)
-
-    # determine kind and cross check with charged kinds
-    for i, atom in enumerate(unchar_atoms):
-        atom.set_connectivity(unchar_atoms, unchar_cnct[i])
-        for q_kind in q_kinds:
-            if atom.kind == q_kind[1]:
-                atom.q = q_kind[0]
+    # the average charge of each kind of charged atom
+    char_charges = char_atoms.charges()
+    avg_charges = {kind: np.mean(char_charges[indices])
+                   for kind, indices in char_atoms.kind_indices().items()}
+
+    # atoms of the same kind get that charge, the others keep theirs
+    new_charges = unchar_atoms.charges()
+    if by_molecule:
+        kind_charges = template_charges(unchar_atoms, avg_charges)
+        assigned = ~np.isnan(kind_charges)
+        new_charges[assigned] = kind_charges[assigned]
+    else:
+        for kind, indices in unchar_atoms.kind_indices().items():
+            if kind in avg_charges:
+                new_charges[indices] = avg_charges[kind]
+    unchar_atoms.change_charges(new_charges)
     return
 
 
-def main(in_xyz, in_log, target, output, bonding, thresh, kind):
+def main(in_xyz, in_log, target, output, bonding, thresh, kind, by_molecule):
     if(in_xyz):
         mol = rf.mol_from_file(in_xyz)
     else:
@@ -214,7 +236,7 @@ def main(in_xyz, in_log, target, output, bonding, thresh, kind):
     for atom, char in zip(mol, charges):
         atom.q = char
 
-    assign_charges(mol, cluster)
+    assign_charges(mol, cluster, by_molecule=by_molecule)
 
     # warning if some atoms have not been assigned or if some original charges
     # were 0
@@ -248,7 +270,9 @@ if __name__ == '__main__':
                         default=1.7, type=float)
     parser.add_argument("-k", "--kind", help="Kind of population, mulliken or esp",
                         default="esp", type=str)
+    parser.add_argument("-m", "--by_molecule", help="Find the atom kinds of only one of each identical molecule of the target and copy its charges to the others",
+                        action="store_true")
     user_input = sys.argv[1:]
     args = parser.parse_args(user_input)
     main(args.in_xyz, args.in_log, args.target,
-         args.output, args.bonding, args.threshold, args.kind)
+         args.output, args.bonding, args.threshold, args.kind, args.by_molecule)
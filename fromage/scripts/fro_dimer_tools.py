@@ -17,6 +17,7 @@ import time
 import fromage as fro
 import numpy as np
 from fromage.io import read_file as rf
+from fromage.utils.crystal import NotMolecularError
 
 # safe printing
 def prints(arg_in):
@@ -50,6 +51,8 @@ def parse_args():
                         default=str("centroid"), type=str)
     parser.add_argument("-d", "--dist", help="Distance criterion (in units of Angstrom) to define a dimer",
                         default=7, type=float)
+    parser.add_argument(
+        "-c", "--crystal", help="With lattice vectors, search the dimers of each molecule with all images of the molecules within the distance criterion, including its own images, instead of the images in the 27 neighbouring cells", action="store_true")
     parser.add_argument(
         "-lin", "--linear", help="The molecule is linear-like. This means that the principal axis will simply be the longest interatomic axis.", action="store_true")
 
@@ -105,7 +108,16 @@ def main(args):
                 for atom in mol_of_interest:
                     if atom == all_atoms[label-1]:
                         forbidden_kinds.append(atom.kind)
-        all_atoms, molecules = all_atoms.complete_cell()
+        crystal = None
+        if args.crystal:
+            # whole molecules and their lattice, if the crystal is molecular
+            try:
+                crystal = fro.make_crystal(all_atoms)
+                molecules = crystal.molecules
+            except NotMolecularError:
+                prints("The cell is not made of discrete molecules, using the neighbouring cells")
+        if crystal is None:
+            all_atoms, molecules = all_atoms.complete_cell()
         prints("{} molecules detected after reconstitution".format(len(molecules)))
     else:
         # if we are forbidding some atoms
@@ -119,7 +131,8 @@ def main(args):
                     if atom == all_atoms[label-1]:
                         forbidden_kinds.append(atom.kind)
         # separate into molecules
-        molecules = all_atoms.segregate(diff_mols=False)
+        crystal = None
+        molecules = all_atoms.segregate()
         prints("{} molecules detected".format(len(molecules)))
 
     # ignore hydrogens
@@ -135,23 +148,6 @@ def main(args):
             mol.set_connectivity()
             mol.geom.ignore_kinds = forbidden_kinds
 
-    # get dimers
-    dimers_raw = all_dimers(molecules)
-    prints("{} dimers in the input geometry".format(len(dimers_raw)))
-
-    # if periodic
-    if args.vectors:
-        # get all the dimers generated by extra periodic images
-        dimers_per = []
-        for dimer in dimers_raw:
-            images = dimer.images(vectors)
-            dimers_per.extend(images)
-        dimers_raw = dimers_per
-        prints("{} dimers considering periodicity".format(len(dimers_raw)))
-
-    if args.linear:
-        for dimer in dimers_raw:
-            dimer.mols_are_linear()
     # filter out dimers
     if args.dimtype == 'centroid':
         method = 'centroid'
@@ -165,12 +161,37 @@ def main(args):
     elif args.dimtype == 'vdw':
         mode = 'vdw'
 
-    selected_dimers = []
-    for dimer in dimers_raw:
-        if dimer.inter_distance(method=method,mode=mode) <= args.dist:
-            selected_dimers.append(dimer)
+    if crystal is not None:
+        # only the dimers of molecules and their images within the distance
+        # criterion are made, including images of the same molecule
+        labels_a, labels_b, shifts, dists = crystal.dimers_within(args.dist, method=method, mode=mode)
+        selected_dimers = [crystal.dimer(label_a, label_b, shift) for label_a, label_b, shift
+                           in zip(labels_a, labels_b, shifts)]
+    else:
+        # get dimers
+        dimers_raw = all_dimers(molecules)
+        prints("{} dimers in the input geometry".format(len(dimers_raw)))
+
+        # if periodic
+        if args.vectors:
+            # get all the dimers generated by extra periodic images
+            dimers_per = []
+            for dimer in dimers_raw:
+                images = dimer.images(vectors)
+                dimers_per.extend(images)
+            dimers_raw = dimers_per
+            prints("{} dimers considering periodicity".format(len(dimers_raw)))
+
+        selected_dimers = []
+        for dimer in dimers_raw:
+            if dimer.inter_distance(method=method,mode=mode) <= args.dist:
+                selected_dimers.append(dimer)
     prints("{} dimers selected from distance criterion".format(len(selected_dimers)))
 
+    if args.linear:
+        for dimer in selected_dimers:
+            dimer.mols_are_linear()
+
     # remove repeated dimers
     keep_these = []
     for i,dimer_i in enumerate(selected_dimers[:-1]):
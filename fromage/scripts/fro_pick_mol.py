@@ -10,7 +10,7 @@ pick_mol.py input_file.xyz 7 13 42
 """
 import sys
 import argparse
-from copy import copy
+import numpy as np
 from fromage.io import read_file as rf
 
 def picker(in_name, out_name, labels, bonding, thresh, reverse=False):
@@ -37,26 +37,20 @@ def picker(in_name, out_name, labels, bonding, thresh, reverse=False):
     if max(labels) > len(atoms):
         raise ValueError("One or more atom labels were too high!")
 
-    selected = atoms.copy()
-    selected.atoms = []
-
+    n_mols, mol_labels = atoms.molecule_labels()
+    picked = []
     for label in labels:
-        mol = atoms.select(label)
-
         # prevent double selecting
-        if mol[0] in selected:
+        if mol_labels[label] in picked:
             raise ValueError("Atom " + str(label) + " was already selected!")
-
-        selected += mol
+        picked.append(mol_labels[label])
 
     # to print out the non specified atoms
     if reverse:
-        to_remove = [copy(i) for i in selected]
-        selected = atoms.copy()
-        selected.atoms = []
-        for atom in atoms:
-            if atom not in to_remove:
-                selected.append(atom)
+        selected = atoms.sub_mol(~np.isin(mol_labels, picked))
+    else:
+        mol_indices = atoms.molecule_indices()
+        selected = atoms.sub_mol(np.concatenate([mol_indices[i] for i in picked]))
 
     selected.write_xyz(out_name)
 
@@ -45,7 +45,7 @@ def compare_id(id_i, id_j):
     return sdiff
 
 
-def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding, thresh, bonding_str, print_mono, trans, clust_rad, inclusivity, center_label):
+def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding, thresh, bonding_str, print_mono, trans, clust_rad, inclusivity, center_label, radii=None, periodic_dupli=False):
     vectors = rf.read_vectors(vectors_file)
     atoms = rf.mol_from_file(in_xyz,vectors=vectors)
 
@@ -82,9 +82,11 @@ def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding,
         mod_cell = deepcopy(atoms)
         print_now = False
 
-    if dupli:
-        # purge duplicate atoms
-        mod_cell.remove_duplicates()
+    if dupli or periodic_dupli:
+        # purge duplicate atoms, optionally also on opposite faces of the cell
+        # when the coordinates are Cartesian and there is a cell
+        periodic = periodic_dupli and not frac and np.count_nonzero(vectors) != 0
+        mod_cell.remove_duplicates(periodic=periodic)
         print_now = True
 
     if print_now:
@@ -92,7 +94,8 @@ def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding,
 
     if trans:
         translation = np.array(trans)
-        new_atoms = mod_cell.supercell(translation)
+        # written one image at a time without making the whole supercell
+        new_atoms = mod_cell.supercell(translation, lazy=True)
         new_vec = (vectors.T * translation.transpose()).T
         new_atoms.write_xyz("supercell_out.xyz")
         ef.write_lat_vec("supercell_vectors", new_vec)
@@ -101,8 +104,14 @@ def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding,
         clust = atoms.make_cluster(clust_rad, mode = inclusivity)
         clust.write_xyz("cluster_out.xyz")
 
+    if radii:
+        # each cluster is grown from the previous one
+        for rad, clust in zip(sorted(radii), atoms.cluster_series(sorted(radii), mode = inclusivity)):
+            clust.write_xyz("cluster_" + str(rad) + ".xyz")
+
     if print_mono:
         identities = []
+        lattice = atoms.lattice
         # for each molecule of the modified unit cell
         for mol_i in mols:
             # get the rest of the molecules
@@ -113,13 +122,10 @@ def main(in_xyz, vectors_file, complete, confine, frac, dupli, output, bonding,
             identity = []
             # for each dimer including the selected molecule
             for mol_j in rest:
-                dimer_distances = []
                 # get all of the interatomic distances across the dimer using the
                 # shortest lattice distance
-                for at_i in mol_i:
-                    for at_j in mol_j:
-                        dimer_distances.append(at_i.per_dist(at_j,vectors))
-                        dimer_distances.sort()
+                dimer_distances = sorted(lattice.min_image_distances(
+                    mol_i.coords, mol_j.coords).ravel().tolist())
                 identity.append(dimer_distances)
                 identity.sort()
             identities.append(identity)
@@ -186,13 +192,17 @@ if __name__ == '__main__':
                         help="Create a supercell via lattice translations", default=None, type=int, nargs='*')
     parser.add_argument("-d", "--remove_duplicate_atoms",
                         help="Purge duplicate atoms", action="store_true")
+    parser.add_argument("-D", "--periodic_duplicates",
+                        help="Purge duplicate atoms, including images of each other on opposite faces of the cell", action="store_true")
     parser.add_argument("-r", "--radius", help="Generate a cluster of molecules of the given radius. Radius 0.0 turns this off.",
                         default=0.0, type=float)
+    parser.add_argument("-R", "--radii", help="Generate a series of clusters of molecules of the given radii, written to cluster_[radius].xyz",
+                        default=None, type=float, nargs='*')
     parser.add_argument("-i", "--inclusivity", help="Choose between inclusive (inc) or exclusive (exc) radius selecting.", default='exc', type=str),
     parser.add_argument("-e", "--center", help="Move the atoms of the cell such that the molecule containing the specified label is at the origin. To turn off: 0",default=0,type=int)
     user_input = sys.argv[1:]
     args = parser.parse_args(user_input)
     main(args.in_xyz, args.vectors, args.complete, args.confine, args.fractional,
-         args.remove_duplicate_atoms, args.output, args.bonding, args.thresh, args.bonding_string, args.mono, args.translations, args.radius, args.inclusivity, args.center)
+         args.remove_duplicate_atoms, args.output, args.bonding, args.thresh, args.bonding_string, args.mono, args.translations, args.radius, args.inclusivity, args.center, args.radii, args.periodic_duplicates)
     end = time.time()
     print("\nTotal time: {}s".format(round((end - start), 1)))
@@ -20,21 +20,71 @@ def parse_args():
     parser.add_argument(
         "-bs", "--bonding_string", help="Alternate specification of bonding. Here the threshold and bonding are lumped up in one string like 'cov-0.1' or 12dis'", default="", type=str)
     parser.add_argument("-res", "--resolution",
-                        help="The number of voxels per side of the box", default=100, type=int)
+                        help="The number of voxels per side of the box, for both the Voronoi and vdw grids", default=100, type=int)
     parser.add_argument("-dim", "--dimensions",help="Dimensions of the box in Angstrom. Give x y and z like '30 30 30'",default=[25, 25, 25], type=float, nargs='*')
+    parser.add_argument("-v", "--vectors", help="Lattice vectors of the unit cell. If given, the whole cell is shared between all of its molecules with periodic images and the resolution is the number of voxels along each lattice vector", default="", type=str)
 
     user_input = sys.argv[1:]
     args = parser.parse_args(user_input)
 
     return args
+def set_bonding(atoms, args):
+    """Apply the bonding arguments to a Mol"""
+    thresh = None if args.thresh == 999 else args.thresh
+    atoms.set_bonding(bonding=args.bonding, thresh=thresh)
+    if args.bonding_string:
+        atoms.set_bonding_str(args.bonding_string)
+
+
+def main_cell(args):
+    """Write the periodic partition of the unit cell and the table of volumes"""
+    vectors = rf.read_vectors(args.vectors)
+    cell = rf.mol_from_file(args.in_xyz, vectors=vectors)
+    set_bonding(cell, args)
+
+    labels_cub, occupied_cub, crystal = vo.cell_partition(cell, res=args.resolution)
+    voronoi, occupied = vo.molecule_volumes(labels_cub, occupied_cub, len(crystal))
+    free = voronoi - occupied
+
+    # molecules numbered from 1 in the label cube
+    labels_cub.values += 1
+    labels_cub.out_cube("voro_labels.cube", cell)
+    occupied_cub.out_cube("vdw_cell.cube", cell)
+
+    with open("volumes", "w") as out_file:
+        out_file.write("{:>8} {:>5} {:>6} {:>10} {:>12} {:>12} {:>10}\n".format(
+            "Molecule", "Kind", "Atoms", "First atom", "Voronoi", "Occupied", "Free"))
+        for label, atoms in enumerate(crystal.atom_indices):
+            out_file.write("{:8d} {:5d} {:6d} {:10d} {:12.4f} {:12.4f} {:10.4f}\n".format(
+                label + 1, crystal.kinds[label] + 1, len(atoms), np.min(atoms) + 1,
+                voronoi[label], occupied[label], free[label]))
+        out_file.write("\nAverage per kind\n")
+        out_file.write("{:>5} {:>9} {:>12} {:>12} {:>10}\n".format(
+            "Kind", "Molecules", "Voronoi", "Occupied", "Free"))
+        for kind in np.unique(crystal.kinds):
+            of_kind = crystal.kinds == kind
+            out_file.write("{:5d} {:9d} {:12.4f} {:12.4f} {:10.4f}\n".format(
+                kind + 1, np.count_nonzero(of_kind), np.mean(voronoi[of_kind]),
+                np.mean(occupied[of_kind]), np.mean(free[of_kind])))
+        cell_vol = np.sum(voronoi)
+        out_file.write("\nCell volume: " + str(cell_vol) + "\n")
+        out_file.write("Occupied volume: " + str(np.sum(occupied)) + "\n")
+        out_file.write("Free volume: " + str(np.sum(free)) + "\n")
+        out_file.write("Packing coefficient: " + str(np.sum(occupied) / cell_vol) + "\n")
+
+
 def main(args):
+    if args.vectors:
+        main_cell(args)
+        return
 
     in_atoms = args.in_xyz
     atoms = rf.mol_from_file(in_atoms)
+    set_bonding(atoms, args)
 
     out_file = open("volumes", "w")
-    prox_grid = vo.CubeGrid()
-    vdw_grid = vo.CubeGrid()
+    prox_grid = vo.ImplicitCubeGrid()
+    vdw_grid = vo.ImplicitCubeGrid()
 
     mol = atoms.select(args.atom_label - 1)
     c_x, c_y, c_z = mol.centroid()
@@ -43,7 +93,7 @@ def main(args):
 
     prox_grid.grid_from_point(c_x, c_y, c_z, res=args.resolution, box=np.array(
         [[x_dim, 0.0, 0.0], [0.0, y_dim, 0.0], [0.0, 0.0, z_dim]]))
-    vdw_grid.grid_from_point(c_x, c_y, c_z, res=100, box=np.array(
+    vdw_grid.grid_from_point(c_x, c_y, c_z, res=args.resolution, box=np.array(
         [[x_dim, 0.0, 0.0], [0.0, y_dim, 0.0], [0.0, 0.0, z_dim]]))
 
     rest = []
@@ -63,7 +113,7 @@ def main(args):
     vdw_grid.out_cube("vdw.cube", atoms)
     out_file.write("VDW volume: " + str(vdw_grid.volume()) + "\n")
 
-    prox_grid.add_grid(vdw_grid.grid)
+    prox_grid.add_grid(vdw_grid)
     out_file.write("Union volume: " + str(prox_grid.volume()) + "\n")
     prox_grid.out_cube("add.cube", atoms)
 
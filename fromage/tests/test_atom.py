@@ -27,3 +27,16 @@ def test_per_lap_img(c_at, o_at, vectors):
 def test_put_in_cell(o_at_outside, vectors):
     in_box = o_at_outside.put_in_cell(vectors)
     assert in_box.x == approx(0.1)
+
+
+def test_shared_element(c_at, newat):
+    """Atoms of the same element share one record"""
+    assert c_at.element is newat.element
+    assert c_at.cov == approx(0.68)
+    assert not hasattr(c_at, "__dict__")
+
+
+def test_v_translated(c_at):
+    new_at = c_at.v_translated([1.0, 0.0, 0.0])
+    assert new_at.x == approx(1.0)
+    assert c_at.x == approx(0.0)
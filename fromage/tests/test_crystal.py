@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from pytest import approx
+
+from fromage.utils.atom import Atom
+from fromage.utils.mol import Mol
+from fromage.utils.crystal import make_crystal, NotMolecularError
+from fromage.utils.lattice import Lattice
+
+
+def test_crystal_molecules(hc1_cell):
+    crystal = make_crystal(hc1_cell)
+    new_cell, new_mols = hc1_cell.complete_cell()
+    assert len(crystal) == 4
+    assert np.array_equal(crystal.kinds, [0, 0, 0, 0])
+    for mol, crystal_mol in zip(new_mols, crystal.molecules):
+        assert np.array_equal(mol.coords, crystal_mol.coords)
+
+
+def test_molecules_within(hc1_cell):
+    crystal = make_crystal(hc1_cell)
+    labels, shifts, dists = crystal.molecules_within([1.0, 2.0, 3.0], 8.0)
+    # the centroids of the images within 8 Angstrom, found one by one
+    translations = np.dot(Lattice.image_shifts(3), crystal.vectors)
+    expected = 0
+    for centroid in crystal.centroids:
+        expected += np.count_nonzero(
+            np.linalg.norm(centroid + translations - [1.0, 2.0, 3.0], axis=1) <= 8.0)
+    assert len(labels) == expected
+    for label, shift, dist in zip(labels, shifts, dists):
+        assert crystal.image(label, shift).centroid() == approx(
+            crystal.centroids[label] + np.dot(shift, crystal.vectors))
+        assert np.linalg.norm(crystal.image(label, shift).centroid() - [1.0, 2.0, 3.0]) == approx(dist)
+
+
+def test_dimers_within(hc1_cell):
+    crystal = make_crystal(hc1_cell)
+    labels_a, labels_b, shifts, dists = crystal.dimers_within(4.0, method='atomic', mode='dis')
+    assert len(labels_a) == 28
+    for label_a, label_b, shift, dist in zip(labels_a, labels_b, shifts, dists):
+        dimer = crystal.dimer(label_a, label_b, shift)
+        assert dimer.inter_distance(method='atomic') == approx(dist)
+        assert dist <= 4.0
+
+
+def test_polymer_is_not_molecular():
+    # a chain of carbons bonded through the cell faces
+    chain = Mol([Atom("C", 0.0, 0.0, 0.0), Atom("C", 1.5, 0.0, 0.0)],
+                vectors=np.diag([3.0, 10.0, 10.0]))
+    with pytest.raises(NotMolecularError):
+        make_crystal(chain)
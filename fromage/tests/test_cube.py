@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pytest
+from pytest import approx
+
+import fromage.io.read_file as rf
+import fromage.io.edit_file as ef
+from fromage.utils.mol import Mol
+from fromage.utils.atom import Atom
+
+
+def test_cube_round_trip(tmp_path):
+    name = str(tmp_path / "grid.cube")
+    vectors = np.array([[0.2, 0.0, 0.0], [0.05, 0.3, 0.0], [0.0, 0.0, 0.25]])
+    origin = np.array([1.0, -0.5, 0.0])
+    vals = np.linspace(-1, 1, 4 * 3 * 5)
+    mol = Mol([Atom("O", 1.0, 0.0, 0.0), Atom("H", 0.0, 1.0, 0.0)])
+    ef.write_cube(name, origin, vectors, 4, 3, 5, mol, vals)
+    with open(name) as cube_file:
+        lines = cube_file.readlines()
+    assert len(lines) == 6 + 2 + 10
+    assert lines[-1].endswith("{:10.6f}\n".format(1.0))
+    cub, out_mol = rf.read_cube(name, cache=True)
+    assert os.path.exists(name + ".npy")
+    assert out_mol.coords == approx(mol.coords, abs=1e-5)
+    assert cub.grid[:, 3] == approx(vals, abs=1e-6)
+    # z changes fastest
+    assert cub.grid[1, :3] == approx(origin + vectors[2], abs=1e-5)
+    assert cub.grid[5, :3] == approx(origin + vectors[1], abs=1e-5)
+    # the second read uses the cached values
+    cached, cached_mol = rf.read_cube(name, cache=True)
+    assert np.array_equal(cached.grid, cub.grid)
+
+
+def test_cube_bad_value(tmp_path):
+    name = str(tmp_path / "bad.cube")
+    ef.write_cube(name, np.zeros(3), np.eye(3) * 0.2, 2, 2, 2, Mol([]), np.arange(8.0))
+    with open(name) as cube_file:
+        text = cube_file.read()
+    with open(name, "w") as cube_file:
+        cube_file.write(text.replace("3.000000", "3.0x0000"))
+    with pytest.raises(ValueError, match="bad.cube"):
+        rf.read_cube(name)
@@ -56,3 +56,19 @@ def test_inter_distance(h2_dimer):
 
 def test_same_geom(h2o_dimer,h2o_dimer_jumbled_trans):
     assert h2o_dimer.same_geom(h2o_dimer_jumbled_trans)
+
+def test_dimer_tools_crystal_linear(tmp_path, monkeypatch):
+    import fromage.scripts.fro_dimer_tools as dt
+    vec_file = str(tmp_path / "vectors")
+    np.savetxt(vec_file, np.eye(3) * 20)
+    out_file = str(tmp_path / "dimers.dat")
+    monkeypatch.setattr("sys.argv", ["fro_dimer_tools", _in_data("h2_linear_dimer.xyz"),
+                                     "-vec", vec_file, "-b", "dis", "-d", "6", "-c",
+                                     "-lin", "-o", out_file])
+    monkeypatch.setattr(dt, "args", dt.parse_args(), raising=False)
+    dt.main(dt.args)
+    with open(out_file) as data_file:
+        lines = data_file.readlines()
+    # one dimer with parallel principal axes
+    assert len(lines) == 2
+    assert float(lines[1].split()[1]) == approx(0.0)
@@ -0,0 +1,48 @@
+import numpy as np
+from pytest import approx
+from fromage.utils.lattice import Lattice, get_lattice, reduce_vectors
+
+
+def test_wrap(vectors):
+    lat = Lattice(vectors)
+    in_cell, shifts = lat.wrap([[2.1, -0.3, 1.4]], return_shifts=True)
+    assert in_cell[0] == approx([0.1, 0.7, 0.4])
+    assert list(shifts[0]) == [-2, 1, -1]
+
+
+def test_frac_round_trip(hc1_cell):
+    lat = hc1_cell.lattice
+    frac = lat.to_frac(hc1_cell.coords)
+    assert lat.to_cart(frac) == approx(hc1_cell.coords)
+    assert np.dot(lat.vectors, lat.reciprocal.T) == approx(np.eye(3))
+
+
+def test_widths(hc1_cell):
+    lat = hc1_cell.lattice
+    vec = hc1_cell.vectors
+    assert lat.volume == approx(abs(np.linalg.det(vec)))
+    assert lat.widths[0] == approx(lat.volume / np.linalg.norm(np.cross(vec[1], vec[2])))
+    assert lat.widths[1] == approx(10.285)
+
+
+def test_min_image_distances(hc1_cell):
+    lat = get_lattice(hc1_cell.vectors)
+    assert lat is hc1_cell.lattice
+    dists = lat.min_image_distances(hc1_cell.coords[:5], hc1_cell.coords[100:110])
+    for i in range(5):
+        for j in range(10):
+            assert dists[i, j] == approx(hc1_cell[i].per_dist(hc1_cell[100 + j], hc1_cell.vectors))
+
+
+def test_reduce_vectors(hc1_cell):
+    vec = hc1_cell.vectors
+    reduced, transform = reduce_vectors(vec)
+    assert reduced == approx(vec)
+    skewed = np.dot([[1, 0, 0], [3, 1, 0], [-4, 2, 1]], vec)
+    reduced, transform = reduce_vectors(skewed)
+    assert np.dot(transform, skewed) == approx(reduced)
+    assert abs(round(np.linalg.det(transform))) == 1
+    assert np.sort(np.linalg.norm(reduced, axis=1)) == approx(np.sort(np.linalg.norm(vec, axis=1)))
+    dists = Lattice(vec).min_image_distances(hc1_cell.coords[:5], hc1_cell.coords[100:110])
+    skewed_dists = Lattice(skewed).min_image_distances(hc1_cell.coords[:5], hc1_cell.coords[100:110])
+    assert skewed_dists == approx(dists)
@@ -1,3 +1,4 @@
+import pytest
 from pytest import approx
 import numpy as np
 from fromage.utils.atom import Atom
@@ -21,6 +22,19 @@ def test_duplicity(h2o_dup):
     assert len(h2o_dup) == 3
 
 
+def test_duplicity_periodic(vectors):
+    """Atoms on opposite faces of the cell are duplicates if periodic"""
+    atoms = [Atom("C", 0.0, 0.5, 0.5), Atom("H", 0.5, 0.5, 0.5),
+             Atom("C", 1.0, 0.5, 0.5), Atom("H", 0.5, 0.5, 0.5004)]
+    mol = Mol(atoms, vectors=vectors)
+    kept, merged = mol.copy().remove_duplicates()
+    assert list(kept) == [0, 1, 2]
+    kept, merged = mol.remove_duplicates(periodic=True)
+    assert list(kept) == [0, 1]
+    assert list(merged) == [0, 1, 0, 1]
+    assert len(mol) == 2
+
+
 def test_len(h2o_dimer_mol):
     """The len method is implemented"""
     assert len(h2o_dimer_mol) == 6
@@ -65,6 +79,19 @@ def test_translate(c_o):
     assert c_o[1].x == approx(1.25)
 
 
+def test_center_of_mass(c_o):
+    com = c_o.center_of_mass()
+    assert com[0] == approx(15.999 / (12.011 + 15.999), rel=1e-3)
+
+
+def test_transform(c_o):
+    rot = np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    c_o.transform(rot, [0.0, 0.0, 2.0])
+    assert c_o[1].x == approx(0.0)
+    assert c_o[1].y == approx(1.0)
+    assert c_o[1].z == approx(2.0)
+
+
 def test_set_bonding_str(h2o_dimer_mol):
     h2o_dimer_mol.set_bonding_str("dis")
     assert h2o_dimer_mol.bonding == "dis"
@@ -95,3 +122,102 @@ def test_same_atoms_as():
 
     assert mol_a.same_atoms_as(mol_b) == True
     assert mol_a.same_atoms_as(mol_c) == False
+
+def test_from_arrays():
+    mol = Mol.from_arrays(["C", "O"], [[0., 0., 0.], [1., 0., 0.]], [0.2, -0.2])
+    assert len(mol) == 2
+    assert mol[1].elem == "O"
+    assert mol[1].q == approx(-0.2)
+    assert mol[1].vdw == approx(1.52)
+    assert mol.coords.shape == (2, 3)
+
+def test_atom_view(c_o):
+    """Atoms of a Mol are views of its arrays"""
+    c_o[1].x = 2.0
+    assert c_o.coords[1][0] == approx(2.0)
+    c_o.translate(np.array([1.0, 0.0, 0.0]))
+    assert c_o[1].x == approx(3.0)
+
+def test_pop_frees_atom(c_o):
+    at = c_o.pop(0)
+    at.x = 5.0
+    assert len(c_o) == 1
+    assert c_o[0].elem == "O"
+    assert c_o[0].x == approx(1.0)
+
+def test_copy_independent(c_o):
+    new = c_o.copy()
+    new[0].x = 7.0
+    new.append(Atom("H", 0.0, 0.0, 0.0))
+    assert c_o[0].x == approx(0.0)
+    assert len(c_o) == 2
+
+def test_iadd_in_place(c_o):
+    same = c_o
+    c_o += c_o.copy()
+    assert same is c_o
+    assert len(c_o) == 4
+
+def test_indexed_membership(hc1_quad):
+    copies = [atom.copy() for atom in hc1_quad]
+    # repeated queries go through the spatial index
+    assert all(atom in hc1_quad for atom in copies)
+    hc1_quad.remove(copies[5])
+    hc1_quad[0].x += 1.0
+    assert copies[5] not in hc1_quad
+    assert copies[0] not in hc1_quad
+    assert hc1_quad.index(copies[6]) == 5
+    assert list(hc1_quad.close_indices(copies[6], thresh=0.01)) == [5]
+
+
+def test_connectivity_mat(hc1_mol):
+    import fromage.scripts.fro_assign_charges as ac
+    # reference: the order is the first power of the bond matrix linking a pair
+    bonds = hc1_mol.bond_graph().toarray() != 0
+    expected = np.zeros(bonds.shape, dtype=int)
+    reached = np.eye(len(bonds), dtype=bool)
+    walks = reached.copy()
+    order = 0
+    while True:
+        order += 1
+        walks = (walks.astype(int) @ bonds) > 0
+        new = walks & ~reached
+        if not new.any():
+            break
+        expected[new] = order
+        reached |= new
+    np.fill_diagonal(expected, -2 * hc1_mol.radii(hc1_mol.bonding) <= hc1_mol.thresh)
+    assert np.array_equal(ac.get_connectivity_mat(hc1_mol).toarray(), expected)
+
+
+def test_set_connectivity(hc1_quad):
+    hc1_quad.set_connectivity()
+    kinds = [atom.kind for atom in hc1_quad]
+    assert kinds[:37] == kinds[37:74]
+    assert hc1_quad[0].kind[1] == hc1_quad[0].connectivity
+
+
+def test_kind_indices_cached(hc1_quad):
+    kind_map = hc1_quad.kind_indices()
+    assert sum(len(indices) for indices in kind_map.values()) == len(hc1_quad)
+    hc1_quad.change_charges(np.ones(len(hc1_quad)))
+    assert hc1_quad.kind_indices() is kind_map
+    assert hc1_quad.copy().kind_indices() is kind_map
+    hc1_quad.translate([1.0, 0.0, 0.0])
+    assert hc1_quad.kind_indices() is not kind_map
+
+
+def test_change_charges_length(h2o_dimer_mol):
+    h2o_dimer_mol.change_charges(np.arange(6.0))
+    assert h2o_dimer_mol.charges() == approx(np.arange(6.0))
+    for charges in ([1.0], np.zeros(5), np.zeros(7)):
+        with pytest.raises(ValueError, match="6 charges"):
+            h2o_dimer_mol.change_charges(charges)
+
+
+def test_populate_by_molecule(hc1_quad, hc1_mol):
+    hc1_mol.change_charges(np.linspace(-1.0, 1.0, len(hc1_mol)))
+    by_atom = hc1_quad.copy()
+    by_atom.populate(hc1_mol)
+    hc1_quad.populate(hc1_mol, by_molecule=True)
+    assert np.array_equal(hc1_quad.charges(), by_atom.charges())
@@ -1,6 +1,9 @@
 import numpy as np
 from pytest import approx
 
+import fromage.io.read_file as rf
+from fromage.tests.conftest import _in_data
+
 
 def test_complete_mol(hc1_cell):
     new_mol, new_cell = hc1_cell.complete_mol(0)
@@ -13,6 +16,24 @@ def test_complete_cell(hc1_cell):
     assert len(new_mols[0]) == 37
 
 
+def test_complete_cell_whole_molecules(hc1_cell):
+    hc1_cell.translate([3.1, -2.7, 4.3])
+    new_cell, new_mols = hc1_cell.complete_cell()
+    assert len(new_mols) == 4
+    for mol in new_mols:
+        assert len(mol.select(0)) == 37
+
+
+def test_bond_offsets(hc1_cell):
+    graph = hc1_cell.bond_graph(periodic=True)
+    offsets = hc1_cell.bond_offsets()
+    assert offsets.shape == (graph.nnz, 3)
+    # each bond in the graph has the opposite offset of its reverse
+    rows = np.repeat(np.arange(len(hc1_cell)), np.diff(graph.indptr))
+    cols = graph.indices
+    back = {(i, j): tuple(o) for i, j, o in zip(rows, cols, offsets)}
+    assert all(back[j, i] == tuple(-o) for i, j, o in zip(rows, cols, offsets))
+
 def test_supercell(hc1_cell):
     trans = np.array([2, 2, 2])
     new_cell = hc1_cell.supercell(trans)
@@ -37,11 +58,53 @@ def test_centered_supercell_alt(hc1_cell):
     assert len(new_cell) == approx(1184)
 
 
+def test_lazy_supercell(hc1_cell):
+    trans = np.array([1, 2, 1])
+    new_cell = hc1_cell.centered_supercell(trans, from_origin=True)
+    lazy_cell = hc1_cell.centered_supercell(trans, from_origin=True, lazy=True)
+    assert len(lazy_cell) == len(new_cell)
+    assert np.array_equal(lazy_cell.to_mol().coords, new_cell.coords)
+    assert np.array_equal(lazy_cell.sub_mol([5, 900]).coords, new_cell.coords[[5, 900]])
+    near = np.flatnonzero(np.linalg.norm(new_cell.coords, axis=1) < 6.0)
+    assert np.array_equal(lazy_cell.indices_within([[0.0, 0.0, 0.0]], 6.0), near)
+
+
 def test_make_cluster(hc1_cell):
     clust = hc1_cell.make_cluster(10)
     assert len(clust) == 74
 
 
+def test_make_cluster_from_molecules(hc1_cell, hc1_mol):
+    assert hc1_cell._whole_molecules() is not None
+    for mode in ('exc', 'inc'):
+        clust = hc1_cell.make_cluster(8, mode=mode, central_mol=hc1_mol)
+        from_supercell = hc1_cell._supercell_cluster(8, mode, hc1_mol, hc1_mol.coords)
+        assert np.array_equal(clust.coords, from_supercell.coords)
+
+
+def test_cluster_order(hc1_cell):
+    # clusters made by selecting molecules atom by atom
+    for mode, clust_rad in (('exc', 10), ('inc', 6)):
+        ref = rf.mol_from_file(_in_data("hc1_clust_" + mode + ".xyz"))
+        clust = hc1_cell.make_cluster(clust_rad, mode=mode)
+        from_supercell = hc1_cell._supercell_cluster(clust_rad, mode, None, np.zeros((1, 3)))
+        series = list(hc1_cell.cluster_series([clust_rad], mode=mode))
+        for out_clust in (clust, from_supercell, series[0]):
+            assert [atom.elem for atom in out_clust] == [atom.elem for atom in ref]
+            assert out_clust.coords == approx(ref.coords, abs=1e-5)
+
+
+def test_cluster_series(hc1_cell):
+    radii = [3, 8, 12]
+    series = list(hc1_cell.cluster_series(radii, mode='inc'))
+    for i, clust_rad in enumerate(radii):
+        clust = hc1_cell.make_cluster(clust_rad, mode='inc')
+        assert len(series[i]) == len(clust)
+        assert clust.same_atoms_as(series[i])
+    # each cluster starts with the previous one
+    assert np.array_equal(series[2].coords[:len(series[1])], series[1].coords)
+
+
 def test_confine(hc1_complete_cell):
     conf = hc1_complete_cell.confined()
     assert conf[19].x == approx(10.97339)
@@ -1,5 +1,6 @@
 import numpy as np
 from numpy.testing import assert_allclose
+from pytest import approx
 
 def test_coord_array(h2o_dimer_mol):
     arr = h2o_dimer_mol.coord_array()
@@ -30,3 +31,25 @@ def test_calc_axes(rectangle_mol):
     assert_allclose(rectangle_mol.geom.prin_ax,expected_princ, rtol=1e-4)
     assert_allclose(rectangle_mol.geom.sec_ax,expected_sec, rtol=1e-4)
     assert_allclose(rectangle_mol.geom.perp_ax,expected_perp, rtol=1e-4)
+
+def test_cached_geometry_follows_changes(hc1_mol):
+    cen = hc1_mol.centroid()
+    assert hc1_mol._centroid() is hc1_mol._centroid()
+    # the public methods return fresh arrays
+    cen_copy = hc1_mol.centroid()
+    cen_copy -= 1
+    assert hc1_mol.centroid() == approx(cen)
+    coord_arr = hc1_mol.coord_array()
+    coord_arr[0] = 0
+    assert hc1_mol.coord_array()[0] == approx(hc1_mol.coords[0])
+    coeffs = hc1_mol.plane_coeffs()
+    hc1_mol.translate([0., 0., 1.])
+    assert hc1_mol.centroid()[2] == approx(cen[2] + 1)
+    assert hc1_mol.plane_coeffs()[3] != approx(coeffs[3])
+    hc1_mol.geom.ignore_hydrogens = True
+    assert len(hc1_mol.coord_array()) < len(hc1_mol)
+
+def test_bonding_change_updates_graph(hc1_mol):
+    n_bonds = hc1_mol.bond_graph().nnz
+    hc1_mol.thresh = 0.5
+    assert hc1_mol.bond_graph().nnz < n_bonds
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def test_select_h2o_dimer_mol(h2o_dimer_mol):
     water = h2o_dimer_mol.select(3)
     assert len(water) == 3
@@ -36,3 +39,36 @@ def test_multi_per_select(hc1_cell, hc1_quad):
 def test_mol_segregation(hc1_quad):
     mols = hc1_quad.segregate()
     assert len(mols) == 4 and len(mols[1]) == 37
+
+
+def test_segregation_order(hc1_cell):
+    mols = hc1_cell.segregate()
+    first_atoms = [mol_indices[0] for mol_indices in hc1_cell.molecule_indices()]
+    assert len(mols) == len(first_atoms)
+    # each molecule is selected from its first atom
+    for mol, first_atom in zip(mols, first_atoms):
+        assert np.array_equal(mol.coords, hc1_cell.select(int(first_atom)).coords)
+
+
+def test_bond_graph_h2o(h2o_dimer_mol):
+    graph = h2o_dimer_mol.bond_graph()
+    # with 'dis1.8', all three atoms of a water are bonded together
+    assert graph.nnz == 12
+    assert graph[0, 1] and graph[1, 0]
+    assert not graph[0, 3]
+
+
+def test_bond_graph_matches_bonded(hc1_cell):
+    hc1_cell.set_bonding('cov')
+    graph = hc1_cell.bond_graph(periodic=True).toarray()
+    for i in range(0, len(hc1_cell), 17):
+        for j in range(len(hc1_cell)):
+            if i != j:
+                assert graph[i, j] == hc1_cell.per_bonded(hc1_cell[i], hc1_cell[j])
+
+
+def test_molecule_labels_hc1_quad(hc1_quad):
+    n_mols, labels = hc1_quad.molecule_labels()
+    assert n_mols == 4
+    assert list(np.bincount(labels)) == [37] * 4
+    assert labels[0] == 0
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from pytest import approx
+
+import fromage.io.read_file as rf
+from fromage.io.trajectory import XYZTrajectory, iter_xyz
+
+
+def _write_frames(name, frames):
+    with open(name, "w") as xyz_file:
+        for i, coords in enumerate(frames):
+            xyz_file.write(str(len(coords)) + "\n3 frame " + str(i) + "\n")
+            for pos in coords:
+                xyz_file.write("C {} {} {}\n".format(*pos))
+            xyz_file.write("\n")
+
+
+def test_trajectory_frames(tmp_path):
+    name = str(tmp_path / "traj.xyz")
+    frames = [np.arange(6.0).reshape(2, 3) + i for i in range(5)]
+    _write_frames(name, frames)
+    traj = XYZTrajectory(name)
+    assert len(traj) == 5
+    assert os.path.exists(name + ".idx.npy")
+    elems, coords = traj[-2]
+    assert elems == ["C", "C"]
+    assert coords == approx(frames[3])
+    assert [frame[1][0, 0] for frame in traj[::2]] == [0.0, 2.0, 4.0]
+    traj.close()
+    # the saved index is reused
+    with XYZTrajectory(name) as traj:
+        assert traj[1][1] == approx(frames[1])
+    streamed = [coords for elems, coords in iter_xyz(name)]
+    assert len(streamed) == 5
+    assert streamed[4] == approx(frames[4])
+    assert len(rf.read_xyz(name)) == 5
+    assert rf.mol_from_file(name).coords == approx(frames[4])
+
+
+def test_ragged_columns(tmp_path):
+    name = str(tmp_path / "ext.xyz")
+    with open(name, "w") as xyz_file:
+        xyz_file.write("3\nextended\nC 0 0 0 7\nH 1 2 3\nO 4 5 6 8 9\n")
+    with XYZTrajectory(name) as traj:
+        elems, coords = traj[0]
+    assert elems == ["C", "H", "O"]
+    assert coords == approx(np.array([[0, 0, 0], [1, 2, 3], [4, 5, 6]]))
+    assert list(iter_xyz(name))[0][0] == ["C", "H", "O"]
+
+
+def test_lines_between_frames(tmp_path):
+    name = str(tmp_path / "junk.xyz")
+    frames = [np.arange(6.0).reshape(2, 3) + i for i in range(2)]
+    _write_frames(name, frames)
+    with open(name, "a") as xyz_file:
+        xyz_file.write("end of run\n   \n")
+    with XYZTrajectory(name) as traj:
+        assert len(traj) == 2
+        assert traj[-1][1] == approx(frames[1])
+    streamed = [coords for elems, coords in iter_xyz(name)]
+    assert len(streamed) == 2
+    assert streamed[1] == approx(frames[1])
@@ -0,0 +1,97 @@
+import numpy as np
+from pytest import approx
+from scipy.spatial.distance import cdist
+
+import fromage.io.read_file as rf
+from fromage.tests.conftest import _in_data
+from fromage.utils.atom import Atom
+from fromage.utils.volume import CubeGrid, ImplicitCubeGrid, NearestAtoms, stamp_spheres
+from fromage.utils.volume import cell_partition, molecule_volumes
+
+
+def test_implicit_grid():
+    vectors = np.array([[0.5, 0.0, 0.0], [0.1, 0.4, 0.0], [0.0, 0.2, 0.3]])
+    cub = CubeGrid(vectors, 4, 3, 5)
+    cub.set_grid_coord()
+    cub.grid[:, 3] = np.arange(cub.dimension) % 7
+    imp = cub.to_implicit()
+    assert isinstance(imp, ImplicitCubeGrid)
+    assert imp.values.shape == (4, 3, 5)
+    assert np.array_equal(imp.grid, cub.grid)
+    assert imp.volume() == approx(cub.volume())
+    # translations on grid points are rolls
+    trans_vec = np.dot([1, -1, 2], vectors)
+    cub.translate_inplace(trans_vec)
+    imp.translate_inplace(trans_vec)
+    assert imp.grid == approx(cub.grid)
+    # supergrids are tilings
+    cub.supergrid([2, 1, 2])
+    imp.supergrid([2, 1, 2])
+    assert (imp.x_num, imp.y_num, imp.z_num) == (8, 3, 10)
+    assert imp.grid == approx(cub.grid)
+    imp.add_grid(imp.copy())
+    assert imp.values.sum() == approx(2 * cub.grid[:, 3].sum())
+
+
+def test_nearest_atoms():
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(0, 10, (50, 3))
+    radii = rng.uniform(1, 2.5, 50)
+    points = rng.uniform(-2, 12, (1000, 3))
+    owners, dist2 = NearestAtoms(coords, radii).query(points, k=2)
+    scaled = cdist(points, coords, 'sqeuclidean') / radii**2
+    assert np.array_equal(owners, np.argmin(scaled, axis=1))
+    assert dist2 == approx(np.min(scaled, axis=1))
+    # the molecule wins ties
+    grid = ImplicitCubeGrid(np.eye(3) * 0.5, 9, 1, 1, np.array([-2.0, 0.0, 0.0]))
+    grid.proximity([Atom("C", 1.0, 0.0, 0.0)], [Atom("C", -1.0, 0.0, 0.0)])
+    assert grid.values.reshape(-1).tolist() == [0] * 4 + [1] * 5
+
+
+def test_stamp_spheres():
+    vectors = np.array([[0.3, 0.0, 0.0], [0.1, 0.25, 0.0], [0.0, -0.05, 0.2]])
+    origin = np.array([-1.0, -2.0, 0.5])
+    centres = np.array([[0.0, 0.0, 1.0], [2.5, 1.0, 2.0], [-3.0, 0.0, 0.0]])
+    radii = np.array([1.2, 0.8, 2.5])
+    values = np.zeros((20, 15, 12))
+    stamp_spheres(values, origin, vectors, centres, radii)
+    cub = CubeGrid(vectors, 20, 15, 12, origin)
+    cub.set_grid_coord()
+    inside = cdist(cub.grid[:, :3], centres, 'sqeuclidean') < radii**2
+    assert np.array_equal(values.reshape(-1), np.any(inside, axis=1))
+
+
+def test_cell_partition(hc1_cell):
+    labels_cub, occupied_cub, crystal = cell_partition(hc1_cell, res=20)
+    assert len(crystal) == 4
+    voronoi, occupied = molecule_volumes(labels_cub, occupied_cub, len(crystal))
+    # the molecules fill the cell and are equivalent by symmetry
+    assert np.sum(voronoi) == approx(abs(np.linalg.det(hc1_cell.vectors)))
+    assert voronoi == approx(np.full(4, np.mean(voronoi)), rel=0.02)
+    assert np.all(occupied < voronoi)
+    assert occupied == approx(np.full(4, np.mean(occupied)), rel=0.02)
+
+
+def test_implicit_unordered_translation():
+    vectors = np.array([[0.5, 0.0, 0.0], [0.1, 0.4, 0.0], [0.0, 0.2, 0.3]])
+    origin = np.array([0.3, -0.2, 0.1])
+    cub = CubeGrid(vectors, 4, 3, 5, origin)
+    cub.set_grid_coord()
+    cub.grid[:, 3] = np.arange(cub.dimension)
+    imp = cub.to_implicit()
+    trans_vec = np.array([0.77, -1.31, 0.42])
+    moved = cub.unord_trans_inplace_grid(trans_vec).grid
+    imp_moved = imp.unord_trans_inplace_grid(trans_vec).grid
+    # the same points with the same values, in a different order
+    moved = moved[np.argsort(moved[:, 3])]
+    imp_moved = imp_moved[np.argsort(imp_moved[:, 3])]
+    assert imp_moved == approx(moved)
+
+
+def test_implicit_vdw_vol():
+    cub, mol = rf.read_cube(_in_data("benzene_pot.cube"))
+    imp = cub.to_implicit()
+    cub.vdw_vol(mol)
+    imp.vdw_vol(mol)
+    assert np.count_nonzero(imp.values) > 0
+    assert np.array_equal(imp.values.reshape(-1), cub.grid[:, 3])
@@ -11,6 +11,9 @@ Modules
     calc
         Defines different Calc classes which run different electronic structure
         programs
+    crystal
+        Defines the MolecularCrystal object which represents a crystal as whole
+        molecules and lattice translations
     handle_atoms
         Manipulates lists of Atom objects
     per_table
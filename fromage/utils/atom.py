@@ -4,9 +4,50 @@ import numpy as np
 from collections import Counter
 from copy import deepcopy
 from fromage.utils import per_table as per
+from fromage.utils.lattice import Lattice, get_lattice
 from fromage.fdist import _fdist as fd
 
 
+def _row_property(attr, column, doc):
+    """
+    Return a property stored in the Atom or in the row of the Mol it views
+
+    Parameters
+    ----------
+    attr : str
+        Name of the attribute holding the value when the Atom is free
+    column : str
+        Name of the Mol array holding the value when the Atom is a view
+    doc : str
+        Docstring of the property
+    Returns
+    -------
+    prop : property
+        The property to be set as a class attribute of Atom
+
+    """
+    def getter(self):
+        if self._mol is None:
+            return getattr(self, attr)
+        return getattr(self._mol, column)[self._idx]
+
+    def setter(self, value):
+        if self._mol is None:
+            setattr(self, attr, value)
+        else:
+            getattr(self._mol, column)[self._idx] = value
+
+    return property(getter, setter, doc=doc)
+
+
+def _element_property(field, doc):
+    """Return a read-only property of the Element record of the Atom"""
+    def getter(self):
+        return getattr(self.element, field)
+
+    return property(getter, doc=doc)
+
+
 class Atom(object):
     """
     Object representing an atom.
@@ -14,6 +55,11 @@ class Atom(object):
     Sometimes also used to represent point charges as atoms of element "point".
     Several functions are present like translate or find_centroid.
 
+    An Atom is either free, in which case it holds its own data, or a view of a
+    row of the arrays of a Mol. Appending a free Atom to a Mol moves its data
+    to the Mol and turns it into a view, such that modifying the Atom modifies
+    the Mol. Removing it from the Mol makes it free again.
+
     Attributes
     ----------
     x,y,z : floats
@@ -35,45 +81,171 @@ class Atom(object):
         Covalent radius in Angstrom
     """
 
+    # No instance __dict__: there can be millions of Atoms in a supercell
+    __slots__ = ("_mol", "_idx", "_elem", "_element", "_x", "_y", "_z", "_q",
+                 "_es", "_num", "_connectivity", "_kind")
+
     def __init__(self, elemIn="H", xIn=0.0, yIn=0.0, zIn=0.0, qIn=0.0, num=1):
-        self.elem = elemIn
-        self.x = 0.0
-        self.y = 0.0
-        self.z = 0.0
-        self.q = 0.0
-        self.num = 1
+        # Mol of which this Atom is a view and the row it corresponds to
+        self._mol = None
+        self._idx = 0
+        self._elem = elemIn
+        # shared record of the element properties, see per_table.element
+        self._element = per.element(elemIn)
+        self._num = 1
         # Atom objects with no charge can have feel a finite electostatic
         # potential which we include as
-        self.es = 0.0
+        self._es = 0.0
         # The connectivity is a frozenset (because a list would have a built-in ordering)
         # of the tuples of the form (A,N) where A is an tuple of different
         # distances to atoms e.g. ("C",4) if there is a carbon 4 bonds away. N
         # is the amount of carbons 4 bonds away
-        self.connectivity = None
+        self._connectivity = None
         # Kind is a tuple of (elem,connectivity) and as such is enough to define
         # an atom type at least as well as it would be defined in a forcefield
         # e.g. in acrolein: This is a C atom with 1 O 1-away, an H 1-away, a C
         # 1-away, an H 2-away, a C 2-away and 2 H 3-away
-        self.kind = None
+        self._kind = None
 
         # deal with some sneaky int that may be disguised as float
         try:
-            self.x = float(xIn)
-            self.y = float(yIn)
-            self.z = float(zIn)
-            self.q = float(qIn)
+            self._x = float(xIn)
+            self._y = float(yIn)
+            self._z = float(zIn)
+            self._q = float(qIn)
 
         except ValueError:
+            self._x = self._y = self._z = self._q = 0.0
             print("Some coordinates or charges cannot be cast to float!")
 
-        table = per.periodic
-        self.at_num = table[self.elem.lower()]["at_num"]
-        self.valence_e = table[self.elem.lower()]["valence_e"]
-        self.cov = table[self.elem.lower()]["cov"]
-        self.vdw = table[self.elem.lower()]["vdw"]
-        self.mass = table[self.elem.lower()]["mass"]
         # to string methods to be used mainly for debugging and .qc file
 
+    @classmethod
+    def _free(cls, elem, element, x, y, z, q):
+        """Return a free Atom without parsing the input"""
+        new_at = cls.__new__(cls)
+        new_at._mol = None
+        new_at._idx = 0
+        new_at._elem = elem
+        new_at._element = element
+        new_at._x = x
+        new_at._y = y
+        new_at._z = z
+        new_at._q = q
+        new_at._es = 0.0
+        new_at._num = 1
+        new_at._connectivity = None
+        new_at._kind = None
+        return new_at
+
+    @classmethod
+    def _view_of(cls, mol, idx):
+        """Return an Atom which is a view of row idx of mol"""
+        new_at = cls.__new__(cls)
+        new_at._mol = mol
+        new_at._idx = idx
+        return new_at
+
+    def _detach(self):
+        """Copy the data of the viewed row into the Atom, making it free"""
+        mol, i = self._mol, self._idx
+        self._elem = mol._elems[i]
+        self._element = per.elements[mol._elem_idx[i]]
+        self._x, self._y, self._z = mol._coords[i]
+        self._q = mol._charges[i]
+        self._es = mol._es[i]
+        self._num = mol._nums[i]
+        self._connectivity = mol._connectivity[i]
+        self._kind = mol._kinds[i]
+        self._mol = None
+        self._idx = 0
+        return
+
+    @property
+    def elem(self):
+        """Element symbol"""
+        if self._mol is None:
+            return self._elem
+        return self._mol._elems[self._idx]
+
+    @elem.setter
+    def elem(self, elem):
+        element = per.element(elem)
+        if self._mol is None:
+            self._elem = elem
+            self._element = element
+        else:
+            self._mol._elems[self._idx] = elem
+            self._mol._elem_idx[self._idx] = element.index
+            self._mol._touch()
+
+    @property
+    def element(self):
+        """Element namedtuple from per_table with the element properties"""
+        if self._mol is None:
+            return self._element
+        return per.elements[self._mol._elem_idx[self._idx]]
+
+    @property
+    def elem_index(self):
+        """Index of the element in per_table.periodic_list"""
+        return self.element.index
+
+    @property
+    def x(self):
+        if self._mol is None:
+            return self._x
+        return self._mol._coords[self._idx, 0]
+
+    @x.setter
+    def x(self, value):
+        if self._mol is None:
+            self._x = value
+        else:
+            self._mol._coords[self._idx, 0] = value
+            self._mol._touch()
+
+    @property
+    def y(self):
+        if self._mol is None:
+            return self._y
+        return self._mol._coords[self._idx, 1]
+
+    @y.setter
+    def y(self, value):
+        if self._mol is None:
+            self._y = value
+        else:
+            self._mol._coords[self._idx, 1] = value
+            self._mol._touch()
+
+    @property
+    def z(self):
+        if self._mol is None:
+            return self._z
+        return self._mol._coords[self._idx, 2]
+
+    @z.setter
+    def z(self, value):
+        if self._mol is None:
+            self._z = value
+        else:
+            self._mol._coords[self._idx, 2] = value
+            self._mol._touch()
+
+    q = _row_property("_q", "_charges", "Partial atomic charge")
+    es = _row_property("_es", "_es", "Electrostatic potential felt by the atom")
+    num = _row_property("_num", "_nums", "Label number")
+    connectivity = _row_property("_connectivity", "_connectivity",
+                                 "Frozenset of ((elem,order),amount)")
+    kind = _row_property("_kind", "_kinds", "Tuple of (elem,connectivity)")
+
+    at_num = _element_property("at_num", "Atomic number")
+    valence_e = _element_property("valence_e", "Number of valence electrons")
+    cov = _element_property("cov", "Covalent radius in Angstrom")
+    vdw = _element_property("vdw", "Van der Waals radius in Angstrom")
+    mass = _element_property("mass", "Mass in Da")
+
     def __repr__(self):
         return "{:>6} {:10.6f} {:10.6f} {:10.6f} {:10.6f}".format(self.elem, self.x, self.y, self.z, self.q)
 
@@ -82,11 +254,25 @@ class Atom(object):
 
         # equality function
     def __eq__(self, other):
-        return self.elem.lower() == other.elem.lower() and self.dist(other) < 1e-5 and self.q - other.q < 1e-5
+        return self.element is other.element and self.dist(other) < 1e-5 and self.q - other.q < 1e-5
 #        return self.elem.lower() == other.elem.lower() and self.x == other.x and self.y == other.y and self.z == other.z and self.q == other.q
 
+    def __copy__(self):
+        # a copy is always free, even if the original is a view of a Mol
+        new_at = Atom._free(self.elem, self.element, self.x, self.y, self.z, self.q)
+        new_at._num = self.num
+        new_at._es = self.es
+        new_at._connectivity = self.connectivity
+        new_at._kind = self.kind
+        return new_at
+
+    def __deepcopy__(self, memo):
+        # the connectivity and kind are immutable so they can be shared
+        return self.__copy__()
+
     def copy(self):
         return deepcopy(self)
+
     def set_pos(self, pos_array):
         """
         Assign coordinates via numpy array
@@ -98,15 +284,22 @@ class Atom(object):
 
         """
 
-        self.x = pos_array[0]
-        self.y = pos_array[1]
-        self.z = pos_array[2]
+        if self._mol is None:
+            self._x = pos_array[0]
+            self._y = pos_array[1]
+            self._z = pos_array[2]
+        else:
+            self._mol._coords[self._idx] = pos_array[:3]
+            self._mol._touch()
 
         return
 
     def get_pos(self):
         """Return np array of coord"""
-        out_arr = np.array([self.x, self.y, self.z])
+        if self._mol is None:
+            out_arr = np.array([self._x, self._y, self._z])
+        else:
+            out_arr = self._mol._coords[self._idx].copy()
 
         return out_arr
 
@@ -201,31 +394,14 @@ class Atom(object):
 
         in_pos = np.array([x1, y1, z1])
         vectors = np.array([aVec, bVec, cVec])
-        multipliers = np.arange(-order, order + 1)
-
-        # sets comprised of the ranges of lattice vector values
-        aSet = [i * vectors[0] for i in multipliers]
-        bSet = [i * vectors[1] for i in multipliers]
-        cSet = [i * vectors[2] for i in multipliers]
-
-        # minimum r distance
-        rMin = float("inf")
-
-        # loop over all possible translations of the input point
-        for trans1 in aSet:
-            for trans2 in bSet:
-                for trans3 in cSet:
-                    img_pos = in_pos + trans1 + trans2 + trans3
-                    # r=np.linalg.norm(self.my_pos-img_pos)
-                    r = self.c_dist(img_pos[0], img_pos[1], img_pos[2])
-                    # if this particular translation of the point is the closest
-                    # to the atom so far
-                    if r < rMin:
-                        rMin = r
-                        # image coordinates
-                        x3 = img_pos[0]
-                        y3 = img_pos[1]
-                        z3 = img_pos[2]
+
+        # all possible translations of the input point at once
+        img_pos = in_pos + np.dot(Lattice.image_shifts(order), vectors)
+        r = np.linalg.norm(img_pos - self.get_pos(), axis=1)
+        # the first of the closest images
+        closest = np.argmin(r)
+        rMin = r[closest]
+        x3, y3, z3 = img_pos[closest]
         return rMin, x3, y3, z3
 
     def per_dist(self, other_atom, vectors, ref='dis', new_pos=False):
@@ -251,39 +427,24 @@ class Atom(object):
              Closest image of the atom being targeted
 
         """
-        # First put the other atom inside the cell
-        other_atom = other_atom.put_in_cell(vectors)
-
-        multipliers = np.array([-1, 0, 1])
-
-        # sets comprised of the ranges of lattice vector values
-        a_set = [i * vectors[0] for i in multipliers]
-        b_set = [i * vectors[1] for i in multipliers]
-        c_set = [i * vectors[2] for i in multipliers]
-
-        # minimum r distance
-        r_min = float("inf")
-
+        lattice = get_lattice(vectors)
+        all_dists, images = lattice.image_distances(self.get_pos(), other_atom.get_pos())
+        # distances to the candidate closest images of the other atom
+        r = all_dists[:, 0, 0]
+        if ref == 'cov':
+            r = r - self.cov - other_atom.cov
+        elif ref == 'vdw':
+            r = r - self.vdw - other_atom.vdw
+
+        r_min = np.min(r)
         # is the minimal distance unique?
-        unique = True
-
-        # loop over all possible translations of the input point
-        for trans_a in a_set:
-            for trans_b in b_set:
-                for trans_c in c_set:
-                    cell_origin = trans_a + trans_b + trans_c
-                    tmp_img_atom = other_atom.v_translated(cell_origin)
-                    r = self.dist(tmp_img_atom, ref=ref)
-                    if r <= r_min:
-                        if r < r_min:
-                            unique = True
-                        if r == r_min:
-                            unique = False
-                        r_min = r
-                        at_img = tmp_img_atom
-        if not unique:
+        if np.count_nonzero(r == r_min) > 1:
             print("WARNING: the closest periodic image is ill-defined")
         if new_pos:
+            # the last of the closest images
+            closest = len(r) - 1 - np.argmin(r[::-1])
+            at_img = other_atom.copy()
+            at_img.set_pos(images[closest, 0, 0])
             return r_min, at_img
         else:
             return r_min
@@ -292,42 +453,24 @@ class Atom(object):
         """
         Return a new atom at a position inside the parallelepiped cell
         """
-        # transpose to get the transformation matrix
-        M = np.transpose(vectors)
-        # inverse transformation matrix
-        U = np.linalg.inv(M)
-
-        dir_pos = np.array([self.x, self.y, self.z])
-        frac_pos = np.dot(U, dir_pos)
-        # translate to the range [0.1]
-        new_frac_pos = [i % 1 for i in frac_pos]
-
-        new_dir_pos = np.dot(M, new_frac_pos)
-
-        new_at = deepcopy(self)
-        new_at.x = new_dir_pos[0]
-        new_at.y = new_dir_pos[1]
-        new_at.z = new_dir_pos[2]
+        new_at = self.copy()
+        new_at.set_pos(get_lattice(vectors).wrap(self.get_pos()))
 
         return new_at
 
 
     def translated(self, x1, y1, z1):
         """Return a new atom which is a translated copy."""
-        xout, yout, zout = self.x, self.y, self.z
-        xout += x1
-        yout += y1
-        zout += z1
-        outAtom = Atom(self.elem, xout, yout, zout, self.q)
+        outAtom = Atom._free(self.elem, self.element, self.x + x1,
+                             self.y + y1, self.z + z1, self.q)
         return outAtom
 
     def v_translated(self, vec_trans):
         """Return a new atom which is a translated copy."""
-        old_pos = np.array([self.x, self.y, self.z])
-        new_pos = old_pos + vec_trans
-        out_atom = Atom(self.elem, new_pos[0], new_pos[1], new_pos[2], self.q)
-        out_atom.kind = self.connectivity
-        out_atom.kind = self.kind
+        out_atom = Atom._free(self.elem, self.element, self.x + vec_trans[0],
+                              self.y + vec_trans[1], self.z + vec_trans[2], self.q)
+        out_atom._connectivity = self.connectivity
+        out_atom._kind = self.kind
         return out_atom
 
     def translate(self, x1, y1, z1):
@@ -339,9 +482,13 @@ class Atom(object):
 
     def v_translate(self, vec_trans):
         """Translate the atom by some vector."""
-        self.x += vec_trans[0]
-        self.y += vec_trans[1]
-        self.z += vec_trans[2]
+        if self._mol is None:
+            self._x += vec_trans[0]
+            self._y += vec_trans[1]
+            self._z += vec_trans[2]
+        else:
+            self._mol._coords[self._idx] += vec_trans[:3]
+            self._mol._touch()
         return
 
     def set_connectivity(self, in_atoms, in_row):
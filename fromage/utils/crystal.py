@@ -0,0 +1,322 @@
+"""Defines the MolecularCrystal object"""
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from fromage.utils.dimer import make_dimer
+from fromage.utils.lattice import get_lattice
+from fromage.utils.supercell import image_translations
+
+
+class NotMolecularError(ValueError):
+    """Raised when a cell cannot be split into discrete molecules"""
+
+
+def make_crystal(cell):
+    """
+    Build a MolecularCrystal object
+
+    Parameters
+    ----------
+    cell : Mol object
+        Unit cell with lattice vectors
+    Returns
+    -------
+    crystal : MolecularCrystal object
+        The molecules of the cell and their lattice
+
+    """
+    crystal = MolecularCrystal(cell)
+    return crystal
+
+
+class MolecularCrystal(object):
+    """
+    Object representing a crystal as whole molecules and lattice translations
+
+    Each molecule of the unit cell is stored once, made whole, and any other
+    molecule of the crystal is referred to by the label of its molecule in the
+    cell and an integer shift in units of the lattice vectors. Queries about
+    the neighbourhood of a molecule or a point work on these labels and shifts
+    with the molecular centroids and extents, and only look at atoms when the
+    bounding spheres are not enough. The atoms of an image are only made when
+    it is asked for with image or dimer.
+
+    The molecules are those of Mol.complete_cell, in the same order. The crystal
+    has to be made of discrete molecules, not of polymers or networks, and the
+    cell has to be wider than two bonds in every direction, otherwise
+    NotMolecularError is raised.
+
+    Attributes
+    ----------
+    cell : Mol object
+        Copy of the unit cell
+    vectors : 3 x 3 numpy array
+        Lattice vectors as rows
+    lattice : Lattice object
+        Lattice of the vectors
+    molecules : list of Mol objects
+        The whole molecules of the cell, with the lattice vectors of the cell
+    atom_indices : list of numpy arrays of ints
+        The indices in the cell of the atoms of each molecule
+    atom_images : list of Nat x 3 numpy arrays of ints
+        The lattice shift of each atom of the cell which makes its molecule
+        whole
+    centroids : Nmol x 3 numpy array
+        Centroid of each molecule
+    extents : numpy array of Nmol floats
+        Largest distance between the centroid of a molecule and its atoms
+    kinds : numpy array of Nmol ints
+        Molecules with the same kind have the same bond graph, in the sense of
+        Mol.fingerprints
+
+    """
+    def __init__(self, cell):
+        molecules = cell._whole_molecules()
+        if molecules is None:
+            raise NotMolecularError("The cell cannot be split into discrete molecules")
+        self.cell = cell.copy()
+        self.vectors = np.array(cell.vectors, dtype=float)
+        self.lattice = get_lattice(self.vectors)
+        self.atom_indices = [atoms for atoms, images in molecules]
+        self.atom_images = [images for atoms, images in molecules]
+        self.molecules = []
+        for atoms, images in molecules:
+            mol = self.cell.sub_mol(atoms)
+            mol._shift_coords(image_translations(images, self.vectors))
+            self.molecules.append(mol)
+        self.centroids = np.array([mol.centroid() for mol in self.molecules]).reshape(-1, 3)
+        self.extents = np.array([np.max(np.linalg.norm(mol.coords - cen, axis=1))
+                                 for mol, cen in zip(self.molecules, self.centroids)])
+        fingerprints = self.cell.fingerprints(self.atom_indices)
+        self.kinds = np.unique(fingerprints, return_inverse=True)[1].reshape(-1)
+
+    def __len__(self):
+        return len(self.molecules)
+
+    def __repr__(self):
+        return "MolecularCrystal of {} molecules of {} kinds".format(
+            len(self), len(np.unique(self.kinds)))
+
+    def axes(self):
+        """
+        Return the principal, secondary and perpendicular axes of each molecule
+
+        Returns
+        -------
+        axes_out : Nmol x 3 x 3 numpy array
+            The axes of each molecule, see Mol.axes. They are the same for all
+            images of a molecule
+
+        """
+        return np.array([mol.axes() for mol in self.molecules])
+
+    def image(self, label, shift=(0, 0, 0)):
+        """
+        Return an image of a molecule of the cell
+
+        Parameters
+        ----------
+        label : int
+            The molecule of the cell
+        shift : array-like of 3 ints
+            The translation of the image in units of lattice vectors
+        Returns
+        -------
+        out_mol : Mol object
+            New Mol of the image
+
+        """
+        out_mol = self.molecules[label].copy()
+        if np.any(shift):
+            out_mol.translate(image_translations(shift, self.vectors)[0])
+        return out_mol
+
+    def _shifts_near(self, disp, cutoff):
+        """
+        Return the shifts which bring displacements within a cutoff
+
+        Parameters
+        ----------
+        disp : N x 3 numpy array
+            Displacement vectors
+        cutoff : float
+            Largest length of the translated displacements
+        Returns
+        -------
+        shifts : Nshifts x 3 numpy array of ints
+            All shifts such that disp[i] + shift . vectors is no longer than
+            cutoff for some i, and possibly a few more
+
+        """
+        frac = self.lattice.to_frac(disp).reshape(-1, 3)
+        # a fractional coordinate k can be at most cutoff / width k from zero
+        reach = max(cutoff, 0) / self.lattice.widths
+        low = np.floor(np.min(-frac, axis=0) - reach).astype(int)
+        high = np.ceil(np.max(-frac, axis=0) + reach).astype(int)
+        ranges = [np.arange(low[i], high[i] + 1) for i in range(3)]
+        shifts = np.array(np.meshgrid(*ranges, indexing='ij')).reshape(3, -1).T
+        return shifts
+
+    def _atomic_distance(self, label_a, label_b, shifts, mode='dis'):
+        """
+        Return the closest atomic distances between a molecule and images
+
+        Parameters
+        ----------
+        label_a, label_b : ints
+            The molecules of the cell
+        shifts : Nshifts x 3 numpy array of ints
+            The images of molecule b
+        mode : str
+            'dis', 'cov' or 'vdw', see Atom.dist
+        Returns
+        -------
+        dists : numpy array of Nshifts floats
+            The shortest distance between molecule a and each image of b
+
+        """
+        mol_a = self.molecules[label_a]
+        mol_b = self.molecules[label_b]
+        n_b = len(mol_b)
+        images = (mol_b.coords[np.newaxis, :, :] +
+                  image_translations(shifts, self.vectors)[:, np.newaxis, :]).reshape(-1, 3)
+        dists = cdist(mol_a.coords, images)
+        dists -= mol_a.radii(mode)[:, np.newaxis] + np.tile(mol_b.radii(mode), len(shifts))
+        return np.min(dists.reshape(len(mol_a), -1, n_b), axis=(0, 2))
+
+    def molecules_within(self, center, radius, method='centroid'):
+        """
+        Return the molecules of the crystal within a radius of a point
+
+        Parameters
+        ----------
+        center : array-like of 3 floats
+            Cartesian position
+        radius : float
+            Molecules which are no farther than radius are kept
+        method : str (optional)
+            'centroid' or 'atomic' respectively use the distance to the centroid
+            and to the closest atom of each molecule. Default 'centroid'
+        Returns
+        -------
+        labels : numpy array of ints
+            The molecule of the cell of each molecule within the radius
+        shifts : N x 3 numpy array of ints
+            The lattice shift of each molecule within the radius
+        dists : numpy array of floats
+            The distance of each molecule to the point
+
+        """
+        if method not in ('centroid', 'atomic'):
+            raise ValueError("The only methods available are 'atomic' and 'centroid'.\
+        You requested: " + str(method))
+        center = np.asarray(center, dtype=float).reshape(3)
+        disp = self.centroids - center
+        # the atoms are within extent of the centroid
+        pad = np.max(self.extents) if method == 'atomic' and len(self) else 0
+        shifts = self._shifts_near(disp, radius + pad)
+        trans = image_translations(shifts, self.vectors)
+        labels, shifts_out, dists_out = [], [], []
+        for label in range(len(self)):
+            cen_dists = np.linalg.norm(disp[label] + trans, axis=1)
+            if method == 'centroid':
+                near = cen_dists <= radius
+                dists = cen_dists[near]
+            else:
+                near = np.flatnonzero(cen_dists - self.extents[label] <= radius + 1e-6)
+                pos = (self.molecules[label].coords[np.newaxis, :, :] +
+                       trans[near, np.newaxis, :])
+                dists = np.min(np.linalg.norm(pos - center, axis=2), axis=1)
+                near, dists = near[dists <= radius], dists[dists <= radius]
+            labels.append(np.full(len(dists), label))
+            shifts_out.append(shifts[near])
+            dists_out.append(dists)
+        if not labels:
+            return np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int), np.zeros(0)
+        return np.concatenate(labels), np.concatenate(shifts_out), np.concatenate(dists_out)
+
+    def dimers_within(self, radius, method='centroid', mode='dis'):
+        """
+        Return the dimers of the crystal whose molecules are within a distance
+
+        Each dimer is given once, by a molecule of the cell and an image of a
+        molecule of the cell, which is the same or has a higher label. A
+        molecule and its images are also dimers.
+
+        Parameters
+        ----------
+        radius : float
+            Dimers whose intermolecular distance is no larger are kept
+        method : str (optional)
+            'centroid' or 'atomic', see Dimer.inter_distance. Default 'centroid'
+        mode : str (optional)
+            'dis', 'cov' or 'vdw' scaling of the atomic distances. Default 'dis'
+        Returns
+        -------
+        labels_a : numpy array of ints
+            The first molecule of each dimer, untranslated
+        labels_b : numpy array of ints
+            The molecule of the cell of the second molecule of each dimer
+        shifts : N x 3 numpy array of ints
+            The lattice shift of the second molecule of each dimer
+        dists : numpy array of floats
+            The intermolecular distance of each dimer
+
+        """
+        if method not in ('centroid', 'atomic'):
+            raise ValueError("The only methods available are 'atomic' and 'centroid'.\
+        You requested: " + str(method))
+        labels_a, labels_b, shifts_out, dists_out = [], [], [], []
+        if method == 'atomic' and len(self):
+            # the largest amount by which the radii can shorten a distance
+            rad_pad = 2 * max(max(np.max(mol.radii(mode)) for mol in self.molecules), 0)
+            pad = 2 * np.max(self.extents) + rad_pad
+        else:
+            pad = 0
+        for label_a in range(len(self)):
+            disp = self.centroids[label_a:] - self.centroids[label_a]
+            shifts = self._shifts_near(disp, radius + pad)
+            trans = image_translations(shifts, self.vectors)
+            # each pair of images of the same molecule once
+            first = shifts[np.arange(len(shifts)), np.argmax(shifts != 0, axis=1)]
+            positive = first > 0
+            for label_b in range(label_a, len(self)):
+                cen_dists = np.linalg.norm(disp[label_b - label_a] + trans, axis=1)
+                candidates = positive if label_b == label_a else np.ones(len(shifts), dtype=bool)
+                if method == 'centroid':
+                    near = np.flatnonzero(candidates & (cen_dists <= radius))
+                    dists = cen_dists[near]
+                else:
+                    bound = self.extents[label_a] + self.extents[label_b] + rad_pad
+                    near = np.flatnonzero(candidates & (cen_dists - bound <= radius + 1e-6))
+                    dists = self._atomic_distance(label_a, label_b, shifts[near], mode=mode)
+                    near, dists = near[dists <= radius], dists[dists <= radius]
+                labels_a.append(np.full(len(near), label_a))
+                labels_b.append(np.full(len(near), label_b))
+                shifts_out.append(shifts[near])
+                dists_out.append(dists)
+        if not labels_a:
+            return (np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                    np.zeros((0, 3), dtype=int), np.zeros(0))
+        return (np.concatenate(labels_a), np.concatenate(labels_b),
+                np.concatenate(shifts_out), np.concatenate(dists_out))
+
+    def dimer(self, label_a, label_b, shift=(0, 0, 0)):
+        """
+        Return a Dimer of a molecule of the cell and an image of another
+
+        Parameters
+        ----------
+        label_a, label_b : ints
+            The molecules of the cell
+        shift : array-like of 3 ints
+            The translation of the image of molecule b in units of lattice
+            vectors
+        Returns
+        -------
+        dimer : Dimer object
+            New Dimer of the two molecules
+
+        """
+        return make_dimer(self.image(label_a), self.image(label_b, shift))
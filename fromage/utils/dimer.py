@@ -4,6 +4,7 @@ The class represents pairs of Mol objects
 import fromage.utils.array_operations as ao
 import numpy as np
 from scipy.spatial.distance import cdist
+from fromage.utils.lattice import get_lattice
 
 def make_dimer(mol_a,mol_b):
     """
@@ -76,10 +77,9 @@ class Dimer(object):
             The three angles alpha, beta, gamma
 
         """
-        if np.count_nonzero(self.mol_a.geom.perp_ax) == 0:
-            self.mol_a.calc_axes()
-        if np.count_nonzero(self.mol_b.geom.perp_ax) == 0:
-            self.mol_b.calc_axes()
+        # cheap if the axes are up to date, see Mol.axes
+        self.mol_a.calc_axes()
+        self.mol_b.calc_axes()
         out_lis = [ao.vec_angle(self.mol_a.geom.prin_ax,self.mol_b.geom.prin_ax),
                     ao.vec_angle(self.mol_a.geom.sec_ax,self.mol_b.geom.sec_ax),
                     ao.vec_angle(self.mol_a.geom.perp_ax,self.mol_b.geom.perp_ax)]
@@ -105,10 +105,9 @@ class Dimer(object):
             The slip angle
 
         """
-        if np.count_nonzero(self.mol_a.geom.perp_ax) == 0:
-            self.mol_a.calc_axes()
-        if np.count_nonzero(self.mol_b.geom.perp_ax) == 0:
-            self.mol_b.calc_axes()
+        # cheap if the axes are up to date, see Mol.axes
+        self.mol_a.calc_axes()
+        self.mol_b.calc_axes()
         # vector gonig from A to B
         cen_cen = self.mol_b.centroid() - self.mol_a.centroid()
         # test angle with positive cen_cen and negative cen_cen. keep smallest
@@ -202,11 +201,13 @@ class Dimer(object):
 
     def images(self, vectors):
         """
-        Return the 27 images of the dimer produced by translating monomer 2
+        Return the images of the dimer produced by translating monomer 2
 
-        Monomer 2 is translated in every combination of -a,0,a ; -b,0,b and
-        -c,0,c. This includes the (0,0,0) translation which is the original
-        dimer.
+        For a reduced cell, monomer 2 is translated in every combination of
+        -a,0,a ; -b,0,b and -c,0,c, giving 27 images. Skewed cells use the
+        equivalent translations of their reduced cell instead, see
+        Lattice.shifts. This includes the (0,0,0) translation which is the
+        original dimer.
 
         Parameters
         ----------
@@ -214,24 +215,18 @@ class Dimer(object):
             Vectors of the lattice periodicity
         Returns
         -------
-        images : list of 27 Dimer objects
-            The 27 images of the dimer, always with mol_a remaining in first
+        images : list of Dimer objects
+            The images of the dimer, always with mol_a remaining in first
             position.
 
         """
-        translations = [-1,0,1]
         static_mol = self.mol_a
         moving_mol = self.mol_b
         images = []
-        for tra_a in translations:
-            for tra_b in translations:
-                    for tra_c in translations:
-                        vector = vectors[0] * tra_a + \
-                                 vectors[1] * tra_b + \
-                                 vectors[2] * tra_c
-                        mol_image = moving_mol.translated(vector)
-                        new_dimer = Dimer(static_mol,mol_image)
-                        images.append(new_dimer)
+        for vector in get_lattice(vectors).translations:
+            mol_image = moving_mol.translated(vector)
+            new_dimer = Dimer(static_mol,mol_image)
+            images.append(new_dimer)
         return images
 
     def sorted_inter_distances(self):
@@ -0,0 +1,316 @@
+"""Defines the Lattice object"""
+
+import numpy as np
+
+
+def reduce_vectors(vectors):
+    """
+    Return a reduced set of lattice vectors describing the same lattice
+
+    Each vector is repeatedly replaced by its sum with integer multiples of the
+    other two whenever that makes it shorter, until no vector can be shortened
+    this way. The reduced vectors are then short and close to orthogonal, such
+    that the closest periodic images of a point are found among the neighbouring
+    cells. The order and handedness of the vectors are kept and vectors which
+    are already reduced are returned unchanged.
+
+    Parameters
+    ----------
+    vectors : 3 x 3 array-like
+        Lattice vectors as rows
+    Returns
+    -------
+    reduced : 3 x 3 numpy array
+        Reduced lattice vectors as rows
+    transform : 3 x 3 numpy array of ints
+        Unimodular matrix such that reduced = transform . vectors. Fractional
+        coordinates in the reduced setting go back to the original setting with
+        frac = frac_reduced . transform
+
+    """
+    basis = np.array(vectors, dtype=float)
+    transform = np.eye(3, dtype=int)
+    # combinations of the two other vectors which can shorten a vector
+    combinations = [(j, k) for j in (-1, 0, 1) for k in (-1, 0, 1) if (j, k) != (0, 0)]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(3):
+            j, k = [m for m in range(3) if m != i]
+            # project out the plane of the two others as far as integers allow
+            plane = basis[[j, k]]
+            coeffs = np.linalg.lstsq(plane.T, basis[i], rcond=None)[0]
+            best = basis[i]
+            best_mult = np.zeros(2, dtype=int)
+            for start in (np.floor(coeffs), np.ceil(coeffs)):
+                for shift in [(0, 0)] + combinations:
+                    mult = (start + shift).astype(int)
+                    candidate = basis[i] - np.dot(mult, plane)
+                    # the small tolerance keeps cells which are already reduced
+                    if np.dot(candidate, candidate) < np.dot(best, best) * (1 - 1e-10):
+                        best = candidate
+                        best_mult = mult
+            if np.any(best_mult):
+                basis[i] = best
+                transform[i] -= best_mult[0] * transform[j] + best_mult[1] * transform[k]
+                changed = True
+    return basis, transform
+
+
+class Lattice(object):
+    """
+    Object representing the lattice vectors of a periodic system.
+
+    All of the quantities which depend only on the lattice vectors are computed
+    once when the Lattice is made, so that converting many positions to and from
+    fractional coordinates or looking for their periodic images is a handful of
+    matrix products. Lattices are usually obtained with get_lattice, or as the
+    lattice attribute of a Mol, which reuse the Lattice of the same vectors.
+
+    Fractional coordinates are always in the setting of the given vectors but
+    the periodic images are searched for in a reduced setting of the same
+    lattice (see reduce_vectors). The set of images is the smallest one which
+    is guaranteed to contain the closest image, so that the searches are
+    correct even for very skewed cells.
+
+    Attributes
+    ----------
+    vectors : 3 x 3 numpy array
+        Lattice vectors as rows
+    inverse : 3 x 3 numpy array
+        Inverse of vectors, such that frac = cart . inverse
+    reciprocal : 3 x 3 numpy array
+        Reciprocal vectors as rows without the 2 pi factor, such that
+        vectors . reciprocal.T is the identity
+    volume : float
+        Volume of the unit cell
+    widths : numpy array of 3 floats
+        Distance between the two faces of the cell parallel to the other two
+        lattice vectors, for each lattice vector
+    reduced : 3 x 3 numpy array
+        Reduced lattice vectors, see reduce_vectors
+    reduction : 3 x 3 numpy array of ints
+        reduced = reduction . vectors
+    order : int
+        Translations of the reduced vectors by -order to order are enough to
+        find the closest image of any point
+    shifts : Nimages x 3 numpy array of ints
+        The translations of the cell needed to find closest images, in units of
+        the lattice vectors. For a reduced cell, these are the 27 translations
+        by -1, 0 and 1 of each lattice vector, with the last varying fastest
+    translations : Nimages x 3 numpy array
+        The Cartesian vectors corresponding to the shifts
+
+    """
+    def __init__(self, vectors):
+        self.vectors = np.array(vectors, dtype=float)
+        self.inverse = np.linalg.inv(self.vectors.T).T
+        self.reciprocal = self.inverse.T
+        self.volume = abs(np.linalg.det(self.vectors))
+        self.widths = 1 / np.linalg.norm(self.reciprocal, axis=1)
+
+        self.reduced, self.reduction = reduce_vectors(self.vectors)
+        self._reduced_inverse = np.linalg.inv(self.reduced)
+        self._reduced_widths = 1 / np.linalg.norm(self._reduced_inverse, axis=0)
+        # any point is within this distance of one of its images since the
+        # cell centred on it contains one, and the farthest point of the cell
+        # is a corner
+        corners = 0.5 * np.dot(np.array([[1, 1, 1], [1, 1, -1], [1, -1, 1], [-1, 1, 1]]),
+                               self.reduced)
+        covering_bound = np.max(np.linalg.norm(corners, axis=1))
+        # the fractional coordinate i of a vector is at most its length over
+        # width i, and the images to consider are centred to within 0.5
+        self.order = int(max(1, np.max(np.floor(covering_bound / self._reduced_widths + 0.5))))
+        self.shifts, self.translations = self._reduced_images(self.image_shifts(self.order))
+
+    @staticmethod
+    def image_shifts(order=1):
+        """
+        Return the translations of the cell up to some order
+
+        Parameters
+        ----------
+        order : positive int or array-like of 3 ints
+            Order 1 considers a translation by -1, 0 and 1 of each lattice
+            vector and all resulting combinations. Order 2 is [-2, -1, 0, 1, 2]
+            and so on. Can be different for each lattice vector
+        Returns
+        -------
+        shifts : Nimages x 3 numpy array of ints
+            The translations in units of lattice vectors
+
+        """
+        order = np.broadcast_to(order, (3,))
+        ranges = [np.arange(-i, i + 1) for i in order]
+        shifts = np.array(np.meshgrid(*ranges, indexing='ij')).reshape(3, -1).T
+        return shifts
+
+    def _reduced_images(self, reduced_shifts):
+        """Convert shifts of the reduced vectors to shifts and translations"""
+        shifts = np.dot(reduced_shifts, self.reduction)
+        translations = np.dot(reduced_shifts, self.reduced)
+        return shifts, translations
+
+    def images_within(self, cutoff):
+        """
+        Return the translations needed to find all images within a distance
+
+        Any pair of points put in the cell with wrap(reduced=True) which has an
+        image within cutoff of the other point is found with these translations.
+
+        Parameters
+        ----------
+        cutoff : float
+            The largest distance of interest in Angstrom
+        Returns
+        -------
+        shifts : Nimages x 3 numpy array of ints
+            The translations in units of the lattice vectors
+        translations : Nimages x 3 numpy array
+            The Cartesian vectors corresponding to the shifts
+
+        """
+        order = np.floor(max(cutoff, 0) / self._reduced_widths).astype(int) + 1
+        return self._reduced_images(self.image_shifts(order))
+
+    def to_frac(self, coords):
+        """Return the fractional coordinates of Cartesian positions"""
+        return np.dot(coords, self.inverse)
+
+    def to_cart(self, frac):
+        """Return the Cartesian coordinates of fractional positions"""
+        return np.dot(frac, self.vectors)
+
+    def wrap(self, coords, return_shifts=False, reduced=False):
+        """
+        Put Cartesian positions inside the parallelepiped cell
+
+        Parameters
+        ----------
+        coords : N x 3 array-like
+            Cartesian positions
+        return_shifts : bool
+            Also return the number of lattice vectors by which each position was
+            translated
+        reduced : bool
+            Use the cell of the reduced vectors instead, which is the one used
+            for the image searches
+        Returns
+        -------
+        in_cell : N x 3 numpy array
+            The positions with fractional coordinates in the range [0,1)
+        shifts : N x 3 numpy array of ints (optional)
+            in_cell = coords + shifts . vectors
+
+        """
+        if reduced:
+            frac = np.dot(coords, self._reduced_inverse)
+            in_cell = np.dot(np.mod(frac, 1), self.reduced)
+            shifts = -np.dot(np.floor(frac).astype(int), self.reduction)
+        else:
+            frac = self.to_frac(coords)
+            in_cell = self.to_cart(np.mod(frac, 1))
+            shifts = -np.floor(frac).astype(int)
+        if return_shifts:
+            return in_cell, shifts
+        return in_cell
+
+    def image_distances(self, coords_a, coords_b):
+        """
+        Return the distances to the candidate closest images of positions
+
+        For each pair of positions, the image of coords_b closest to coords_a
+        in fractional coordinates is found and then translated by each of the
+        translations. The closest image is among them.
+
+        Parameters
+        ----------
+        coords_a : N x 3 array-like
+            Cartesian positions
+        coords_b : M x 3 array-like
+            Cartesian positions
+        Returns
+        -------
+        all_dists : Nimages x N x M numpy array
+            all_dists[k,i,j] is the distance between coords_a[i] and the k-th
+            image of coords_b[j]
+        images : Nimages x N x M x 3 numpy array
+            The Cartesian positions of the images of coords_b
+
+        """
+        coords_a = np.asarray(coords_a, dtype=float).reshape(-1, 3)
+        coords_b = np.asarray(coords_b, dtype=float).reshape(-1, 3)
+        # N x M x 3 separation vectors, centred in the reduced setting
+        sep = coords_b[np.newaxis, :, :] - coords_a[:, np.newaxis, :]
+        frac = np.dot(sep, self._reduced_inverse)
+        sep = np.dot(frac - np.round(frac), self.reduced)
+        all_sep = sep[np.newaxis] + self.translations[:, np.newaxis, np.newaxis, :]
+        all_dists = np.linalg.norm(all_sep, axis=-1)
+        images = all_sep + coords_a[np.newaxis, :, np.newaxis, :]
+        return all_dists, images
+
+    def min_image_distances(self, coords_a, coords_b, return_images=False):
+        """
+        Return the shortest periodic distances between two sets of positions
+
+        The images are those of image_distances, which needs memory for
+        Nimages x N x M distances.
+
+        Parameters
+        ----------
+        coords_a : N x 3 array-like
+            Cartesian positions
+        coords_b : M x 3 array-like
+            Cartesian positions
+        return_images : bool
+            Also return the closest image of each position of coords_b to each
+            position of coords_a
+        Returns
+        -------
+        dists : N x M numpy array
+            The shortest distance between each pair
+        img_pos : N x M x 3 numpy array (optional)
+            The Cartesian position of the closest image of coords_b[j] to
+            coords_a[i]. Ties are broken in favour of the last image in
+            translations, as in Atom.per_dist
+
+        """
+        all_dists, images = self.image_distances(coords_a, coords_b)
+        n_img = len(images)
+        # the last of the closest images
+        closest = n_img - 1 - np.argmin(all_dists[::-1], axis=0)
+        dists = np.take_along_axis(all_dists, closest[np.newaxis], axis=0)[0]
+        if return_images:
+            img_pos = np.take_along_axis(images, closest[np.newaxis, :, :, np.newaxis], axis=0)[0]
+            return dists, img_pos
+        return dists
+
+
+# Lattices already made, by the bytes of their vectors
+_lattices = {}
+
+
+def get_lattice(vectors):
+    """
+    Return the Lattice of some lattice vectors, reusing it if possible
+
+    Parameters
+    ----------
+    vectors : 3 x 3 array-like
+        Lattice vectors as rows
+    Returns
+    -------
+    lattice : Lattice object
+        The corresponding Lattice
+
+    """
+    vectors = np.asarray(vectors, dtype=float)
+    key = vectors.tobytes()
+    lattice = _lattices.get(key)
+    if lattice is None:
+        # only keep a few lattices around
+        if len(_lattices) > 32:
+            _lattices.clear()
+        lattice = Lattice(vectors)
+        _lattices[key] = lattice
+    return lattice
@@ -11,6 +11,9 @@ import numpy as np
 from copy import deepcopy
 
 from fromage.utils.atom import Atom
+from fromage.utils.lattice import get_lattice
+from fromage.utils import per_table as per
+from fromage.utils.mol._caching import versioned
 import fromage.io.edit_file as ef
 
 
@@ -44,12 +47,20 @@ class Mol(object):
     unit cells. Although Mol shares many methods with list, it deliberately does
     not inherit it in order to avoid nonsensical operations such as Mol1 > Mol2
 
+    The atomic data is stored in contiguous numpy arrays with one row per atom
+    and the Atom objects of the Mol are views of these rows. See _storage.py.
+
     Attributes
     ----------
     atoms : list of Atom objects
         Member atoms of Mol
+    coords : Nat x 3 numpy array
+        Read-only view of the coordinates of the atoms
     vectors : 3 x 3 numpy array
         Lattice vectors of the unit cell
+    lattice : Lattice object
+        Read-only Lattice of the lattice vectors, with the cell inverse and
+        periodic images precomputed
     bonding : string 'dist, 'cov' or 'vdw'
         The method for detecting bonding in this molecule.
         'dis' : distance between atoms < threshold
@@ -61,18 +72,39 @@ class Mol(object):
         Geometry information, including numpy coordinate array, plane coeffs,
         principal and secondary axes.
 
+    The data derived from the atoms, such as the bond graph, the centroid or the
+    axes, is cached until the atoms, vectors or bonding settings change. See
+    _caching.py.
+
     """
-    from ._listyness import append, extend, insert, remove, index, pop, clear, count, __add__, __len__, __getitem__, __setitem__, __contains__
-    from ._bonding import set_bonding, set_bonding_str, bonded, per_bonded
-    from ._char import es_pot, change_charges, charges, raw_assign_charges, populate, set_connectivity
-    from ._selecting import select, per_select, segregate
-    from ._cell_operations import complete_mol, complete_cell, supercell, centered_supercell, trans_from_rad, supercell_for_cluster, gen_exclusive_clust, gen_inclusive_clust, make_cluster, centered_mols, confined
-    from ._geom import GeomInfo, coord_array, calc_coord_array, plane_coeffs, calc_plane_coeffs, axes, calc_axes
+    from ._storage import columns as _columns
+    from ._storage import _alloc, _reserve, _set_row, _append_atom, _append_rows, _append_images, _delete_rows, _set_coords, _shift_coords, _detach_views, _view, atoms, coords, elem_indices, radii, from_arrays, sub_mol
+    from_arrays = classmethod(from_arrays)
+    from ._listyness import append, extend, insert, remove, index, pop, clear, count, __add__, __len__, __iter__, __getitem__, __setitem__, __contains__
+    from ._caching import _touch, versioned_attribute
+    from ._indexing import _atom_index, _index_append, _index_delete, _matches, close_indices, _close_pairs
+    from ._bonding import set_bonding, set_bonding_str, bonded, per_bonded, max_bond_length, _find_bonds, _bonds, bond_graph, bond_offsets
+    from ._char import es_pot, change_charges, charges, raw_assign_charges, populate, _kind_data, set_connectivity, kind_indices, _refined_colours, refined_colours, fingerprints
+    from ._selecting import select, per_select, molecule_labels, molecule_indices, segregate
+    from ._cell_operations import complete_mol, complete_cell, _make_supercell, supercell, centered_supercell, trans_from_rad, _cluster_trans, supercell_for_cluster, gen_exclusive_clust, gen_inclusive_clust, _whole_molecules, _supercell_cluster, _molecule_copies, _cluster_from_copies, _molecule_cluster, make_cluster, cluster_series, centered_mols, confined
+    from ._geom import GeomInfo, _geom_settings, _coord_array, coord_array, calc_coord_array, _plane_coeffs, plane_coeffs, calc_plane_coeffs, _axes, axes, calc_axes
+
+    # changing these makes the derived data stale, see _caching.py
+    vectors = versioned_attribute("_vectors", "Lattice vectors of the unit cell")
+    bonding = versioned_attribute("_bonding", "The method for detecting bonding")
+    thresh = versioned_attribute("_thresh", "Threshold for the bonding detection")
 
     def __init__(self, in_atoms=[], vectors=np.zeros((3, 3)), bonding='dis', thresh=1.8):
         # In case the user feeds a lone atom:
         if isinstance(in_atoms, Atom):
             in_atoms = [in_atoms]
+        # see _caching.py
+        self._version = 0
+        self._derived = {}
+        # see _indexing.py
+        self._queried_version = -1
+        self._index = None
+        self._alloc(len(in_atoms))
         self.atoms = in_atoms
         self.vectors = vectors
         self.bonding = bonding
@@ -81,13 +113,41 @@ class Mol(object):
 
     def __repr__(self):
         out_str = ""
-        for atom in self.atoms:
+        for atom in self:
             out_str += atom.__str__() + "\n"
         return out_str
 
     def __str__(self):
         return self.__repr__()
 
+    def __deepcopy__(self, memo):
+        new_mol = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new_mol
+        column_names = [column[0] for column in self._columns]
+        for key, value in self.__dict__.items():
+            # the views belong to self, the copy makes its own when needed
+            if key == "_views":
+                new_mol._views = [None] * self._n
+            # the cached data is read-only and the copy has the same version,
+            # so it can be shared
+            elif key == "_derived":
+                new_mol._derived = dict(value)
+            elif key == "_index":
+                new_mol._index = None
+            # only the used rows are copied. The objects in the object columns
+            # are immutable so a shallow copy is enough
+            elif key in column_names:
+                setattr(new_mol, key, value[:self._n].copy())
+            else:
+                setattr(new_mol, key, deepcopy(value, memo))
+        return new_mol
+
+    def __iadd__(self, other_mol):
+        # extend in place like a list would instead of copying self
+        try_ismol(other_mol)
+        self._append_rows(other_mol)
+        return self
+
     def copy(self):
         return deepcopy(self)
 
@@ -102,30 +162,69 @@ class Mol(object):
 
     def write_xyz(self, name):
         """Write an xyz file of the Mol"""
-        ef.write_xyz(name, self.atoms)
+        ef.write_xyz(name, self)
 
     def empty_mol(self):
         """Return an empty mol with the same properties"""
-        new_mol = deepcopy(self)
-        new_mol.atoms = []
+        new_mol = self.__class__([], vectors=np.array(self.vectors, dtype=float),
+                                 bonding=self.bonding, thresh=self.thresh)
+        new_mol.geom = deepcopy(self.geom)
         return new_mol
 
+    @property
+    def lattice(self):
+        """Lattice object of the lattice vectors, see fromage.utils.lattice"""
+        return get_lattice(self.vectors)
+
+    @versioned
+    def _centroid(self):
+        """Return the cached centroid"""
+        centro = np.mean(self._coords[:self._n], axis=0)
+        return centro
+
     def centroid(self):
         """Return np array of the centroid"""
-        N = len(self.atoms)
-        centro = np.array([0.0, 0.0, 0.0])
-        for atom in self.atoms:
-            centro[0] += atom.x
-            centro[1] += atom.y
-            centro[2] += atom.z
-        centro = centro / N
-        return centro
+        return self._centroid().copy()
+
+    @versioned
+    def _center_of_mass(self):
+        """Return the cached centre of mass"""
+        masses = per.masses[self._elem_idx[:self._n]]
+        com = np.dot(masses, self._coords[:self._n]) / np.sum(masses)
+        return com
+
+    def center_of_mass(self):
+        """Return np array of the centre of mass"""
+        return self._center_of_mass().copy()
 
     def center_mol(self):
         """Translate molecules to center"""
-        cen = self.centroid()
-        for atom in self.atoms:
-            atom.v_translate(-cen)
+        cen = self._centroid()
+        self.translate(-cen)
+        return
+
+    def transform(self, matrix=None, translation=None):
+        """
+        Apply an affine transformation to all atoms of the Mol in place
+
+        The new position of each atom is matrix . position + translation. All
+        positions are transformed at once with a single matrix product.
+
+        Parameters
+        ----------
+        matrix : 3 x 3 array-like (optional)
+            Linear transformation, for instance a rotation matrix from
+            array_operations.rotation_matrix. Identity if not supplied
+        translation : 3 x 1 array-like (optional)
+            Translation vector applied after the linear transformation
+
+        """
+        coords = self._coords[:self._n]
+        if matrix is not None:
+            coords[:] = np.dot(coords, np.asarray(matrix, dtype=float).T)
+        if translation is not None:
+            coords += np.asarray(translation, dtype=float)[:3]
+        self._touch()
         return
 
     def translate(self, vector):
@@ -138,8 +237,7 @@ class Mol(object):
             Translation vector
 
         """
-        for atom in self.atoms:
-            atom.v_translate(vector)
+        self.transform(translation=vector)
         return
 
     def translated(self, vector):
@@ -158,51 +256,75 @@ class Mol(object):
 
         """
         new_mol = self.copy()
-        for atom in new_mol.atoms:
-            atom.v_translate(vector)
+        new_mol.translate(vector)
         return new_mol
 
-    def remove_duplicates(self, thresh=0.001):
-        """Remove the duplicate atoms"""
-        purged_mol = Mol([self.atoms[0]])
-        for atom_a in self[1:]:
-            unique = True
-            for atom_b in purged_mol:
-                if atom_a.very_close(atom_b, thresh=thresh):
-                    unique = False
-                    break
-            if unique:
-                purged_mol.append(atom_a)
-        self.atoms = purged_mol
+    def remove_duplicates(self, thresh=0.001, periodic=False):
+        """
+        Remove the duplicate atoms
+
+        Going through the atoms in order, an atom is removed if it is very
+        close, in the sense of Atom.very_close, to an atom which was kept
+        before it. The close pairs are found with a KD-tree.
+
+        Parameters
+        ----------
+        thresh : float
+            Largest difference allowed in each Cartesian coordinate
+        periodic : bool
+            If True, atoms are also duplicates of the images of the others
+            through the lattice vectors, for instance on opposite faces of the
+            cell
+        Returns
+        -------
+        kept : numpy array of ints
+            The former indices of the remaining atoms
+        merged : numpy array of ints
+            For each former atom, the index of the remaining atom it is a
+            duplicate of, or its own new index if it remains
+
+        """
+        rows, cols = self._close_pairs(thresh=thresh, periodic=periodic)
+        # for each former atom, the former index of the atom it merges into
+        target = np.arange(len(self))
+        # the pairs are sorted by their later atom, so whether the earlier one
+        # is kept is already known
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            if target[col] == col and target[row] == row:
+                target[col] = row
+        kept = np.flatnonzero(target == np.arange(len(self)))
+        new_index = np.zeros(len(self), dtype=int)
+        new_index[kept] = np.arange(len(kept))
+        merged = new_index[target]
+        self._delete_rows(np.flatnonzero(target != np.arange(len(self))))
+        return kept, merged
+
+    def wrap(self):
+        """Move all atoms inside the primitive cell, in place"""
+        lattice = self.lattice
+        frac_pos = lattice.to_frac(self._coords[:self._n])
+        # translate the coordinates out of range to the range [0,1]
+        out_range = (frac_pos < 0) | (frac_pos > 1)
+        frac_pos[out_range] %= 1
+        self._set_coords(lattice.to_cart(frac_pos))
         return
 
     def dir_to_frac_pos(self):
         """New mol with atoms in fractional coordinates"""
-
         out_mol = self.copy()
-        # transpose to get the transformation matrix
-        M = np.transpose(self.vectors)
-        # inverse transformation matrix
-        U = np.linalg.inv(M)
-
-        for atom in out_mol:
-            # change of basis transformation
-            dir_pos = atom.get_pos()
-            frac_pos = np.dot(U, dir_pos)
-            for i, coord in enumerate(frac_pos):
-                # if the coordinate is out of range
-                if coord < 0 or coord > 1:
-                    # translate it to the range [0,1]
-                    frac_pos[i] = coord % 1
-            atom.set_pos(frac_pos)
+        # change of basis transformation for all atoms at once
+        out_mol.transform(self.lattice.inverse.T)
+        frac_pos = out_mol.coords.copy()
+        # translate the coordinates out of range to the range [0,1]
+        out_range = (frac_pos < 0) | (frac_pos > 1)
+        frac_pos[out_range] %= 1
+        out_mol._set_coords(frac_pos)
         return out_mol
 
     def frac_to_dir_pos(self):
         """Move all atoms to direct coordinates"""
         out_mol = self.copy()
-        for atom in out_mol:
-            new_pos = np.matmul(self.vectors.T, atom.get_pos())
-            atom.set_pos(new_pos)
+        out_mol.transform(self.lattice.vectors.T)
 
         return out_mol
 
@@ -222,11 +344,9 @@ class Mol(object):
             raise ValueError(
                 "Trying to split a Mol with an odd number of atoms")
 
-        mol_a = self.copy()
-        mol_b = self.copy()
-
         dim_len = len(self)
-        mol_a.atoms = self[:int(dim_len / 2)]
-        mol_b.atoms = self[-int(dim_len / 2):]
+        half = int(dim_len / 2)
+        mol_a = self.sub_mol(np.arange(half))
+        mol_b = self.sub_mol(np.arange(dim_len - half, dim_len))
 
         return mol_a, mol_b
@@ -1,3 +1,9 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+from fromage.utils.mol._caching import versioned
+
 default_thresh = {'dis': 1.8,
                   'cov': 0.2,
                   'vdw': -0.3}
@@ -110,3 +116,162 @@ def per_bonded(self, atom_a, atom_b):
     bonded_bool = atom_a.per_dist(
         atom_b, self.vectors, ref=self.bonding) <= self.thresh
     return bonded_bool
+
+
+def max_bond_length(self):
+    """
+    Return the largest distance between atom centres which can be a bond
+
+    This bounds the neighbour search: with 'cov' or 'vdw' bonding, two atoms
+    can at most be thresh + twice the largest radius of the Mol apart.
+
+    Returns
+    -------
+    max_len : float
+        The largest possible bond length in Angstrom
+
+    """
+    radii = self.radii(self.bonding)
+    if len(radii) == 0:
+        return self.thresh
+    max_len = self.thresh + 2 * np.max(radii)
+    return max_len
+
+
+def _find_bonds(self, periodic):
+    """
+    Return the bonded pairs of atoms
+
+    Only pairs of atoms closer than max_bond_length are examined, using a
+    KD-tree, so that the cost is linear with the amount of atoms.
+
+    Parameters
+    ----------
+    periodic : bool
+        If True, use the shortest distance to the images of the atoms in the
+        neighbouring cells as in per_bonded
+    Returns
+    -------
+    rows, cols : numpy arrays of ints
+        Atom rows[k] is bonded to atom cols[k]. Each pair appears once and no
+        atom is bonded to itself
+    offsets : Npairs x 3 numpy array of ints
+        The image of atom cols[k] bonded to atom rows[k] is translated by
+        offsets[k] lattice vectors. Always zero if not periodic
+
+    """
+    n_at = self._n
+    coords = self._coords[:n_at]
+    radii = self.radii(self.bonding)
+    cutoff = self.max_bond_length()
+    if n_at == 0 or cutoff < 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+
+    if periodic:
+        lattice = self.lattice
+        # put all atoms in the reduced cell, where few images need checking
+        in_cell, cell_shifts = lattice.wrap(coords, return_shifts=True, reduced=True)
+        # usually the 27 images of the cell in -1, 0 and 1 of each vector
+        shifts, translations = lattice.images_within(cutoff)
+        images = (in_cell[np.newaxis, :, :] +
+                  translations[:, np.newaxis, :]).reshape(-1, 3)
+        close = cKDTree(in_cell).sparse_distance_matrix(
+            cKDTree(images), cutoff, output_type='ndarray')
+        rows = close['i']
+        cols = close['j'] % n_at
+        dists = close['v']
+        # image of the unwrapped atom cols bonded to the unwrapped atom rows
+        offsets = shifts[close['j'] // n_at] - cell_shifts[rows] + cell_shifts[cols]
+    else:
+        pairs = cKDTree(coords).query_pairs(cutoff, output_type='ndarray')
+        rows = pairs[:, 0]
+        cols = pairs[:, 1]
+        dists = np.sqrt(np.sum(np.square(coords[rows] - coords[cols]), axis=1))
+        offsets = np.zeros((len(rows), 3), dtype=int)
+
+    bonded = (dists - radii[rows] - radii[cols] <= self.thresh) & (rows != cols)
+    # each pair once, with rows < cols
+    flip = rows > cols
+    rows, cols = np.where(flip, cols, rows), np.where(flip, rows, cols)
+    offsets = np.where(flip[:, np.newaxis], -offsets, offsets)
+    rows, cols, offsets, dists = rows[bonded], cols[bonded], offsets[bonded], dists[bonded]
+    # a pair may be bonded through several images, keep the closest one
+    pair_ids = rows * n_at + cols
+    order = np.lexsort((dists, pair_ids))
+    first = np.unique(pair_ids[order], return_index=True)[1]
+    keep = order[first]
+    return rows[keep], cols[keep], offsets[keep]
+
+
+@versioned
+def _bonds(self, periodic):
+    """
+    Return the bond graph and the lattice offsets of its bonds
+
+    The result is kept and reused as long as the coordinates, elements, lattice
+    vectors and bonding settings of the Mol are unchanged.
+
+    Parameters
+    ----------
+    periodic : bool
+        If True, atoms are bonded through the lattice vectors as in per_bonded
+    Returns
+    -------
+    graph : Nat x Nat scipy.sparse.csr_matrix of bools
+        See bond_graph
+    offsets : Nbonds x 3 numpy array of ints
+        offsets[k] is the lattice image offset of the bond stored in
+        graph.indices[k]
+
+    """
+    rows, cols, offsets = self._find_bonds(periodic)
+    n_at = self._n
+    # both directions of each bond, sorted by row and then column
+    all_rows = np.concatenate((rows, cols))
+    all_cols = np.concatenate((cols, rows))
+    all_offsets = np.concatenate((offsets, -offsets))
+    order = np.lexsort((all_cols, all_rows))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(all_rows, minlength=n_at))))
+    graph = csr_matrix((np.ones(len(order), dtype=bool), all_cols[order], indptr),
+                       shape=(n_at, n_at))
+    offsets = all_offsets[order]
+    return graph, offsets
+
+
+def bond_graph(self, periodic=False):
+    """
+    Return the sparse adjacency matrix of the bonds in the Mol
+
+    The graph is kept and reused as long as the coordinates, elements, lattice
+    vectors and bonding settings of the Mol are unchanged.
+
+    Parameters
+    ----------
+    periodic : bool
+        If True, atoms are bonded through the lattice vectors as in per_bonded
+    Returns
+    -------
+    graph : Nat x Nat scipy.sparse.csr_matrix of bools
+        graph[i,j] is True if atoms i and j are bonded. The diagonal is empty
+        and the column indices of each row are sorted
+
+    """
+    return self._bonds(periodic)[0]
+
+
+def bond_offsets(self):
+    """
+    Return the lattice image offsets of the periodic bonds
+
+    Atom j translated by offsets[k] lattice vectors is the image bonded to atom
+    i, where k is the position of the bond (i, j) in the sparse structure of
+    bond_graph(periodic=True), i.e. bond_graph(periodic=True).indices[k] == j.
+    The offsets are antisymmetric: the bond (j, i) has the opposite offset.
+
+    Returns
+    -------
+    offsets : Nbonds x 3 numpy array of ints
+        The lattice image offset of each bond
+
+    """
+    return self._bonds(True)[1]
@@ -0,0 +1,86 @@
+"""Version counter of Mol and the cache of the data derived from the atoms
+
+Every change to the coordinates, elements, order of the atoms, lattice vectors
+or bonding settings of a Mol increments its version. Quantities which only
+depend on these, such as the bond graph, the atom kinds, the centroid or the
+principal axes, are computed the first time they are needed and reused until
+the version changes. Changing the charges does not change the version.
+
+The Mol has to be changed through its methods, its attributes or its Atoms for
+the version to be incremented, not by editing its arrays in place.
+
+"""
+import numpy as np
+from functools import wraps
+
+
+def _touch(self):
+    """Record that the atoms have changed, making derived data stale"""
+    self._version += 1
+
+
+def _read_only(value):
+    """Make the numpy arrays of a cached value read-only"""
+    for item in value if isinstance(value, tuple) else (value,):
+        if isinstance(item, np.ndarray):
+            item.flags.writeable = False
+    return value
+
+
+def versioned(method):
+    """
+    Cache the result of a Mol method until the version of the Mol changes
+
+    The results are kept in Mol._derived by method name and arguments, which
+    need to be hashable. Returned numpy arrays are made read-only since they are
+    shared between calls.
+
+    Parameters
+    ----------
+    method : function
+        Method of Mol which only depends on its arguments and on data which
+        increments the version when changed
+    Returns
+    -------
+    wrapper : function
+        The cached method
+
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        cached = self._derived.get(key)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        value = _read_only(method(self, *args, **kwargs))
+        self._derived[key] = (self._version, value)
+        return value
+    return wrapper
+
+
+def versioned_attribute(name, doc):
+    """
+    Return a property of Mol which increments the version when it is set
+
+    Parameters
+    ----------
+    name : str
+        Name of the attribute holding the value
+    doc : str
+        Docstring of the property
+    Returns
+    -------
+    prop : property
+        The property to be set as a class attribute of Mol
+
+    """
+    def getter(self):
+        return getattr(self, name)
+
+    def setter(self, value):
+        setattr(self, name, value)
+        self._touch()
+
+    return property(getter, setter, doc=doc)
@@ -1,5 +1,10 @@
-from copy import deepcopy
 import numpy as np
+from scipy.sparse import block_diag, identity, kron
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from fromage.utils.supercell import LazySupercell, image_translations
+from fromage.utils.mol._caching import versioned
 
 
 def complete_mol(self, labels):
@@ -22,14 +27,21 @@ def complete_mol(self, labels):
     new_cell : Mol object
         The cell with the completed molecule
     """
-    new_mol, scattered_mol = self.per_select(labels, old_pos=True)
-    new_cell_atoms = deepcopy(
-        [a for a in self.atoms if a not in scattered_mol])
-    new_cell = self.copy()
-    new_cell.atoms = new_cell_atoms
-
-    for atom in new_mol:
-        new_cell.append(atom.copy())
+    from ._selecting import _bfs_order
+
+    if isinstance(labels, int):
+        labels = [labels]
+    graph, offsets = self._bonds(True)
+    order, images = _bfs_order(graph, labels, offsets=offsets)
+
+    new_mol = self.sub_mol(order)
+    new_mol._shift_coords(np.dot(images, self.vectors))
+
+    # the rest of the cell followed by the completed molecule
+    rest = np.ones(len(self), dtype=bool)
+    rest[order] = False
+    new_cell = self.sub_mol(rest)
+    new_cell._append_rows(new_mol)
     return new_mol, new_cell
 
 
@@ -38,6 +50,9 @@ def complete_cell(self):
     Return a cell where atoms have been translated to complete all molecules of
     the cell
 
+    The molecules are found in one traversal of the periodic bond graph, in the
+    order of their first atom.
+
     Returns
     -------
     out_cell : Mol object
@@ -46,25 +61,37 @@ def complete_cell(self):
         Each molecule in the untruncated cell
 
     """
-    full_mol_l = []
-    remaining = self.copy()
+    from ._selecting import _bfs_order
 
-    while len(remaining) != 0:
-        full_mol, cell = remaining.complete_mol(0)
+    graph, offsets = self._bonds(True)
+    visited = np.zeros(len(self), dtype=bool)
+    full_mol_l = []
+    for start in range(len(self)):
+        if visited[start]:
+            continue
+        order, images = _bfs_order(graph, [start], offsets=offsets, visited=visited)
+        full_mol = self.sub_mol(order)
+        full_mol._shift_coords(np.dot(images, self.vectors))
         full_mol_l.append(full_mol)
-        remaining = cell
-        for atom in full_mol:
-            if atom in remaining:
-                remaining.remove(atom)
 
-    # Convinently, remaining is now an empty Mol
-    out_cell = remaining
+    out_cell = self.empty_mol()
     for mol in full_mol_l:
         out_cell.extend(mol)
     return out_cell, full_mol_l
 
 
-def supercell(self, trans):
+def _make_supercell(self, shifts, out_vec, lazy):
+    """Return the supercell made of images of self translated by shifts"""
+    if lazy:
+        return LazySupercell(self, shifts, out_vec)
+    new_cell = self.empty_mol()
+    # all of the translated copies at once, in one allocation
+    new_cell._append_images(self, image_translations(shifts, self.vectors))
+    new_cell.vectors = out_vec
+    return new_cell
+
+
+def supercell(self, trans, lazy=False):
     """
     Return a supercell of I x J x K
 
@@ -72,32 +99,24 @@ def supercell(self, trans):
     ----------
     trans : array-like of length 3
         Multiplications of the primitive cell
+    lazy : bool
+        If True, return a LazySupercell which only makes the atoms when needed
     Returns
     -------
-    supercell : Mol object
+    supercell : Mol or LazySupercell object
         New supercell with adjusted lattice vectors
 
     """
-    import fromage.utils.mol as mol_init
     # make the input into a np array
     trans = np.array(trans)
 
-    new_cell = self.empty_mol()
-    for a_mult in range(trans[0]):
-        for b_mult in range(trans[1]):
-            for c_mult in range(trans[2]):
-                vector = a_mult * \
-                    self.vectors[0] + b_mult * \
-                    self.vectors[1] + c_mult * self.vectors[2]
-                new_atoms = mol_init.Mol([i.v_translated(vector)
-                                          for i in self.atoms])
-                new_cell += new_atoms
+    shifts = np.array(np.meshgrid(*[np.arange(i) for i in trans],
+                                  indexing='ij')).reshape(3, -1).T
     out_vec = (self.vectors.T * trans.transpose()).T
-    new_cell.vectors = out_vec
-    return new_cell
+    return self._make_supercell(shifts, out_vec, lazy)
 
 
-def centered_supercell(self, trans, from_origin=False):
+def centered_supercell(self, trans, from_origin=False, lazy=False):
     """
     Make a bigger supercell out of an input cell.
 
@@ -118,36 +137,25 @@ def centered_supercell(self, trans, from_origin=False):
     from_origin : bool
         Determines the kind of multiplication. True is corner of the cell as
         the center, False is middle of the cell.
+    lazy : bool
+        If True, return a LazySupercell which only makes the atoms when needed
 
     Returns
     -------
-    mega_cell : Mol object
+    mega_cell : Mol or LazySupercell object
         The resulting supercell
 
     """
-    import fromage.utils.mol as mol_init
-
     trans_series = [0, 0, 0]
     for i, tra in enumerate(trans):
         if from_origin:
-            trans_series[i] = list(range(-tra, tra))
+            trans_series[i] = np.arange(-tra, tra)
         else:
-            trans_series[i] = list(range(-tra, tra + 1))
-    trans_series = np.array(trans_series)
+            trans_series[i] = np.arange(-tra, tra + 1)
 
-    new_cell = self.empty_mol()
-    for a_mult in trans_series[0]:
-        for b_mult in trans_series[1]:
-            for c_mult in trans_series[2]:
-                vector = a_mult * \
-                    self.vectors[0] + b_mult * \
-                    self.vectors[1] + c_mult * self.vectors[2]
-                new_atoms = mol_init.Mol([i.v_translated(vector)
-                                          for i in self.atoms])
-                new_cell += new_atoms
-    out_vec = (self.vectors.T * trans.transpose()).T
-    new_cell.vectors = out_vec
-    return new_cell
+    shifts = np.array(np.meshgrid(*trans_series, indexing='ij')).reshape(3, -1).T
+    out_vec = (self.vectors.T * np.array(trans).transpose()).T
+    return self._make_supercell(shifts, out_vec, lazy)
 
 
 def trans_from_rad(self, clust_rad):
@@ -165,34 +173,34 @@ def trans_from_rad(self, clust_rad):
         The translations required for the unit cell to contain the sphere
 
     """
-    # vectors normal to faces
-    a_perp = np.cross(self.vectors[1], self.vectors[2])
-    b_perp = np.cross(self.vectors[2], self.vectors[0])
-    c_perp = np.cross(self.vectors[0], self.vectors[1])
+    # the smallest amount of cells such that the distance between opposite
+    # faces of the supercell exceeds the radius
+    trans_count = np.floor(clust_rad / self.lattice.widths).astype(int) + 1
 
-    # the three normalised unit vectors
-    perp = np.array([a_perp / np.linalg.norm(a_perp), b_perp /
-                     np.linalg.norm(b_perp), c_perp / np.linalg.norm(c_perp)])
+    return trans_count
 
-    # dimensions of the final supercell (translations)
-    trans_count = np.array([0, 0, 0])
 
-    # lattice vectors of the quadrant supercell
-    supercell_vectors = np.zeros((3,3))
+def _cluster_trans(self, clust_rad, mode='exc', central_mol=None):
+    """Return the translations of the supercell used by make_cluster"""
+    # if there is a central mol, account for nearest neighbour molecules
+    # bleeding out of the original radius
+    if central_mol:
+        # distance to the furthest atom of the central mol
+        central_rad = np.max(np.linalg.norm(central_mol.coords, axis=1))
+    # get the translations of the unit cell necessary to enclose the required mols
+        trans = self.trans_from_rad(clust_rad + central_rad)
+    else:
+        trans = self.trans_from_rad(clust_rad)
 
-    # distances from origin to each face
-    distances = np.array([0.0, 0.0, 0.0])
+    # if the cluster is inclusive, then extra mols might be required from
+    # an additional layer of the supercell
+    if mode == 'inc':
+        trans += np.array([1, 1, 1])  # one buffer cell layer
 
-    # loop over lattice vectors
-    for comp in range(3):
-        while distances[comp] <= clust_rad:
-            trans_count[comp] += 1
-            supercell_vectors[comp] = trans_count[comp] * self.vectors[comp]
-            distances[comp] = np.dot(supercell_vectors[comp], perp[comp])
+    return trans
 
-    return trans_count
 
-def supercell_for_cluster(self, clust_rad, mode='exc', central_mol=None):
+def supercell_for_cluster(self, clust_rad, mode='exc', central_mol=None, lazy=False):
     """
     Make a supercell which will be used to make a cluster
 
@@ -205,32 +213,18 @@ def supercell_for_cluster(self, clust_rad, mode='exc', central_mol=None):
         which will need an extra layer of unit cells
     central_mol : Mol
         Molecule which serves as a center for the cluster (optional)
+    lazy : bool
+        If True, return a LazySupercell which only makes the atoms when needed
     Returns
     -------
-    out_supercell : Mol
+    out_supercell : Mol or LazySupercell
         The supercell from which the cluster will be taken
 
     """
-    # if there is a central mol, account for nearest neighbour molecules
-    # bleeding out of the original radius
-    if central_mol:
-        central_rad = 0
-        for atom in central_mol:
-            dis = atom.v_dist([0, 0, 0])
-            if dis < central_rad:
-                central_rad = dis
-    # get the translations of the unit cell necessary to enclose the required mols
-        trans = self.trans_from_rad(clust_rad + central_rad)
-    else:
-        trans = self.trans_from_rad(clust_rad)
-
-    # if the cluster is inclusive, then extra mols might be required from
-    # an additional layer of the supercell
-    if mode == 'inc':
-        trans += np.array([1, 1, 1])  # one buffer cell layer
+    trans = self._cluster_trans(clust_rad, mode=mode, central_mol=central_mol)
 
     # make a supercell which includes the desired cluster
-    out_supercell = self.centered_supercell(trans, from_origin=True)
+    out_supercell = self.centered_supercell(trans, from_origin=True, lazy=lazy)
 
     return out_supercell
 
@@ -238,7 +232,8 @@ def gen_exclusive_clust(self, seed_atoms):
     """
     Remove all non complete molecules
 
-    This only works if the input contains at least one full molecule
+    This only works if the input contains at least one full molecule. The
+    complete molecules are taken to be the largest ones.
 
     Parameters
     ----------
@@ -251,25 +246,18 @@ def gen_exclusive_clust(self, seed_atoms):
 
     """
     import fromage.utils.mol as mol_init
-
-    max_mol_len = 0
-    while len(seed_atoms) > 0:
-        # pick out a molecule from the seed atoms
-        mol = seed_atoms.select(0)
-
-        # if the molecule is the biggest so far
-        if len(mol) > max_mol_len:
-            # molecules are supposed to be this long now
-            max_mol_len = len(mol)
-            out_clust = mol_init.Mol([])
-        # if the molecule is the right size
-        if len(mol) == max_mol_len:
-            # include this molecule
-            out_clust += mol
-
-        # discard the molecule from seed atoms
-        for atom in mol:
-            seed_atoms.remove(atom)
+    from ._selecting import _bfs_forest
+
+    n_mols, labels = seed_atoms.molecule_labels()
+    mol_lens = np.bincount(labels, minlength=n_mols)
+    # keep the molecules as long as the longest ones
+    kept = np.flatnonzero(mol_lens == np.max(mol_lens))
+    # molecule by molecule, in the order of their first atom, each selected
+    # from its first atom
+    first_atoms = np.unique(labels, return_index=True)[1]
+    order = _bfs_forest(seed_atoms.bond_graph(), first_atoms[kept])
+    out_clust = mol_init.Mol([])
+    out_clust._append_rows(seed_atoms, order)
 
     return out_clust
 
@@ -294,43 +282,288 @@ def gen_inclusive_clust(self, seed_atoms, supercell):
 
     """
     import fromage.utils.mol as mol_init
-
-    max_mol_len = 0
+    from ._selecting import _bfs_forest
+
+    labels = supercell.molecule_labels()[1]
+    # find each seed atom in the supercell
+    dists, seed_indices = cKDTree(supercell.coords).query(seed_atoms.coords)
+    if np.any(dists > 1e-5):
+        raise ValueError("Some seed atoms are not in the supercell")
+    # molecules containing seed atoms, in the order they are encountered, each
+    # selected from its first seed atom
+    first_seen = np.unique(labels[seed_indices], return_index=True)[1]
+    order = _bfs_forest(supercell.bond_graph(), seed_indices[np.sort(first_seen)])
 
     out_clust = mol_init.Mol([])
-    # here, the molecule with the atom seed_atoms[0] is necessarily complete
-    # in supercell
-    max_mol_len = len(supercell.select(supercell.index(seed_atoms[0])))
-
-    while len(seed_atoms) > 0:
-        # the part of the mol detected in seed_atoms
-        mol_tmp = seed_atoms.select(0)
-        if len(mol_tmp) < max_mol_len:
-            # The whole mol, which could potentially include even more
-            # seed_atoms
-            mol = supercell.select(supercell.index(seed_atoms[0]))
-        else:
-            mol = mol_tmp
-        out_clust += mol
-        for atom in mol_tmp:
-            seed_atoms.remove(atom)
-        for atom in mol:
-            supercell.remove(atom)
-            # remove all atoms of the mol which are part of seed_atoms
-            try:
-                seed_atoms.remove(atom)
-            except ValueError:
-                pass
+    out_clust._append_rows(supercell, order)
+
+    return out_clust
+
+@versioned
+def _whole_molecules(self):
+    """
+    Return the atoms of each molecule of the cell and the images making it whole
+
+    The molecules are found in one traversal of the periodic bond graph, as in
+    complete_cell. This description of the crystal as translated copies of whole
+    molecules is only returned if it is exact: the cell must be wider than two
+    bonds in every direction, so that no atom is bonded to two images of the
+    same atom, and every bond must join atoms of the same copy, which excludes
+    polymers and other networks extending through the lattice.
+
+    Returns
+    -------
+    molecules : list of tuples or None
+        For each molecule, the indices of its atoms in the cell and the number
+        of lattice vectors by which each atom is translated to make the
+        molecule whole. None if the crystal cannot be described this way
+
+    """
+    from ._selecting import _bfs_order
+
+    if len(self) == 0 or np.min(self.lattice.widths) <= 2 * self.max_bond_length():
+        return None
+    graph, offsets = self._bonds(True)
+    visited = np.zeros(len(self), dtype=bool)
+    atom_images = np.zeros((len(self), 3), dtype=int)
+    molecules = []
+    for start in range(len(self)):
+        if visited[start]:
+            continue
+        order, images = _bfs_order(graph, [start], offsets=offsets, visited=visited)
+        order = np.array(order, dtype=int)
+        atom_images[order] = images
+        molecules.append((order, images))
+    # the bonds which do not close within the copies of the molecules
+    rows = np.repeat(np.arange(len(self)), np.diff(graph.indptr))
+    if np.any(atom_images[graph.indices] - atom_images[rows] != offsets):
+        return None
+    return molecules
+
+
+def _supercell_cluster(self, clust_rad, mode, central_mol, centres):
+    """Make the cluster of make_cluster from the atoms of a supercell"""
+    # generate a supercell which will include the cluster.
+    # inclusive clusters will have an extra layer of supercell.
+    # if a central mol is supplied, the supercell will include the whole
+    # molecule and the supplied radius.
+    # the supercell is lazy so that only the seed atoms are made
+    supercell = self.supercell_for_cluster(clust_rad, mode=mode, central_mol=central_mol, lazy=True)
+
+    # seed_atoms will initialise the cluster. It conserves the bonding
+    # properties of the original cell
+    seed_atoms = supercell.sub_mol(supercell.indices_within(centres, clust_rad))
+    seed_atoms.vectors = np.zeros((3, 3))
+
+    # remove incomplete molecules
+    if mode == 'exc':
+        clust_atoms = self.gen_exclusive_clust(seed_atoms)
+    # complete incomplete molecules
+    else:
+        clust_atoms = self.gen_inclusive_clust(seed_atoms, supercell.to_mol())
+
+    return clust_atoms
 
+
+def _molecule_copies(self, clust_rad, trans, centres, molecules):
+    """
+    Return the copies of the molecules which have atoms near the seed region
+
+    Parameters
+    ----------
+    clust_rad : float
+        The copies with no atom closer than this to the centres are left out
+    trans : numpy array of 3 ints
+        Translations of the supercell of supercell_for_cluster. Only copies
+        with atoms in this supercell are considered
+    centres : N x 3 array-like
+        The positions around which the seed atoms are taken
+    molecules : list of tuples
+        See _whole_molecules
+    Returns
+    -------
+    copies : list of tuples
+        For each molecule with such copies, the indices of its atoms in the
+        cell, the Ncopies*Nat x 3 lattice shifts of the atoms of each copy, the
+        distance of each of these atoms to the closest centre and the smallest
+        of these distances for each copy. The copies are sorted by the latter
+
+    """
+    coords = self.coords
+    vectors = self.lattice.vectors
+    tree = cKDTree(centres)
+    copies = []
+    for atoms, images in molecules:
+        whole = coords[atoms] + image_translations(images, vectors)
+        centre = np.mean(whole, axis=0)
+        mol_rad = np.max(np.linalg.norm(whole - centre, axis=1))
+        # copies with at least one atom in the supercell
+        ranges = [np.arange(-trans[i] - np.max(images[:, i]), trans[i] - np.min(images[:, i]))
+                  for i in range(3)]
+        mol_copies = np.array(np.meshgrid(*ranges, indexing='ij')).reshape(3, -1).T
+        # copies whose bounding sphere reaches the seed region, with some
+        # slack for rounding
+        centre_dists = tree.query(centre + image_translations(mol_copies, vectors))[0]
+        mol_copies = mol_copies[centre_dists - mol_rad < clust_rad + 1e-6]
+        if len(mol_copies) == 0:
+            continue
+        mol_shifts = (images[np.newaxis, :, :] + mol_copies[:, np.newaxis, :]).reshape(-1, 3)
+        pos = np.tile(coords[atoms], (len(mol_copies), 1)) + image_translations(mol_shifts, vectors)
+        dists = tree.query(pos)[0].reshape(-1, len(atoms))
+        # closest copies first, such that smaller clusters only look at the
+        # beginning
+        copy_dists = np.min(dists, axis=1)
+        by_dist = np.argsort(copy_dists, kind='stable')
+        mol_shifts = mol_shifts.reshape(-1, len(atoms), 3)[by_dist].reshape(-1, 3)
+        copies.append((atoms, mol_shifts, dists[by_dist].reshape(-1), copy_dists[by_dist]))
+    return copies
+
+
+def _cluster_from_copies(self, copies, clust_rad, trans, mode):
+    """
+    Return the atoms of the cluster of make_cluster among copies of molecules
+
+    The supercell of supercell_for_cluster is never made but its atom numbering
+    is used to order the cluster, so that the result is the same as with
+    _supercell_cluster.
+
+    Parameters
+    ----------
+    copies : list of tuples
+        See _molecule_copies. They can extend beyond clust_rad and trans
+    clust_rad : float
+        Radius of the cluster
+    trans : numpy array of 3 ints
+        Translations of the supercell of supercell_for_cluster for clust_rad
+    mode : str
+        'exc' or 'inc'
+    Returns
+    -------
+    cell_idx : numpy array of ints
+        The index in the cell of each atom of the cluster
+    shifts : Nat x 3 numpy array of ints
+        The lattice shift of each atom of the cluster
+
+    """
+    from ._selecting import _bfs_forest
+
+    graph = self._bonds(True)[0]
+    # the supercell spans the images -trans to trans - 1, the last varying
+    # fastest, with the atoms of each image in the order of the cell
+    dims = 2 * trans
+    strides = np.array([dims[1] * dims[2], dims[2], 1]) * len(self)
+
+    cell_idx, shifts, sc_idx, seeds, comps, graphs = [], [], [], [], [], []
+    n_comps = 0
+    for atoms, mol_shifts, dists, copy_dists in copies:
+        n_at = len(atoms)
+        # only the copies which can have seed atoms
+        n_near = np.searchsorted(copy_dists, clust_rad) * n_at
+        mol_shifts, dists = mol_shifts[:n_near], dists[:n_near]
+        in_supercell = np.all((mol_shifts >= -trans) & (mol_shifts < trans), axis=1)
+        mol_seeds = in_supercell & (dists < clust_rad)
+        # only the copies with seed atoms
+        with_seeds = np.repeat(np.any(mol_seeds.reshape(-1, n_at), axis=1), n_at)
+        n_copies = np.count_nonzero(with_seeds) // n_at
+        if n_copies == 0:
+            continue
+        mol_shifts, in_supercell, mol_seeds = \
+            mol_shifts[with_seeds], in_supercell[with_seeds], mol_seeds[with_seeds]
+        # exclusive clusters are made of seed atoms only
+        members = mol_seeds if mode == 'exc' else in_supercell
+        members_idx = np.flatnonzero(members)
+        mol_graph = graph[atoms][:, atoms]
+        # the bonds between the members
+        graphs.append(kron(identity(n_copies, format='csr'), mol_graph,
+                           format='csr')[members_idx][:, members_idx])
+        # copies whose atoms are all members are one fragment each
+        whole = np.all(members.reshape(-1, n_at), axis=1)
+        n_whole = np.count_nonzero(whole)
+        copy_labels = np.cumsum(whole) - 1
+        labels = np.repeat(copy_labels, n_at)[members_idx]
+        # the others are split along the bonds of all of them at once
+        partial = np.repeat(~whole, n_at)[members_idx]
+        partial_idx = members_idx[partial]
+        n_partial = 0
+        if len(partial_idx):
+            copies_graph = kron(identity(n_copies - n_whole, format='csr'),
+                                mol_graph, format='csr')
+            # positions of the partial members among the atoms of partial copies
+            partial_pos = np.flatnonzero(members[np.repeat(~whole, n_at)])
+            n_partial, partial_labels = connected_components(
+                copies_graph[partial_pos][:, partial_pos], directed=False)
+            labels[partial] = partial_labels + n_whole
+        n_new = n_whole + n_partial
+
+        mol_cell_idx = np.tile(atoms, n_copies)[members_idx]
+        cell_idx.append(mol_cell_idx)
+        shifts.append(mol_shifts[members_idx])
+        sc_idx.append(np.dot(mol_shifts[members_idx] + trans, strides) + mol_cell_idx)
+        seeds.append(mol_seeds[members_idx])
+        comps.append(labels + n_comps)
+        n_comps += n_new
+
+    if n_comps == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+    cell_idx, shifts, sc_idx, seeds, comps = [np.concatenate(i) for i in
+                                              (cell_idx, shifts, sc_idx, seeds, comps)]
+    if mode == 'exc':
+        # the complete molecules are taken to be the largest ones
+        sizes = np.bincount(comps, minlength=n_comps)
+        keep = sizes == np.max(sizes)
+    else:
+        # the fragments which contain seed atoms
+        keep = np.bincount(comps[seeds], minlength=n_comps) > 0
+    # the first seed atom in the supercell of each kept fragment
+    seed_idx = np.flatnonzero(seeds)
+    seed_idx = seed_idx[np.lexsort((sc_idx[seed_idx], comps[seed_idx]))]
+    seed_comps, first = np.unique(comps[seed_idx], return_index=True)
+    starts = seed_idx[first][keep[seed_comps]]
+    # fragments in the order of their first seed atom, each selected from it
+    # with the bonds followed in supercell order
+    by_sc = np.argsort(sc_idx)
+    rank = np.empty_like(by_sc)
+    rank[by_sc] = np.arange(len(by_sc))
+    sc_graph = block_diag(graphs, format='csr')[by_sc][:, by_sc]
+    sc_graph.sort_indices()
+    order = by_sc[_bfs_forest(sc_graph, np.sort(rank[starts]))]
+    return cell_idx[order], shifts[order]
+
+
+def _molecule_cluster(self, clust_rad, mode, central_mol, centres, molecules):
+    """
+    Make the cluster of make_cluster from translated copies of whole molecules
+
+    The copies of each molecule whose bounding sphere reaches the seed region
+    are enumerated at once and only their atoms are examined.
+
+    """
+    import fromage.utils.mol as mol_init
+
+    trans = np.asarray(self._cluster_trans(clust_rad, mode=mode, central_mol=central_mol))
+    copies = self._molecule_copies(clust_rad, trans, centres, molecules)
+    cell_idx, shifts = self._cluster_from_copies(copies, clust_rad, trans, mode)
+
+    out_clust = mol_init.Mol([])
+    out_clust._append_rows(self, cell_idx)
+    out_clust._shift_coords(image_translations(shifts, self.lattice.vectors))
     return out_clust
 
+
 def make_cluster(self, clust_rad, mode='exc', central_mol=None):
     """
     Generate a cluster of molecules from a primitive cell
 
-    This first makes a supercell of the correct size which will contain with
-    one additional buffer shell. Then the sphere is generated from this new
-    supercell by connectivity.
+    The cluster is the one which would be obtained by making a supercell with
+    one additional buffer shell, taking the seed atoms within the radius and
+    completing or removing the molecules they belong to by connectivity. The
+    molecules are in the order of their first seed atom in the supercell and
+    the atoms of each molecule in the order select gives from that atom.
+
+    When the crystal is made of discrete molecules, the cell is split into
+    whole molecules once and their translated copies near the seed region are
+    enumerated directly, which is much faster for large radii. Otherwise, the
+    supercell is used.
 
     A central molecule can also be supplied which will turn the spheres
     defining the clusters into the union of spheres stemming from each atom
@@ -358,45 +591,115 @@ def make_cluster(self, clust_rad, mode='exc', central_mol=None):
         Cluster of molecules from their crystal positions
 
     """
-    import fromage.utils.mol as mol_init
-    # generate a supercell which will include the cluster.
-    # inclusive clusters will have an extra layer of supercell.
-    # if a central mol is supplied, the supercell will include the whole
-    # molecule and the supplied radius.
-    supercell = self.supercell_for_cluster(clust_rad, mode=mode, central_mol=central_mol)
-
-    # seed_atoms will initialise the cluster
-    seed_atoms = mol_init.Mol([])
-
-    # conserve the bonding properties of the original cell
-    seed_atoms.bonding = supercell.bonding
-    seed_atoms.thresh = supercell.thresh
-
+    if mode not in ('exc', 'inc'):
+        raise ValueError("Invalid cluster generation mode. Use 'exc' or 'inc'")
 
     # get seed atoms in the shape of the central mol if pertinent
     if central_mol:
-        for atom_i in supercell:
-            for atom_j in central_mol:
-                if atom_i.dist(atom_j) < clust_rad:
-                    seed_atoms.append(atom_i)
-                    break
-
+        # distance to the closest atom of the central mol
+        centres = central_mol.coords
     # get spherical seedatoms otherwise
     else:
-        for atom in supercell:
-            if atom.v_dist([0, 0, 0]) < clust_rad:
-                seed_atoms.append(atom)
+        centres = np.zeros((1, 3))
 
-    # remove incomplete molecules
-    if mode == 'exc':
-        clust_atoms = self.gen_exclusive_clust(seed_atoms)
-    # complete incomplete molecules
-    elif mode == 'inc':
-        clust_atoms = self.gen_inclusive_clust(seed_atoms, supercell)
-    else:
+    molecules = self._whole_molecules()
+    if molecules is None:
+        return self._supercell_cluster(clust_rad, mode, central_mol, centres)
+    return self._molecule_cluster(clust_rad, mode, central_mol, centres, molecules)
+
+
+def cluster_series(self, radii, mode='exc', central_mol=None):
+    """
+    Generate clusters of increasing radius, each grown from the previous one
+
+    Each cluster has the same atoms as make_cluster would give for its radius.
+    The atoms of the previous cluster come first, in the same order, followed
+    by the molecules added by the larger radius. When the crystal is made of
+    discrete molecules, the copies of the molecules near the largest cluster
+    are found once and shared by all radii, such that the whole series costs
+    about as much as the largest cluster. Otherwise, each cluster is made
+    separately.
+
+    Parameters
+    ----------
+    radii : list of floats
+        Increasing radii of the clusters
+    mode : str
+        'exc' or 'inc', see make_cluster
+    central_mol : Mol
+        Central molecule of the clusters, see make_cluster (optional)
+    Yields
+    ------
+    cluster : Mol object
+        Cluster of molecules for each radius, in the order of radii
+
+    """
+    import fromage.utils.mol as mol_init
+
+    if mode not in ('exc', 'inc'):
         raise ValueError("Invalid cluster generation mode. Use 'exc' or 'inc'")
+    radii = list(radii)
+    if np.any(np.diff(radii) < 0):
+        raise ValueError("The radii of a cluster series must be increasing")
+    if not radii:
+        return
 
-    return clust_atoms
+    if central_mol:
+        centres = central_mol.coords
+    else:
+        centres = np.zeros((1, 3))
+
+    molecules = self._whole_molecules()
+    if molecules is None:
+        prev_clust = mol_init.Mol([])
+        for clust_rad in radii:
+            clust = self._supercell_cluster(clust_rad, mode, central_mol, centres)
+            # the atoms of the previous cluster first, in the same order
+            old = np.zeros(0, dtype=int)
+            if len(prev_clust) and len(clust):
+                dists, old = cKDTree(clust.coords).query(prev_clust.coords)
+                old = old[dists < 1e-5]
+            new = np.setdiff1d(np.arange(len(clust)), old)
+            prev_clust = clust.sub_mol(np.concatenate((old, new)))
+            yield prev_clust.copy()
+        return
+
+    # the translations only grow with the radius, so the copies near the
+    # largest cluster contain those of all others
+    max_trans = np.asarray(self._cluster_trans(radii[-1], mode=mode, central_mol=central_mol))
+    copies = self._molecule_copies(radii[-1], max_trans, centres, molecules)
+    vectors = self.lattice.vectors
+    # number each atom of each copy by its index in the cell and its shift
+    bound = max([np.max(np.abs(copy[1])) for copy in copies] + [0]) + 1
+    span = 2 * bound + 1
+    def atom_keys(cell_idx, shifts):
+        return np.dot(shifts + bound, [span * span, span, 1]) * len(self) + cell_idx
+
+    out_clust = mol_init.Mol([])
+    out_keys = np.zeros(0, dtype=int)
+    out_cell_idx = np.zeros(0, dtype=int)
+    out_shifts = np.zeros((0, 3), dtype=int)
+    for clust_rad in radii:
+        trans = np.asarray(self._cluster_trans(clust_rad, mode=mode, central_mol=central_mol))
+        cell_idx, shifts = self._cluster_from_copies(copies, clust_rad, trans, mode)
+        keys = atom_keys(cell_idx, shifts)
+        is_new = ~np.isin(keys, out_keys)
+        kept = np.isin(out_keys, keys)
+        if not np.all(kept):
+            # some atoms of the previous cluster are not in this one, which
+            # can only happen for fragments of exclusive clusters
+            out_clust = mol_init.Mol([])
+            out_clust._append_rows(self, out_cell_idx[kept])
+            out_clust._shift_coords(image_translations(out_shifts[kept], vectors))
+            out_cell_idx, out_shifts = out_cell_idx[kept], out_shifts[kept]
+        # only the new molecules are added
+        start = len(out_clust)
+        out_clust._append_rows(self, cell_idx[is_new])
+        out_clust._shift_coords(image_translations(shifts[is_new], vectors), start=start)
+        out_cell_idx = np.concatenate((out_cell_idx, cell_idx[is_new]))
+        out_shifts = np.concatenate((out_shifts, shifts[is_new]))
+        out_keys = atom_keys(out_cell_idx, out_shifts)
+        yield out_clust.copy()
 
 
 def centered_mols(self, labels, return_trans=False):
@@ -421,7 +724,8 @@ def centered_mols(self, labels, return_trans=False):
     centro = mol.centroid()
     mol.translate(-centro)
     mod_cell.translate(-centro)
-    mod_cell = mod_cell.confined()
+    # mod_cell is already a new Mol so it can be confined in place
+    mod_cell.wrap()
 
     if return_trans:
         return mol, mod_cell, -centro
@@ -429,8 +733,8 @@ def centered_mols(self, labels, return_trans=False):
         return mol, mod_cell
 
 def confined(self):
-    """Move all atoms to fit inside the primitive cell"""
-    frac_mol = self.dir_to_frac_pos()
-    out_mol = frac_mol.frac_to_dir_pos()
+    """Return a new Mol with all atoms moved inside the primitive cell"""
+    out_mol = self.copy()
+    out_mol.wrap()
 
     return out_mol
@@ -1,5 +1,7 @@
 import numpy as np
 
+from fromage.utils.mol._caching import versioned
+
 def es_pot(self, position):
     """
     Return the electorstatic potential generated by this Mol
@@ -14,9 +16,8 @@ def es_pot(self, position):
         The total potential
 
     """
-    tot_pot = 0
-    for atom in self:
-        tot_pot += atom.es_pot(position)
+    dists = np.linalg.norm(self._coords[:self._n] - np.asarray(position)[:3], axis=1)
+    tot_pot = np.sum(self._charges[:self._n] / dists)
     return tot_pot
 
 
@@ -31,28 +32,28 @@ def change_charges(self, charges):
         order corresponding to self.atoms
 
     """
-    for i, atom in enumerate(self.atoms):
-        atom.q = charges[i]
+    charges = np.asarray(charges, dtype=float).reshape(-1)
+    if len(charges) != len(self):
+        raise ValueError("Expected " + str(len(self)) + " charges but got " + str(len(charges)))
+    self._charges[:self._n] = charges
     return
 
 
 def charges(self):
     """Return an array of charges"""
-    l_char = []
-    for atom in self.atoms:
-        l_char.append(atom.q)
-    arr_char = np.array(l_char)
+    arr_char = self._charges[:self._n].copy()
     return arr_char
 
 
 def raw_assign_charges(self, charges):
     """Assign the charges from an array-like to the atoms"""
-    for char, at in zip(charges, self.atoms):
-        at.q = char
+    charges = np.asarray(charges, dtype=float)
+    n_char = min(len(charges), self._n)
+    self._charges[:n_char] = charges[:n_char]
     return
 
 
-def populate(self, reference_mol):
+def populate(self, reference_mol, by_molecule=False):
     """
     Assign charges to the Mol by comparing to the connectivity of a
     reference
@@ -61,6 +62,9 @@ def populate(self, reference_mol):
     ----------
     reference_mol : Mol object
         Charged molecule or cell
+    by_molecule : bool
+        If True, only find the connectivity of one of each identical molecule
+        of the Mol, see fro_assign_charges.assign_charges
 
     """
     # This is a naughty in-function import to prevent a circular dependency.
@@ -68,13 +72,131 @@ def populate(self, reference_mol):
     # executable script which needs to read_file and in turn use mol.py
     # Some careful refactoring should fix this
     import fromage.scripts.fro_assign_charges as ac
-    ac.assign_charges(reference_mol, self)
+    ac.assign_charges(reference_mol, self, by_molecule=by_molecule)
     return
 
+@versioned
+def _kind_data(self):
+    """
+    Return the connectivities and kinds of the atoms, computed only if needed
+
+    They are cached like the bond graphs, such that they are only computed
+    again when the coordinates, elements, lattice vectors or bonding settings
+    change, and not when the charges do.
+
+    Returns
+    -------
+    connectivities : numpy array of objects
+        The connectivity of each atom, see Atom.set_connectivity
+    kinds : numpy array of objects
+        The kind of each atom
+    kind_map : dict
+        Increasing indices of the atoms by kind
+
+    """
+    import fromage.scripts.fro_assign_charges as ac
+    connectivities = np.empty(self._n, dtype=object)
+    kinds = np.empty(self._n, dtype=object)
+    kind_map = {}
+    for i, connectivity in enumerate(ac.get_connectivities(self)):
+        kind = (self._elems[i], connectivity)
+        connectivities[i] = connectivity
+        kinds[i] = kind
+        kind_map.setdefault(kind, []).append(i)
+    kind_map = {kind: np.array(indices) for kind, indices in kind_map.items()}
+    return connectivities, kinds, kind_map
+
+
 def set_connectivity(self):
     """Set the connectivity of all atoms in the Mol"""
-    import fromage.scripts.fro_assign_charges as ac
-    cnct_mat = ac.get_connectivity_mat(self)
-    for i, atom in enumerate(self):
-        atom.set_connectivity(self, cnct_mat[i])
+    connectivities, kinds, kind_map = self._kind_data()
+    self._connectivity[:self._n] = connectivities
+    self._kinds[:self._n] = kinds
     return
+
+
+def kind_indices(self):
+    """
+    Return the indices of the atoms of each kind
+
+    The kinds are those of set_connectivity, which is also applied. The result
+    is cached and should not be modified.
+
+    Returns
+    -------
+    kind_map : dict
+        Increasing numpy array of the indices of the atoms of each kind, by kind
+
+    """
+    self.set_connectivity()
+    return self._kind_data()[2]
+
+
+@versioned
+def _refined_colours(self):
+    """Return the cached colours of refined_colours"""
+    periodic = np.count_nonzero(self.vectors) != 0
+    graph = self.bond_graph(periodic=periodic)
+    elems = [str(elem) for elem in self._elems[:len(self)]]
+    if not elems:
+        return np.zeros(0, dtype=int)
+    colours = np.unique(elems, return_inverse=True)[1].reshape(-1)
+    rows = np.repeat(np.arange(len(elems)), np.diff(graph.indptr))
+    # the multiset of neighbour colours is hashed as a sum of random weights
+    rng = np.random.default_rng(0)
+    n_colours = colours.max() + 1
+    while True:
+        weights = rng.integers(1, np.iinfo(np.int64).max, size=n_colours).astype(np.uint64)
+        neighbours = np.zeros(len(elems), dtype=np.uint64)
+        np.add.at(neighbours, rows, weights[colours[graph.indices]])
+        signatures = np.column_stack((colours.astype(np.uint64), neighbours))
+        uniq, new_colours = np.unique(signatures, axis=0, return_inverse=True)
+        new_colours = new_colours.reshape(-1)
+        if len(uniq) == n_colours:
+            break
+        colours, n_colours = new_colours, len(uniq)
+    return colours
+
+
+def refined_colours(self):
+    """
+    Return colours of the atoms which only depend on their bonding environment
+
+    This is colour refinement, also known as the Weisfeiler-Lehman algorithm.
+    The atoms start coloured by element and are repeatedly given a new colour
+    from their colour and the multiset of the colours of their neighbours,
+    until the number of colours stops increasing. Each step is a handful of
+    vectorised operations over the sparse bond graph. Equivalent atoms of
+    identical molecules have the same colour.
+
+    Bonds go through the lattice vectors if there are any.
+
+    Returns
+    -------
+    colours : numpy array of ints
+        The colour of each atom, from 0 to the number of colours - 1
+
+    """
+    return self._refined_colours().copy()
+
+
+def fingerprints(self, molecules):
+    """
+    Return a fingerprint of the bond graph of each of several groups of atoms
+
+    The fingerprint is made of the sorted colours of refined_colours. Identical
+    molecules have the same fingerprint.
+
+    Parameters
+    ----------
+    molecules : list of array-likes of ints
+        The indices of the atoms of each group
+    Returns
+    -------
+    prints : list of bytes
+        The fingerprint of each group
+
+    """
+    colours = self._refined_colours()
+    prints = [np.sort(colours[np.asarray(indices, dtype=int)]).tobytes() for indices in molecules]
+    return prints
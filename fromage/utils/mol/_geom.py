@@ -1,5 +1,6 @@
 import numpy as np
 import fromage.utils.array_operations as ao
+from fromage.utils.mol._caching import versioned
 
 class GeomInfo(object):
     """
@@ -10,6 +11,11 @@ class GeomInfo(object):
     intensive. As such, it needs to be assignable which rules out simply using
     a namedtuple.
 
+    The arrays are filled by the calc_ methods of Mol. The corresponding Mol
+    methods (coord_array, plane_coeffs and axes) are cached until the Mol or
+    the ignore_kinds, ignore_hydrogens and linear settings change, so they are
+    always up to date.
+
     Attributes
     ----------
     coord_array : np array of shape Nat X 3
@@ -50,6 +56,29 @@ class GeomInfo(object):
         return self.__str__()
 
 
+def _geom_settings(self):
+    """Return the settings of geom which the geometrical quantities depend on"""
+    return (self.geom.ignore_hydrogens, tuple(self.geom.ignore_kinds), self.geom.linear)
+
+
+@versioned
+def _coord_array(self, settings):
+    """Return the coordinate array for some geom settings"""
+    ignore_hydrogens, ignore_kinds = settings[:2]
+    keep = np.ones(self._n, dtype=bool)
+    # potentially remove hydrogen
+    if ignore_hydrogens:
+        keep &= self._elems[:self._n] != 'H'
+    # potentially remove a kind of atom
+    if ignore_kinds:
+        self.set_connectivity()
+        keep &= np.array([kind not in ignore_kinds
+                          for kind in self._kinds[:self._n]], dtype=bool)
+
+    coord_arr = self._coords[:self._n][keep]
+    return coord_arr
+
+
 def coord_array(self):
     """
     Return a numpy array of the coordinates
@@ -60,30 +89,21 @@ def coord_array(self):
         Array of the form [[x1,y1,z1],[x2,y2,z2],...]
 
     """
-    if self.geom.ignore_kinds:
-        self.set_connectivity
-    list_coord = []
-    for atom in self:
-        add_atom = True
-        # potentially remove hydrogen
-        if self.geom.ignore_hydrogens:
-            if atom.elem == 'H':
-                add_atom = False
-        # potentially remove a kind of atom
-        if self.geom.ignore_kinds:
-            if atom.kind in self.geom.ignore_kinds:
-                add_atom = False
-        if add_atom:
-            new_row = [atom.x,atom.y,atom.z]
-            list_coord.append(new_row)
-
-    coord_arr = np.array(list_coord)
-    return coord_arr
+    return self._coord_array(self._geom_settings()).copy()
+
 
 def calc_coord_array(self):
     """Set the coordinate array in geom"""
     self.geom.coord_array = self.coord_array()
 
+
+@versioned
+def _plane_coeffs(self, settings):
+    """Return the plane coefficients for some geom settings"""
+    plane_coeffs = ao.plane_from_coord(self._coord_array(settings))
+    return plane_coeffs
+
+
 def plane_coeffs(self):
     """
     Return numpy array of the plane coefficients which average the coords
@@ -95,45 +115,38 @@ def plane_coeffs(self):
         ax + by + cz + d = 0. The array is [a,b,c,d]
 
     """
-    if np.count_nonzero(self.geom.coord_array) == 0:
-        self.calc_coord_array()
-    plane_coeffs = ao.plane_from_coord(self.geom.coord_array)
-    return plane_coeffs
+    return self._plane_coeffs(self._geom_settings()).copy()
+
 
 def calc_plane_coeffs(self):
     """Set the plane coefficients in geom"""
     self.geom.plane_coeffs = self.plane_coeffs()
 
-def axes(self):
-    """
-    Return principal, secondary and perpendicular axes of the Mol
 
-    Returns
-    -------
-    axes_out : 3 x 3 np array
-        Principal, followed by secondary and perpendicular axes of the molecule
-
-    """
-    if np.count_nonzero(self.geom.plane_coeffs) == 0:
-        self.calc_plane_coeffs()
+@versioned
+def _axes(self, settings):
+    """Return the axes for some geom settings"""
+    linear = settings[2]
+    coord_arr = self._coord_array(settings)
+    plane_coeffs = self._plane_coeffs(settings)
     # get the quadrangle which best describes the coordinates (possibly a
     # triangle with the far point repeated twice)
-    vertices = ao.quadrangle_from_coord(self.geom.coord_array)
+    vertices = ao.quadrangle_from_coord(coord_arr)
     # if the mol is linear, we need to reorder the quadrangle
-    if self.geom.linear:
+    if linear:
         vertices = np.array([vertices[1],vertices[2],vertices[3],vertices[0]])
     # if the mole is rectangular, we want an embedded quadrangle
     else:
         # get the embedded quadrangle vertices
         vertices = ao.embedded_vert(vertices)
     # get vectors from projected diagonals
-    axes_out_raw = ao.project_quad_to_vectors(vertices,self.geom.plane_coeffs)
+    axes_out_raw = ao.project_quad_to_vectors(vertices,plane_coeffs)
     # we want the first raw to be the secondary and vice versa and the principal
     # to be *(-1) in order to maintain a convention
     axes_out_unnormal = np.array([-axes_out_raw[1], axes_out_raw[0]])
     # orthonogalise them
     # if the mol is linear, just move the secondary axis
-    if self.geom.linear:
+    if linear:
         axes_out_prin_sec = ao.orthogonalise_asym(axes_out_unnormal)
     # if the mol is not linear, move principal and secondary axes equally
     else:
@@ -148,6 +161,20 @@ def axes(self):
     axes_out = np.array(lis_axes_out)
     return axes_out
 
+
+def axes(self):
+    """
+    Return principal, secondary and perpendicular axes of the Mol
+
+    Returns
+    -------
+    axes_out : 3 x 3 np array
+        Principal, followed by secondary and perpendicular axes of the molecule
+
+    """
+    return self._axes(self._geom_settings()).copy()
+
+
 def calc_axes(self):
     """Set the principal and secondary axes in geom"""
     axes = self.axes()
@@ -0,0 +1,237 @@
+"""Spatial hash index behind the membership tests of Mol
+
+`atom in mol`, `mol.index(atom)`, `mol.remove(atom)` and `mol.count(atom)`
+compare an Atom to every atom of the Mol with the tolerances of Atom.__eq__.
+Atom.very_close does the same with a box tolerance. To avoid scanning the whole
+Mol for every test, the atoms are put in buckets of quantized coordinates and
+only the atoms of the neighbouring buckets are compared.
+
+The index is made lazily, the second time the Mol is queried without having
+changed in between, such that one-off tests stay a single vectorised scan. It
+is kept up to date when atoms are appended or removed one by one and dropped
+when anything else changes the coordinates, elements or order of the atoms.
+
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+# bucket edge in Angstrom. Queries with a larger tolerance rebuild the index
+default_bin = 0.001
+
+# the 27 buckets around and including a bucket
+_neighbours = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)]
+
+
+class AtomIndex(object):
+    """
+    Buckets of atom ids by quantized coordinates
+
+    The buckets hold ids rather than rows so that removing rows only needs the
+    map between ids and rows to be updated.
+
+    Attributes
+    ----------
+    bin : float
+        Edge of the buckets in Angstrom
+    version : int
+        Version of the Mol when the index was last up to date
+    buckets : dict
+        Lists of ids by tuple of quantized coordinates
+    id_of_row : numpy array of ints
+        The id of each row of the Mol
+    row_of_id : numpy array of ints
+        The row of each id, or -1 if it has been removed
+
+    """
+    def __init__(self, coords, version, bin_size=default_bin):
+        self.bin = bin_size
+        self.version = version
+        n_at = len(coords)
+        self.id_of_row = np.arange(n_at)
+        self.row_of_id = np.arange(n_at)
+        self.buckets = {}
+        if n_at:
+            keys, inverse = np.unique(self.keys(coords), axis=0,
+                                      return_inverse=True)
+            order = np.argsort(inverse.reshape(-1), kind='stable')
+            bounds = np.cumsum(np.bincount(inverse.reshape(-1)))[:-1]
+            self.buckets = dict(zip(map(tuple, keys.tolist()),
+                                    [ids.tolist() for ids in np.split(order, bounds)]))
+
+    def keys(self, coords):
+        """Return the quantized coordinates of an N x 3 array"""
+        return np.floor(np.asarray(coords) / self.bin).astype(np.int64)
+
+    def candidates(self, pos):
+        """Return the sorted rows of the atoms near a position"""
+        key = self.keys(pos)
+        ids = []
+        for shift in _neighbours:
+            ids.extend(self.buckets.get((key[0] + shift[0], key[1] + shift[1],
+                                         key[2] + shift[2]), ()))
+        return np.sort(self.row_of_id[ids])
+
+    def append(self, pos):
+        """Add an atom as the new last row"""
+        new_id = len(self.row_of_id)
+        self.buckets.setdefault(tuple(self.keys(pos).tolist()), []).append(new_id)
+        self.row_of_id = np.append(self.row_of_id, len(self.id_of_row))
+        self.id_of_row = np.append(self.id_of_row, new_id)
+
+    def delete(self, coords, keep):
+        """
+        Remove rows from the index
+
+        Parameters
+        ----------
+        coords : N x 3 numpy array
+            The coordinates of all rows, before the deletion
+        keep : numpy array of bools
+            False for the deleted rows
+
+        """
+        deleted = np.flatnonzero(~keep)
+        for key, atom_id in zip(map(tuple, self.keys(coords[deleted]).tolist()),
+                                self.id_of_row[deleted]):
+            self.buckets[key].remove(atom_id)
+        self.row_of_id[self.id_of_row[deleted]] = -1
+        self.id_of_row = self.id_of_row[keep]
+        self.row_of_id[self.id_of_row] = np.arange(len(self.id_of_row))
+
+
+def _atom_index(self, tol=default_bin):
+    """
+    Return an up to date AtomIndex usable at a tolerance, or None
+
+    None means that a linear scan should be done instead, because the index
+    does not exist yet and this is the first query since the last change.
+
+    """
+    index = self._index
+    if index is not None and index.version == self._version and tol <= index.bin:
+        return index
+    if self._queried_version != self._version:
+        self._queried_version = self._version
+        return None
+    self._index = AtomIndex(self._coords[:self._n], self._version,
+                            bin_size=max(tol, default_bin))
+    return self._index
+
+
+def _index_append(self):
+    """Keep the index up to date after appending one row"""
+    index = self._index
+    if index is not None and index.version == self._version - 1:
+        index.append(self._coords[self._n - 1])
+        index.version = self._version
+
+
+def _index_delete(self, keep):
+    """Keep the index up to date before deleting the rows not in keep"""
+    index = self._index
+    if index is not None and index.version == self._version:
+        index.delete(self._coords[:self._n], keep)
+        index.version = self._version + 1
+
+
+def _matches(self, element):
+    """
+    Return the indices of the atoms equal to element
+
+    Equality has the same meaning as Atom.__eq__ but is evaluated for the whole
+    Mol at once.
+
+    """
+    pos = np.array([element.x, element.y, element.z], dtype=float)
+    index = self._atom_index(1e-5)
+    if index is None:
+        rows = np.arange(self._n)
+    else:
+        rows = index.candidates(pos)
+    dist2 = np.sum(np.square(self._coords[rows] - pos), axis=1)
+    mask = (self._elem_idx[rows] == element.elem_index) & \
+        (dist2 < 1e-10) & (self._charges[rows] - element.q < 1e-5)
+    return rows[mask]
+
+
+def close_indices(self, atom, thresh=0.001):
+    """
+    Return the indices of the atoms very close to an atom
+
+    The test is the same as Atom.very_close, regardless of element or charge.
+
+    Parameters
+    ----------
+    atom : Atom object
+        The atom to look for
+    thresh : float
+        Largest difference allowed in each Cartesian coordinate
+    Returns
+    -------
+    indices : numpy array of ints
+        The increasing indices of the atoms very close to atom
+
+    """
+    pos = np.array([atom.x, atom.y, atom.z], dtype=float)
+    index = self._atom_index(thresh)
+    if index is None:
+        rows = np.arange(self._n)
+    else:
+        rows = index.candidates(pos)
+    close = np.all(np.abs(self._coords[rows] - pos) < thresh, axis=1)
+    return rows[close]
+
+
+def _close_pairs(self, thresh=0.001, periodic=False):
+    """
+    Return all pairs of atoms very close to each other
+
+    The test is the same as Atom.very_close, each Cartesian coordinate differing
+    by less than thresh, and the pairs are found with a KD-tree.
+
+    Parameters
+    ----------
+    thresh : float
+        Largest difference allowed in each Cartesian coordinate
+    periodic : bool
+        If True, also compare the atoms to the images of the others through the
+        lattice vectors, such as atoms on opposite faces of the cell
+    Returns
+    -------
+    rows, cols : numpy arrays of ints
+        Atom rows[k] is very close to atom cols[k], with rows[k] < cols[k].
+        Each pair appears once, sorted by cols and then rows
+
+    """
+    coords = self._coords[:self._n]
+    if self._n == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    if periodic:
+        lattice = self.lattice
+        in_cell = lattice.wrap(coords, reduced=True)
+        # the box of half-edge thresh fits in a sphere of thresh * sqrt(3)
+        translations = lattice.images_within(thresh * np.sqrt(3))[1]
+        # only the images which can be close to the atoms in the cell, which
+        # are those near its faces for the translations other than zero
+        low = np.min(in_cell, axis=0) - thresh
+        high = np.max(in_cell, axis=0) + thresh
+        image_idx, images = [], []
+        for translation in translations:
+            moved = in_cell + translation
+            near = np.flatnonzero(np.all((moved >= low) & (moved <= high), axis=1))
+            image_idx.append(near)
+            images.append(moved[near])
+        image_idx = np.concatenate(image_idx)
+        close = cKDTree(in_cell).sparse_distance_matrix(
+            cKDTree(np.concatenate(images)), thresh, p=np.inf, output_type='ndarray')
+        rows = close['i']
+        cols = image_idx[close['j']]
+        dists = close['v']
+    else:
+        close = cKDTree(coords).sparse_distance_matrix(
+            cKDTree(coords), thresh, p=np.inf, output_type='ndarray')
+        rows, cols, dists = close['i'], close['j'], close['v']
+    # strictly closer than thresh, as in very_close, and each pair once
+    close = (dists < thresh) & (rows < cols)
+    pairs = np.unique(np.column_stack((cols[close], rows[close])), axis=0)
+    return pairs[:, 1], pairs[:, 0]
@@ -1,62 +1,114 @@
-from copy import deepcopy
+import numpy as np
 
 # list-like behaviour
 
 
 def append(self, element):
-    self.atoms.append(element)
+    self._append_atom(element)
 
 
 def extend(self, other_mol):
-    self.atoms.extend(other_mol.atoms)
+    import fromage.utils.mol as mol_init
+    if isinstance(other_mol, mol_init.Mol):
+        self._append_rows(other_mol)
+    else:
+        for atom in other_mol:
+            self._append_atom(atom)
 
 
 def insert(self, i, element):
-    self.atoms.insert(i, element)
+    n = self._n
+    # same index clipping as list.insert
+    if i < 0:
+        i = max(i + n, 0)
+    i = min(i, n)
+    self._append_atom(element)
+    if i == n:
+        return
+    # rotate the new last row into position i
+    order = np.concatenate((np.arange(i), [n], np.arange(i, n)))
+    for name, dtype, shape in self._columns:
+        arr = getattr(self, name)
+        arr[:n + 1] = arr[order]
+    self._views.insert(i, self._views.pop())
+    for j in range(i, n + 1):
+        if self._views[j] is not None:
+            self._views[j]._idx = j
+    self._touch()
 
 
 def remove(self, element):
-    self.atoms.remove(element)
+    self._delete_rows([self.index(element)])
 
 
 def index(self, element):
-    return self.atoms.index(element)
+    matches = self._matches(element)
+    if len(matches) == 0:
+        raise ValueError(str(element) + " is not in Mol")
+    return int(matches[0])
 
 
 def pop(self, i=-1):
-    return self.atoms.pop(i)
+    atom = self._view(i)
+    self._delete_rows([atom._idx])
+    return atom
 
 
 def clear(self):
-    self.atoms.clear()
+    self._detach_views()
+    self._alloc(0)
 
 
 def count(self, element):
-    return self.atoms.count()
+    return len(self._matches(element))
 
 
 def __add__(self, other_mol):
     import fromage.utils.mol as mol_init
     mol_init.try_ismol(other_mol)
-    return mol_init.Mol(deepcopy(self).atoms + other_mol.atoms, vectors=self.vectors, bonding=self.bonding, thresh=self.thresh)
+    out_mol = mol_init.Mol([], vectors=self.vectors, bonding=self.bonding, thresh=self.thresh)
+    out_mol._append_rows(self)
+    out_mol._append_rows(other_mol)
+    return out_mol
 
 
 def __len__(self):
-    return len(self.atoms)
+    return self._n
 
 
 def __eq__(self, other):
     return self.atoms == other.atoms
 
 
+def __iter__(self):
+    # like a list iterator, keep going if atoms are added during iteration
+    i = 0
+    while i < self._n:
+        yield self._view(i)
+        i += 1
+
+
 def __getitem__(self, index):
-    return self.atoms[index]
+    if isinstance(index, slice):
+        return [self._view(i) for i in range(*index.indices(self._n))]
+    return self._view(index)
 
 
 def __setitem__(self, index, value):
-    self.atoms[index] = value
+    old_atom = self._view(index)
+    if old_atom is value:
+        return
+    i = old_atom._idx
+    old_atom._detach()
+    self._set_row(i, value)
+    if value._mol is None:
+        value._mol = self
+        value._idx = i
+        self._views[i] = value
+    else:
+        self._views[i] = None
     return
 
 
 def __contains__(self, elem):
-    return self.atoms.__contains__(elem)
+    return len(self._matches(elem)) > 0
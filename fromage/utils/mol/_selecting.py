@@ -1,4 +1,115 @@
-from copy import deepcopy
+import numpy as np
+from scipy.sparse.csgraph import connected_components
+
+
+def _bfs_order(graph, labels, natoms=0, offsets=None, visited=None):
+    """
+    Return the atoms connected to the labels in breadth-first order
+
+    Within each wave, the atoms are added in the order of the atoms of the
+    previous wave and then by increasing index, like a search over the atoms
+    of the Mol would.
+
+    Parameters
+    ----------
+    graph : scipy.sparse.csr_matrix
+        Adjacency matrix with sorted column indices
+    labels : list of ints
+        The starting atoms
+    natoms : int (optional)
+        Stop when this amount of atoms has been found
+    offsets : Nbonds x 3 numpy array of ints (optional)
+        Lattice image offsets of the bonds, aligned with graph.indices. If
+        given, follow the bonds through the lattice and return the image of
+        each atom which makes the molecules whole
+    visited : numpy array of bools (optional)
+        Atoms which should not be visited. Updated in place
+    Returns
+    -------
+    order : list of ints
+        The indices of the connected atoms, starting with the labels
+    images : len(order) x 3 numpy array of ints
+        The number of lattice vectors by which each atom of order should be
+        translated. Zero if no offsets are given
+
+    """
+    indptr = graph.indptr
+    indices = graph.indices
+    if visited is None:
+        visited = np.zeros(graph.shape[0], dtype=bool)
+    visited[labels] = True
+    order = list(labels)
+    # image of each atom found so far, by atom index
+    atom_images = {label: np.zeros(3, dtype=int) for label in labels}
+    wave = order
+    while wave and not (natoms and len(order) >= natoms):
+        new_wave = []
+        for old in wave:
+            for k in range(indptr[old], indptr[old + 1]):
+                candidate = indices[k]
+                if not visited[candidate]:
+                    visited[candidate] = True
+                    new_wave.append(candidate)
+                    order.append(candidate)
+                    if offsets is not None:
+                        atom_images[candidate] = atom_images[old] + offsets[k]
+                    if natoms and len(order) == natoms:
+                        break
+            if natoms and len(order) >= natoms:
+                break
+        wave = new_wave
+    if offsets is None:
+        images = np.zeros((len(order), 3), dtype=int)
+    else:
+        images = np.array([atom_images[i] for i in order], dtype=int).reshape(-1, 3)
+    return order, images
+
+
+def _bfs_forest(graph, starts):
+    """
+    Return the atoms connected to each start in breadth-first order
+
+    The atoms reached from each start are in the order _bfs_order would give
+    them. All searches advance one wave at a time together, so the starts must
+    belong to different connected components.
+
+    Parameters
+    ----------
+    graph : scipy.sparse.csr_matrix
+        Adjacency matrix with sorted column indices
+    starts : numpy array of ints
+        The atom from which each search begins
+    Returns
+    -------
+    order : numpy array of ints
+        The atoms found from the first start, then from the second and so on
+
+    """
+    indptr = graph.indptr
+    indices = graph.indices
+    starts = np.asarray(starts, dtype=int)
+    # the start from which each atom was reached
+    owners = np.full(graph.shape[0], -1)
+    owners[starts] = np.arange(len(starts))
+    waves = [starts]
+    wave = starts
+    while len(wave):
+        # the neighbours of each atom of the wave, one atom after the other
+        counts = indptr[wave + 1] - indptr[wave]
+        ends = np.cumsum(counts)
+        positions = np.arange(ends[-1]) + np.repeat(indptr[wave] - ends + counts, counts)
+        candidates = indices[positions]
+        from_owners = np.repeat(owners[wave], counts)
+        new = owners[candidates] < 0
+        candidates, from_owners = candidates[new], from_owners[new]
+        # each atom is added the first time it is encountered
+        first = np.sort(np.unique(candidates, return_index=True)[1])
+        wave = candidates[first]
+        owners[wave] = from_owners[first]
+        waves.append(wave)
+    order = np.concatenate(waves)
+    return order[np.argsort(owners[order], kind='stable')]
+
 
 def select(self, labels, natoms = 0):
     """
@@ -13,16 +124,13 @@ def select(self, labels, natoms = 0):
     label : int or list of ints
         The number of the atoms from which the molecule(s) is(are) generated.
     natoms : int (optional)
-        Selecting from a large Mol can be slow. Specifying the expected number
-        of atoms can help speed up the process.
+        Stop the selection once this number of atoms has been selected.
     Returns
     -------
     selected : Mol object
         The selected molecule
 
     """
-    import fromage.utils.mol as mol_init
-
     # make sure that labels is a list
     if isinstance(labels, int):
         labels = [labels]
@@ -31,32 +139,8 @@ def select(self, labels, natoms = 0):
     if len(labels) > len(set(labels)):
         raise TypeError("Some labels are repeated")
 
-    selected = self.copy()
-
-    # initialise the selection using the input labels
-    selected.atoms = deepcopy([self[i] for i in labels])
-    old_atoms = selected.copy()
-
-    # while there are atoms to add
-    cont = True
-    while cont:
-        cont = False
-        # new batch of atoms to add
-        new_atoms = mol_init.Mol([])
-        for old in old_atoms:
-            for candidate in self:
-                if self.bonded(old, candidate):
-                    if candidate not in selected:
-                        new_atoms.append(candidate)
-                        selected.append(candidate)
-                        if natoms:
-                            current_natoms = len(selected)
-                            if current_natoms == natoms:
-                                return selected
-                            if current_natoms > natoms:
-                                raise ValueError("There is inconsistenty in the amount of atoms in the molecule")
-                        cont = True  # an atom was added so continue loop
-        old_atoms = new_atoms
+    order = _bfs_order(self.bond_graph(), labels, natoms=natoms)[0]
+    selected = self.sub_mol(order)
     return selected
 
 
@@ -82,8 +166,6 @@ def per_select(self, labels, old_pos=False):
         translations
 
     """
-    import fromage.utils.mol as mol_init
-
     # Make sure that labels is a list
     if isinstance(labels, int):
         labels = [labels]
@@ -92,42 +174,18 @@ def per_select(self, labels, old_pos=False):
     if len(labels) > len(set(labels)):
         raise TypeError("Some labels are repeated")
 
+    # one traversal of the periodic bond graph gives each atom of the
+    # molecules and the lattice image which makes them whole
+    graph, offsets = self._bonds(True)
+    order, images = _bfs_order(graph, labels, offsets=offsets)
+
     # Mol of selected atoms from the unit cell
-    selected_old = self.copy()
-    selected_old.atoms = [self[i] for i in labels]
+    selected_old = self.sub_mol(order)
 
     # Mol of selected atoms where the periodic image
     # atoms are translated back to form a molecule
-    selected_img = selected_old.copy()
-
-    remaining = self.copy()
-    for atom in selected_old:
-        if atom in remaining:
-            remaining.remove(atom)
-
-    old_atoms = selected_old.copy()
-
-    # While there are atoms to add
-    cont = True
-    while cont == True:
-        cont = False
-        new_atoms = mol_init.Mol([])
-        for old in old_atoms:
-            tmp_remaining = remaining.copy()
-            for rem in remaining:
-                # contains the distance from the point or image and the
-                # coordinates of the point or image
-                dist, per_img = old.per_dist(
-                    rem, self.vectors, ref=self.bonding, new_pos=True)
-                # if the atom is close enough to be part of the molecule
-                if dist <= self.thresh:
-                    new_atoms.append(per_img)
-                    selected_old.append(rem)
-                    selected_img.append(per_img)
-                    tmp_remaining.remove(rem)
-                    cont = True  # An atom was added so continue loop
-            remaining = tmp_remaining
-            old_atoms = new_atoms
+    selected_img = self.sub_mol(order)
+    selected_img._shift_coords(np.dot(images, self.vectors))
 
     if old_pos:
         return selected_img, selected_old
@@ -135,29 +193,78 @@ def per_select(self, labels, old_pos=False):
         return selected_img
 
 
+def molecule_labels(self, periodic=False):
+    """
+    Label each atom with the molecule it belongs to
+
+    The molecules are the connected components of the bond graph, found in one
+    pass over it.
+
+    Parameters
+    ----------
+    periodic : bool (optional)
+        If True, atoms are also bonded through the lattice vectors
+    Returns
+    -------
+    n_mols : int
+        The number of molecules
+    labels : numpy array of ints
+        The molecule label of each atom. Molecules are numbered in the order of
+        their first atom
+
+    """
+    if len(self) == 0:
+        return 0, np.zeros(0, dtype=int)
+    n_mols, raw_labels = connected_components(self.bond_graph(periodic=periodic), directed=False)
+    # renumber the molecules in the order of their first atom
+    first_atoms = np.unique(raw_labels, return_index=True)[1]
+    rank = np.empty(n_mols, dtype=int)
+    rank[np.argsort(first_atoms)] = np.arange(n_mols)
+    labels = rank[raw_labels]
+    return n_mols, labels
+
+
+def molecule_indices(self, periodic=False):
+    """
+    Return the indices of the atoms of each molecule
+
+    Parameters
+    ----------
+    periodic : bool (optional)
+        If True, atoms are also bonded through the lattice vectors
+    Returns
+    -------
+    indices : list of numpy arrays of ints
+        The increasing atom indices of each molecule, with molecules ordered as
+        in molecule_labels
+
+    """
+    n_mols, labels = self.molecule_labels(periodic=periodic)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.cumsum(np.bincount(labels, minlength=n_mols))[:-1]
+    indices = np.split(order, bounds) if n_mols else []
+    return indices
+
+
 def segregate(self, diff_mols = True):
     """
     Separate current Mol in a list of Mols of different molecules
 
+    The molecules are in the order of their first atom and each one has its
+    atoms in the order select gives from that atom.
+
     Parameters
     ----------
     diff_mols : bool (optional)
-        If all molecules are of the same length, turn this off for a boost in
-        speed.
+        Kept for compatibility. The molecules no longer need to be of the same
+        length for a boost in speed.
 
     """
-    molecules = []  # list of molecules
-    remaining = self.copy()
-
-    natoms_current = 0
-    while len(remaining) > 0:
-        molecule = remaining.select(0, natoms = natoms_current)
-        # diff_mols = True means use slow algorithm
-        if diff_mols:
-            natoms_current = 0
-        else:
-            natoms_current = len(molecule)
-        molecules.append(molecule)
-        for atom in molecule:
-            remaining.remove(atom)
+    n_mols, labels = self.molecule_labels()
+    if n_mols == 0:
+        return []
+    first_atoms = np.unique(labels, return_index=True)[1]
+    order = _bfs_forest(self.bond_graph(), first_atoms)
+    bounds = np.cumsum(np.bincount(labels, minlength=n_mols))[:-1]
+    molecules = [self.sub_mol(mol_order) for mol_order in np.split(order, bounds)]
     return molecules
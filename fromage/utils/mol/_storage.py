@@ -0,0 +1,343 @@
+"""Array storage behind Mol
+
+The data of the atoms of a Mol lives in contiguous numpy arrays with one row per
+atom. Atom objects obtained by indexing or iterating over a Mol are views of
+these rows. They are only made when requested and are kept in self._views so
+that asking twice for the same atom returns the same object. The arrays have
+spare capacity such that appending atoms one by one stays cheap.
+
+"""
+import numpy as np
+
+from fromage.utils import per_table as per
+from fromage.utils.atom import Atom
+
+# name of each per-atom array, its dtype and the shape of one row
+columns = (("_coords", float, (3,)),
+           ("_charges", float, ()),
+           ("_es", float, ()),
+           ("_elem_idx", int, ()),
+           ("_elems", object, ()),
+           ("_nums", int, ()),
+           ("_connectivity", object, ()),
+           ("_kinds", object, ()))
+
+
+def _alloc(self, capacity=0):
+    """Discard the current atoms and make room for capacity atoms"""
+    for name, dtype, shape in columns:
+        if dtype is object:
+            setattr(self, name, np.empty((capacity,) + shape, dtype=object))
+        else:
+            setattr(self, name, np.zeros((capacity,) + shape, dtype=dtype))
+    self._n = 0
+    self._views = []
+    self._touch()
+    return
+
+
+def _reserve(self, n_new):
+    """Make sure that n_new more atoms fit in the arrays"""
+    needed = self._n + n_new
+    capacity = len(self._coords)
+    if needed <= capacity:
+        return
+    new_capacity = max(needed, 2 * capacity, 8)
+    for name, dtype, shape in columns:
+        old_arr = getattr(self, name)
+        if dtype is object:
+            new_arr = np.empty((new_capacity,) + shape, dtype=object)
+        else:
+            new_arr = np.zeros((new_capacity,) + shape, dtype=dtype)
+        new_arr[:self._n] = old_arr[:self._n]
+        setattr(self, name, new_arr)
+    return
+
+
+def _set_row(self, i, atom):
+    """Write the data of an Atom in row i"""
+    self._coords[i] = (atom.x, atom.y, atom.z)
+    self._charges[i] = atom.q
+    self._es[i] = atom.es
+    self._elem_idx[i] = atom.elem_index
+    self._elems[i] = atom.elem
+    self._nums[i] = atom.num
+    self._connectivity[i] = atom.connectivity
+    self._kinds[i] = atom.kind
+    self._touch()
+    return
+
+
+def _append_atom(self, atom):
+    """
+    Add an Atom at the end of the arrays
+
+    A free Atom becomes a view of the new row. An Atom which is already a view
+    of a Mol stays so and its data is copied instead.
+
+    """
+    self._reserve(1)
+    i = self._n
+    self._set_row(i, atom)
+    self._n += 1
+    self._index_append()
+    if atom._mol is None:
+        atom._mol = self
+        atom._idx = i
+        self._views.append(atom)
+    else:
+        self._views.append(None)
+    return
+
+
+def _append_rows(self, other, indices=None):
+    """
+    Copy rows of another Mol at the end of the arrays
+
+    Parameters
+    ----------
+    other : Mol object
+        The Mol whose rows are copied. Can be self
+    indices : array-like of ints or None
+        The rows to copy. If None, copy all rows
+
+    """
+    if indices is None:
+        indices = np.arange(other._n)
+    else:
+        indices = np.asarray(indices, dtype=int).reshape(-1)
+    n_new = len(indices)
+    self._reserve(n_new)
+    start = self._n
+    for name, dtype, shape in columns:
+        getattr(self, name)[start:start + n_new] = getattr(other, name)[indices]
+    self._n += n_new
+    self._views.extend([None] * n_new)
+    self._touch()
+    return
+
+
+def _append_images(self, other, translations):
+    """
+    Copy all rows of another Mol at the end of the arrays once per translation
+
+    The copies are made with one broadcast per array rather than one copy at a
+    time.
+
+    Parameters
+    ----------
+    other : Mol object
+        The Mol whose rows are copied. Can be self
+    translations : Nimages x 3 array-like
+        The coordinates of the k-th copy are translated by translations[k]
+
+    """
+    translations = np.asarray(translations, dtype=float).reshape(-1, 3)
+    n_other = other._n
+    n_new = len(translations) * n_other
+    self._reserve(n_new)
+    start = self._n
+    for name, dtype, shape in columns:
+        block = getattr(other, name)[:n_other]
+        getattr(self, name)[start:start + n_new] = np.tile(block, (len(translations),) + (1,) * len(shape))
+    images = self._coords[start:start + n_new].reshape(len(translations), n_other, 3)
+    images += translations[:, np.newaxis, :]
+    self._n += n_new
+    self._views.extend([None] * n_new)
+    self._touch()
+    return
+
+
+def _delete_rows(self, indices):
+    """Delete rows from the arrays, freeing the Atoms viewing them"""
+    keep = np.ones(self._n, dtype=bool)
+    keep[indices] = False
+    n_kept = np.count_nonzero(keep)
+    self._index_delete(keep)
+    for view, kept in zip(self._views, keep):
+        if view is not None and not kept:
+            view._detach()
+    for name, dtype, shape in columns:
+        arr = getattr(self, name)
+        arr[:n_kept] = arr[:self._n][keep]
+        # release references held by the object arrays
+        if dtype is object:
+            arr[n_kept:self._n] = None
+    self._views = [view for view, kept in zip(self._views, keep) if kept]
+    self._n = n_kept
+    for i, view in enumerate(self._views):
+        if view is not None:
+            view._idx = i
+    self._touch()
+    return
+
+
+def _set_coords(self, coords, start=0):
+    """Overwrite the positions of consecutive atoms and update the version"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    self._coords[start:start + len(coords)] = coords
+    self._touch()
+    return
+
+
+def _shift_coords(self, translations, start=0):
+    """Translate consecutive atoms by one vector each and update the version"""
+    translations = np.asarray(translations, dtype=float).reshape(-1, 3)
+    self._coords[start:start + len(translations)] += translations
+    self._touch()
+    return
+
+
+def _detach_views(self):
+    """Free all of the Atoms viewing the arrays"""
+    for view in self._views:
+        if view is not None:
+            view._detach()
+    self._views = [None] * self._n
+    return
+
+
+def _view(self, i):
+    """Return the Atom viewing row i"""
+    if i < 0:
+        i += self._n
+    if not 0 <= i < self._n:
+        raise IndexError("Mol index out of range")
+    view = self._views[i]
+    if view is None:
+        view = Atom._view_of(self, i)
+        self._views[i] = view
+    return view
+
+
+def _get_atoms(self):
+    return [self._view(i) for i in range(self._n)]
+
+
+def _set_atoms(self, in_atoms):
+    # the new atoms could be views of self so free them first
+    in_atoms = list(in_atoms)
+    self._detach_views()
+    self._alloc(len(in_atoms))
+    for atom in in_atoms:
+        self._append_atom(atom)
+    return
+
+
+atoms = property(_get_atoms, _set_atoms, doc="List of the Atoms of the Mol")
+
+
+@property
+def coords(self):
+    """Read-only N x 3 numpy array view of the atomic coordinates"""
+    out_arr = self._coords[:self._n].view()
+    out_arr.flags.writeable = False
+    return out_arr
+
+
+@property
+def elem_indices(self):
+    """Read-only array of the indices of the elements in per_table"""
+    out_arr = self._elem_idx[:self._n].view()
+    out_arr.flags.writeable = False
+    return out_arr
+
+
+def radii(self, ref='dis'):
+    """
+    Return the radii of all atoms according to a distance reference
+
+    Parameters
+    ----------
+    ref : str
+        'dis', 'cov' or 'vdw' respectively for no radius, covalent radius or
+        van der Waals radius
+    Returns
+    -------
+    radii_arr : numpy array of length Nat
+        The radius of each atom in Angstrom
+
+    """
+    if ref == 'dis':
+        radii_arr = np.zeros(self._n)
+    elif ref == 'cov':
+        radii_arr = per.cov_radii[self._elem_idx[:self._n]]
+    elif ref == 'vdw':
+        radii_arr = per.vdw_radii[self._elem_idx[:self._n]]
+    else:
+        raise TypeError("Unrecognised distance reference: " + str(ref))
+    return radii_arr
+
+
+def from_arrays(cls, elems, coords, charges=None, vectors=np.zeros((3, 3)), bonding='dis', thresh=1.8):
+    """
+    Build a Mol directly from arrays, without making Atom objects
+
+    Parameters
+    ----------
+    elems : array-like of str
+        Element symbol of each atom
+    coords : Nat x 3 array-like
+        Cartesian coordinates of each atom
+    charges : array-like of floats (optional)
+        Partial charge of each atom. Zero if not supplied
+    vectors : 3 x 3 numpy array
+        Lattice vectors of the unit cell
+    bonding : str
+        The method for detecting bonding, see Mol
+    thresh : float
+        Threshold for the bonding detection
+    Returns
+    -------
+    out_mol : Mol object
+        Mol with the corresponding atoms
+
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    n_at = len(coords)
+    elems = np.asarray(elems, dtype=object).reshape(-1)
+    if len(elems) != n_at:
+        raise ValueError("There are " + str(len(elems)) + " elements for " +
+                         str(n_at) + " positions")
+
+    out_mol = cls([], vectors=vectors, bonding=bonding, thresh=thresh)
+    out_mol._alloc(n_at)
+    out_mol._coords[:] = coords
+    if charges is not None:
+        out_mol._charges[:] = charges
+    out_mol._elems[:] = elems
+    # only look up each different element once
+    if n_at:
+        uniq, inverse = np.unique(elems.astype(str), return_inverse=True)
+        uniq_idx = np.array([per.element(i).index for i in uniq])
+        out_mol._elem_idx[:] = uniq_idx[inverse.reshape(-1)]
+    out_mol._nums[:] = 1
+    out_mol._n = n_at
+    out_mol._views = [None] * n_at
+    return out_mol
+
+
+def sub_mol(self, indices):
+    """
+    Return a new Mol made of some of the atoms of this one
+
+    The new Mol shares the lattice vectors and bonding settings but the atomic
+    data is copied.
+
+    Parameters
+    ----------
+    indices : array-like of ints or bools
+        The indices of the atoms to keep or a boolean mask
+    Returns
+    -------
+    out_mol : Mol object
+        The atoms at the requested indices in the requested order
+
+    """
+    indices = np.asarray(indices)
+    if indices.dtype == bool:
+        indices = np.flatnonzero(indices)
+    out_mol = self.__class__([], vectors=self.vectors, bonding=self.bonding,
+                             thresh=self.thresh)
+    out_mol._append_rows(self, indices)
+    return out_mol
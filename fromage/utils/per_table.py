@@ -1,6 +1,8 @@
 """
 This module contains the information from the periodic table
 """
+import numpy as np
+from collections import namedtuple
 
 # This list is for reverse searching e.g. having the atomic number but not the
 # symbol. The format is:
@@ -30,6 +32,51 @@ for atom in periodic_list:
             "vdw" : atom[5],
             "mass" : atom[6]}
 
+# The same data as arrays indexed like periodic_list. Mol objects keep an
+# array of element indices which can be used with these to look up the
+# properties of all of their atoms at once
+elem_index = {}
+for i, atom in enumerate(periodic_list):
+    elem_index[atom[0]] = i
+
+at_nums = np.array([atom[2] for atom in periodic_list])
+valence_es = np.array([atom[3] for atom in periodic_list])
+cov_radii = np.array([atom[4] for atom in periodic_list])
+vdw_radii = np.array([atom[5] for atom in periodic_list])
+masses = np.array([atom[6] for atom in periodic_list])
+
+# One immutable record per element, shared by all atoms of that element
+Element = namedtuple("Element", ["index", "symbol", "at_num", "valence_e", "cov", "vdw", "mass"])
+elements = [Element(i, *atom[1:]) for i, atom in enumerate(periodic_list)]
+
+# symbol as written by the user -> Element record
+_interned = {}
+
+
+def element(symbol):
+    """
+    Return the Element record of a symbol
+
+    The lookup is case insensitive and each new spelling of a symbol is only
+    resolved once.
+
+    Parameters
+    ----------
+    symbol : str
+        Element symbol, e.g. "C", "cu" or "point"
+    Returns
+    -------
+    record : Element namedtuple
+        The data of the element from periodic_list
+
+    """
+    try:
+        return _interned[symbol]
+    except KeyError:
+        record = elements[elem_index[symbol.lower()]]
+        _interned[symbol] = record
+        return record
+
 bohrconv = 1.88973
 
 
@@ -72,10 +72,9 @@ class RunSeq(object):
         else:
             shell_high = self.cell.make_cluster(self.inputs["clust_rad"], central_mol = self.region_1, mode = self.inputs["clust_mode"])
             for atom_i in self.region_1:
-                for atom_j in shell_high:
-                    if atom_i.very_close(atom_j):
-                        shell_high.remove(atom_j)
-                        break
+                close = shell_high.close_indices(atom_i)
+                if len(close) > 0:
+                    shell_high.pop(int(close[0]))
             self.write_out("Outer region generated with " + str(len(shell_high)) + " atoms.\n")
         low_level_pop_mol = rf.mol_from_gauss(self.inputs["low_pop_file"], pop=self.inputs["low_pop_method"])
         shell_low = shell_high.copy()
@@ -0,0 +1,156 @@
+"""Defines the LazySupercell object"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+import fromage.io.edit_file as ef
+
+
+def image_translations(shifts, vectors):
+    """
+    Return the Cartesian translations of integer lattice shifts
+
+    Parameters
+    ----------
+    shifts : Nimages x 3 array-like of ints
+        Translations in units of the lattice vectors
+    vectors : 3 x 3 array-like
+        Lattice vectors as rows
+    Returns
+    -------
+    translations : Nimages x 3 numpy array
+        The corresponding Cartesian translations
+
+    """
+    shifts = np.asarray(shifts).reshape(-1, 3)
+    vectors = np.asarray(vectors, dtype=float)
+    # summed in the same order as a * vec_a + b * vec_b + c * vec_c
+    translations = shifts[:, 0:1] * vectors[0] + shifts[:, 1:2] * vectors[1] \
+        + shifts[:, 2:3] * vectors[2]
+    return translations
+
+
+class LazySupercell(object):
+    """
+    Supercell which only stores its primitive cell and the image translations
+
+    The atoms are ordered image by image, as in Mol.supercell, such that atom i
+    of the supercell is atom i % Ncell of the image i // Ncell. They are only
+    made when requested, a few at a time with sub_mol or one image at a time
+    when iterating, which keeps the memory needed for very large supercells at
+    the size of the primitive cell.
+
+    Attributes
+    ----------
+    cell : Mol object
+        Copy of the primitive cell
+    shifts : Nimages x 3 numpy array of ints
+        The translation of each image in units of the lattice vectors of cell
+    translations : Nimages x 3 numpy array
+        The Cartesian translation of each image
+    vectors : 3 x 3 numpy array
+        Lattice vectors of the supercell
+
+    """
+    def __init__(self, cell, shifts, vectors):
+        self.cell = cell.copy()
+        self.shifts = np.asarray(shifts, dtype=int).reshape(-1, 3)
+        self.translations = image_translations(self.shifts, cell.vectors)
+        self.vectors = np.asarray(vectors, dtype=float)
+
+    def __len__(self):
+        return len(self.shifts) * len(self.cell)
+
+    def __iter__(self):
+        for img in range(len(self.shifts)):
+            for atom in self.image(img):
+                yield atom
+
+    def _empty(self):
+        """Return an empty Mol with the properties of the supercell"""
+        out_mol = self.cell.empty_mol()
+        out_mol.vectors = self.vectors.copy()
+        return out_mol
+
+    def image(self, img):
+        """Return the Mol of one translated image of the cell"""
+        return self.sub_mol(np.arange(len(self.cell)) + img * len(self.cell))
+
+    def positions(self, indices):
+        """Return the Cartesian coordinates of atoms of the supercell"""
+        img, at = np.divmod(np.asarray(indices, dtype=int), len(self.cell))
+        return self.cell.coords[at] + self.translations[img]
+
+    def sub_mol(self, indices):
+        """
+        Return a Mol made of some atoms of the supercell
+
+        Parameters
+        ----------
+        indices : array-like of ints or bools
+            Indices of the atoms of the supercell, or a mask over them
+        Returns
+        -------
+        out_mol : Mol object
+            The atoms in the requested order, with the lattice vectors of the
+            supercell
+
+        """
+        indices = np.asarray(indices).reshape(-1)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        img, at = np.divmod(indices.astype(int), len(self.cell))
+        out_mol = self._empty()
+        out_mol._append_rows(self.cell, at)
+        out_mol._shift_coords(self.translations[img])
+        return out_mol
+
+    def indices_within(self, points, radius):
+        """
+        Return the indices of the atoms closer than a radius to some points
+
+        The images are examined one by one and those whose atoms are all too
+        far from the points, according to the sphere enclosing the cell, are
+        skipped.
+
+        Parameters
+        ----------
+        points : N x 3 array-like
+            Cartesian positions
+        radius : float
+            Atoms strictly closer than radius to any of the points are kept
+        Returns
+        -------
+        indices : numpy array of ints
+            The increasing indices of the atoms in the supercell
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        coords = self.cell.coords
+        n_cell = len(coords)
+        if n_cell == 0 or len(points) == 0:
+            return np.zeros(0, dtype=int)
+        tree = cKDTree(points)
+        centre = np.mean(coords, axis=0)
+        cell_rad = np.max(np.linalg.norm(coords - centre, axis=1))
+        # an image can only have atoms within radius if its enclosing sphere
+        # reaches one of the points, with some slack for rounding
+        centre_dists = tree.query(centre + self.translations)[0]
+        candidates = np.flatnonzero(centre_dists - cell_rad < radius + 1e-6)
+        indices = []
+        for img in candidates:
+            dists = tree.query(coords + self.translations[img])[0]
+            indices.append(np.flatnonzero(dists < radius) + img * n_cell)
+        if not indices:
+            return np.zeros(0, dtype=int)
+        return np.concatenate(indices)
+
+    def to_mol(self):
+        """Return the full supercell as a Mol, see Mol.supercell"""
+        out_mol = self._empty()
+        out_mol._append_images(self.cell, self.translations)
+        return out_mol
+
+    def write_xyz(self, name):
+        """Write an xyz file of the supercell, one image at a time"""
+        ef.write_xyz(name, self)
@@ -1,8 +1,160 @@
 import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
 
 import fromage.io.edit_file as ef
+from fromage.utils.lattice import get_lattice
+from fromage.utils.supercell import image_translations
 from copy import deepcopy
 
+# grid points handled at a time when their coordinates have to be made
+_chunk_size = 1 << 16
+
+
+def _atom_arrays(atoms):
+    """Return the positions and vdw radii of a list of Atom objects"""
+    coords = np.array([[atom.x, atom.y, atom.z] for atom in atoms], dtype=float).reshape(-1, 3)
+    vdw = np.array([atom.vdw for atom in atoms], dtype=float)
+    return coords, vdw
+
+
+def _grid_values(in_grid, dimension=None):
+    """Return the values of a CubeGrid, of an N x 4 grid or of a value array"""
+    if isinstance(in_grid, CubeGrid):
+        values = in_grid._flat_values()
+    else:
+        in_grid = np.asarray(in_grid)
+        if in_grid.ndim == 2 and in_grid.shape[1] == 4:
+            values = in_grid[:, 3]
+        else:
+            values = in_grid.reshape(-1)
+    if dimension is not None and len(values) != dimension:
+        raise ValueError("The grid has " + str(len(values)) + " points instead of " +
+                         str(dimension))
+    return values
+
+
+def stamp_spheres(values, origin, vectors, centres, radii, fill=1):
+    """
+    Set the voxels of a grid inside any of a set of spheres
+
+    For each sphere, only the box of voxel indices which the sphere can reach
+    is looked at, so the cost follows the volume of the spheres rather than
+    that of the grid.
+
+    Parameters
+    ----------
+    values : x_num x y_num x z_num numpy array
+        Values of the grid in the cube file order, modified in place
+    origin : numpy array of length 3
+        Position of the first voxel
+    vectors : 3x3 numpy array
+        The three vectors defining the shape of one voxel
+    centres : N x 3 numpy array
+        Centres of the spheres
+    radii : numpy array of N floats
+        Radii of the spheres. Voxels strictly closer than the radius are inside
+    fill : float (optional)
+        Value given to the voxels inside the spheres. Default 1
+
+    """
+    centres = np.asarray(centres, dtype=float).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=float).reshape(-1)
+    shape = np.array(values.shape)
+    inv_vectors = np.linalg.inv(vectors)
+    # a sphere spans radius times this many voxels along each index
+    reach = np.linalg.norm(inv_vectors, axis=0)
+    frac = np.dot(centres - origin, inv_vectors)
+    low = np.maximum(np.floor(frac - radii[:, np.newaxis] * reach), 0).astype(int)
+    high = np.minimum(np.ceil(frac + radii[:, np.newaxis] * reach), shape - 1).astype(int)
+    for centre, radius, lo, hi in zip(centres, radii, low, high):
+        if np.any(hi < lo):
+            continue
+        box = tuple(slice(lo[i], hi[i] + 1) for i in range(3))
+        indices = np.indices(hi - lo + 1).reshape(3, -1).T + lo
+        coords = np.dot(indices, vectors) + origin
+        inside = np.sum((coords - centre)**2, axis=1) < radius**2
+        values[box][inside.reshape(hi - lo + 1)] = fill
+    return
+
+
+class NearestAtoms(object):
+    """
+    Find the atom closest to each of many points with a KD-tree of the atoms
+
+    With radii, the distance of a point to an atom is divided by the radius of
+    the atom, which gives the vdw scaled proximity of CubeGrid.proximity. The
+    closest atoms in plain distance are found with the tree and their number is
+    increased only for the points where an atom farther than all of them could
+    still be closer once scaled, so the answer is exact.
+
+    Attributes
+    ----------
+    coords : N x 3 numpy array
+        Positions of the atoms
+    radii : numpy array of N floats
+        Scaling radius of each atom, all ones if no radii were given
+    tree : cKDTree object
+        KD-tree of the atoms
+
+    """
+
+    def __init__(self, coords, radii=None):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        if radii is None:
+            self.radii = np.ones(len(self.coords))
+        else:
+            self.radii = np.asarray(radii, dtype=float).reshape(-1)
+        self.tree = cKDTree(self.coords)
+
+    def query(self, points, prefer=None, k=8):
+        """
+        Return the closest atom to each point
+
+        Parameters
+        ----------
+        points : M x 3 numpy array
+            The points to assign
+        prefer : numpy array of N bools (optional)
+            Atoms which win ties with the others
+        k : int (optional)
+            Number of atoms first looked at for each point. Default 8
+        Returns
+        -------
+        owners : numpy array of M ints
+            Index of the closest atom to each point, -1 if there are no atoms
+        scaled_dist2 : numpy array of M floats
+            Squared scaled distance of each point to its atom
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        n_at = len(self.coords)
+        owners = np.full(len(points), -1)
+        best = np.full(len(points), np.inf)
+        if not n_at:
+            return owners, best
+        rad2 = self.radii**2
+        max_rad2 = np.max(rad2)
+        todo = np.arange(len(points))
+        k = min(k, n_at)
+        while len(todo):
+            cands = self.tree.query(points[todo], k=k)[1].reshape(len(todo), k)
+            dist2 = np.sum((points[todo, np.newaxis, :] - self.coords[cands])**2, axis=2)
+            scaled = dist2 / rad2[cands]
+            row_best = np.min(scaled, axis=1)
+            ties = scaled == row_best[:, np.newaxis]
+            if prefer is not None:
+                preferred = ties & prefer[cands]
+                ties = np.where(np.any(preferred, axis=1)[:, np.newaxis], preferred, ties)
+            owners[todo] = cands[np.arange(len(todo)), np.argmax(ties, axis=1)]
+            best[todo] = row_best
+            if k == n_at:
+                break
+            # atoms beyond the candidates are at least as far as the last one
+            todo = todo[dist2[:, -1] <= row_best * max_rad2 * (1 + 1e-9)]
+            k = min(4 * k, n_at)
+        return owners, best
+
 
 class CubeGrid(object):
     """
@@ -52,8 +204,46 @@ class CubeGrid(object):
 
         self.dimension = self.x_num * self.y_num * self.z_num
         # initiate grid
+        self._allocate()
+
+    def _allocate(self):
+        """Make an empty grid of the current dimension"""
         self.grid = np.zeros((self.dimension, 4))
 
+    def _flat_values(self):
+        """Return a writeable view of the values in the order of the grid"""
+        return self.grid[:, 3]
+
+    def coord_chunks(self, chunk_size=_chunk_size):
+        """
+        Yield the coordinates of the grid points a chunk at a time
+
+        Parameters
+        ----------
+        chunk_size : int (optional)
+            Largest number of points in a chunk
+        Yields
+        ------
+        points : slice
+            The range of the points of the chunk in the order of the grid
+        coords : N x 3 numpy array
+            The coordinates of the points of the chunk
+
+        """
+        for start in range(0, self.dimension, chunk_size):
+            points = slice(start, min(start + chunk_size, self.dimension))
+            yield points, self.grid[points, :3]
+
+    def to_implicit(self):
+        """
+        Return an ImplicitCubeGrid with the values of this grid
+
+        The grid has to be in the cube file order, see confine_sort.
+
+        """
+        return ImplicitCubeGrid(self.vectors, self.x_num, self.y_num, self.z_num,
+                                self.origin, values=self.grid[:, 3])
+
     def copy(self):
         return deepcopy(self)
 
@@ -64,15 +254,10 @@ class CubeGrid(object):
 
     def set_grid_coord(self):
         """Generate the coordinates of the voxel origins on the grid"""
-
-        count = 0
-        for x_i in np.arange(0, self.x_num):
-            for y_i in np.arange(0, self.y_num):
-                for z_i in np.arange(0, self.z_num):
-                    entry = np.append(
-                        np.dot(self.vectors.T, np.array([x_i, y_i, z_i])) + self.origin, 0)
-                    self.grid[count] = entry
-                    count += 1
+        # voxel indices in the cube order, z changing fastest
+        indices = np.indices((self.x_num, self.y_num, self.z_num)).reshape(3, -1).T
+        self.grid = np.zeros((self.dimension, 4))
+        self.grid[:, :3] = np.dot(indices, self.vectors) + self.origin
         return
 
     def grid_from_point(self, x, y, z, res=10, box=np.array([[20.0, 0.0, 0.0], [0.0, 20.0, 0.0], [0.0, 0.0, 20.0]])):
@@ -95,7 +280,7 @@ class CubeGrid(object):
         self.vectors = box / res
         self.x_num = self.y_num = self.z_num = res
         self.dimension = self.x_num * self.y_num * self.z_num
-        self.grid = np.zeros((self.dimension, 4))
+        self._allocate()
 
         return
 
@@ -115,40 +300,46 @@ class CubeGrid(object):
             The rest of the atoms
 
         """
-        for point in self.grid:
-            close_to_mol = False
-            min_dist2 = float("inf")
-            for atom_i in mol:
-                r = atom_i.c_dist2(*point[:3])
-                if scaled:
-                    r /= atom_i.vdw**2
-                if r < min_dist2:
-                    min_dist2 = r
-                    close_to_mol = True
-            for atom_j in rest:
-                r = atom_j.c_dist2(*point[:3])
-                if scaled:
-                    r /= atom_j.vdw**2
-                if r < min_dist2:
-                    close_to_mol = False
-                    break
-            if close_to_mol:
-                point[3] = 1
-            else:
-                point[3] = 0
+        owners = self.owners(list(mol) + list(rest), scaled=scaled,
+                             prefer=np.arange(len(mol) + len(rest)) < len(mol))
+        self._flat_values()[:] = (owners >= 0) & (owners < len(mol))
 
         return
 
+    def owners(self, atoms, scaled=True, prefer=None):
+        """
+        Return the index of the closest atom to each grid point
+
+        Parameters
+        ----------
+        atoms : list of Atom objects
+            The atoms which share the grid
+        scaled : bool (optional)
+            Divide the distances by the vdw radii of the atoms. Default True
+        prefer : numpy array of bools (optional)
+            Atoms which win ties with the others
+        Returns
+        -------
+        owners : numpy array of ints
+            Index of the closest atom to each point in the order of the grid,
+            -1 if there are no atoms
+
+        """
+        coords, vdw = _atom_arrays(atoms)
+        engine = NearestAtoms(coords, vdw if scaled else None)
+        owners = np.full(self.dimension, -1)
+        for points, chunk in self.coord_chunks():
+            owners[points] = engine.query(chunk, prefer=prefer)[0]
+        return owners
+
     def vdw_vol(self, mol):
         """Give each point in the grid a value of 1 if it is inside the vdw radius of one of the atoms in the molecule"""
 
-        for point in self.grid:
-            # empty grid first
-            point[3] = 0
-            for atom in mol:
-                if atom.c_dist2(*point[:3]) < atom.vdw**2:
-                    point[3] = 1
-                    break
+        coords_at, vdw = _atom_arrays(mol)
+        values = self._flat_values()
+        for points, coords in self.coord_chunks():
+            inside = cdist(coords, coords_at, 'sqeuclidean') < vdw**2
+            values[points] = np.any(inside, axis=1)
         return
 
     def subtract_grid(self, in_grid):
@@ -157,13 +348,11 @@ class CubeGrid(object):
 
         Parameters
         ----------
-        in_grid : numpy N x 4 array
-            Same dimensions as self.grid
+        in_grid : CubeGrid object, numpy N x 4 array or array of values
+            Same dimensions as self.grid, in the same order
 
         """
-
-        for i, j in zip(self.grid, in_grid):
-            i[3] -= j[3]
+        self._flat_values()[:] -= _grid_values(in_grid, self.dimension)
         return
 
     def add_grid(self, in_grid):
@@ -172,27 +361,23 @@ class CubeGrid(object):
 
         Parameters
         ----------
-        in_grid : numpy N x 4 array
-            Same dimensions as self.grid
+        in_grid : CubeGrid object, numpy N x 4 array or array of values
+            Same dimensions as self.grid, in the same order
 
         """
-
-        for i, j in zip(self.grid, in_grid):
-            i[3] += j[3]
+        self._flat_values()[:] += _grid_values(in_grid, self.dimension)
         return
 
     def out_cube(self, file_name, atoms):
         """Write a cube file with the current state of the grid"""
-        values = np.array([point[3] for point in self.grid])
+        values = self._flat_values()
         ef.write_cube(file_name, self.origin, self.vectors, self.x_num,
                       self.y_num, self.z_num, atoms, values)
         return
 
     def volume(self):
-        filled = 0
-        for entry in self.grid:
-            if entry[3] != 0:
-                filled += 1
+        """Return the volume of the voxels with a non zero value"""
+        filled = np.count_nonzero(self._flat_values())
 
         vox_vol = np.linalg.det(self.vectors)
 
@@ -293,14 +478,10 @@ class CubeGrid(object):
         """
         new_grid = self.grid.copy()
         #new_grid[:, 0:3] -= self.origin
-        lattice_vectors = self.get_enclosing_vectors()
-        # transpose to get the transformation matrix
-        M = np.transpose(lattice_vectors)
-        # inverse transformation matrix
-        U = np.linalg.inv(M)
-        # get a matrix A such that A[i] = U dot self.grid[i] excluding the 4th
-        # column which remains intact.
-        new_grid[:, 0:3] = np.einsum('ij,kj->ki', U, self.grid[:, 0:3])
+        lattice = get_lattice(self.get_enclosing_vectors())
+        # change of basis of all points excluding the 4th column which remains
+        # intact.
+        new_grid[:, 0:3] = lattice.to_frac(self.grid[:, 0:3])
         self.grid = new_grid
         return
 
@@ -421,3 +602,271 @@ class CubeGrid(object):
         super_cub.origin -= center
 
         return super_cub
+
+
+class ImplicitCubeGrid(CubeGrid):
+    """
+    A CubeGrid which only stores the values of its voxels
+
+    The coordinates of the voxels follow from the origin, the voxel vectors and
+    the numbers of voxels, so they are only made when they are needed, a chunk
+    at a time with coord_chunks or in full with the grid attribute. The values
+    are kept as a 3-D array in the cube file order, which means that the grid
+    is always confined and sorted: translations on grid points are rolls of the
+    values and supergrids are tilings of them.
+
+    Attributes
+    ----------
+    vectors : 3x3 numpy array
+        The three vectors defining the shape of one voxel in Angstrom
+    x_num, y_num, z_num : ints
+        Length of the parallelepiped in units of voxels
+    origin : numpy array of length 3
+        Origin of the parallelepiped in Angstrom
+    values : x_num x y_num x z_num numpy array
+        The value of each voxel
+    grid : numpy array of x_num * y_num * z_num * x 4 dimension
+        A new array of the positions and values, see CubeGrid. Setting it sets
+        the values from its last column, which has to be in the cube file order
+
+    """
+
+    def __init__(self, vectors=np.zeros((3, 3)), x_num=1, y_num=1, z_num=1, origin=np.array([0.0, 0.0, 0.0]), values=None):
+        super(ImplicitCubeGrid, self).__init__(vectors, x_num, y_num, z_num, origin)
+        if values is not None:
+            self.values = np.array(values, dtype=float).reshape(self._shape())
+
+    def _shape(self):
+        return (self.x_num, self.y_num, self.z_num)
+
+    def _allocate(self):
+        self.values = np.zeros(self._shape())
+
+    def _flat_values(self):
+        return self.values.reshape(-1)
+
+    @property
+    def grid(self):
+        grid = np.zeros((self.dimension, 4))
+        grid[:, :3] = self.coords()
+        grid[:, 3] = self._flat_values()
+        return grid
+
+    @grid.setter
+    def grid(self, in_grid):
+        self.values = np.array(_grid_values(in_grid, self.dimension), dtype=float).reshape(self._shape())
+
+    def coords(self, start=0, stop=None):
+        """
+        Return the coordinates of a range of voxel origins
+
+        Parameters
+        ----------
+        start, stop : ints (optional)
+            The range of voxels in the cube file order. Default all voxels
+        Returns
+        -------
+        coords : N x 3 numpy array
+            The coordinates of the voxel origins
+
+        """
+        stop = self.dimension if stop is None else stop
+        indices = np.array(np.unravel_index(np.arange(start, stop), self._shape())).T
+        return np.dot(indices, self.vectors) + self.origin
+
+    def coord_chunks(self, chunk_size=_chunk_size):
+        for start in range(0, self.dimension, chunk_size):
+            stop = min(start + chunk_size, self.dimension)
+            yield slice(start, stop), self.coords(start, stop)
+
+    def to_implicit(self):
+        return self.copy()
+
+    def set_grid_coord(self):
+        """Nothing to do, the coordinates are made when needed"""
+        return
+
+    def _voxel_shift(self, trans_vec):
+        """Return a translation in units of voxel vectors"""
+        return np.linalg.solve(self.vectors.T, np.asarray(trans_vec, dtype=float))
+
+    def translate_grid(self, trans_vec):
+        """Translate the grid by moving its origin"""
+        self.origin = self.origin + trans_vec
+        return
+
+    def translate_inplace(self, trans_vec):
+        """
+        Translate the values in the enclosing box by the closest grid vector
+
+        The values leaving the box come back in on the other side
+
+        Parameters
+        ----------
+        trans_vec : 3x1 numpy array
+            The vector by which to translate the grid
+
+        """
+        shift = np.rint(self._voxel_shift(trans_vec)).astype(int)
+        self.values = np.roll(self.values, tuple(shift), axis=(0, 1, 2))
+        return
+
+    def unord_trans_inplace_grid(self, trans_vec):
+        """
+        Get the grid translated inplace, without rounding to grid points
+
+        Like CubeGrid.unord_trans_inplace_grid, the points are translated and
+        wrapped in fractional coordinates of the enclosing box, which starts
+        at zero and not at the origin. The resulting points and values are the
+        same as those of CubeGrid. Since an implicit grid can only describe
+        regular points, they come in the cube file order from the new origin,
+        which is the wrapped point closest to zero, rather than unordered with
+        the old origin kept.
+
+        """
+        fresh_cub = self.copy()
+        # position of the first translated point in units of voxel vectors
+        shift = self._voxel_shift(self.origin + trans_vec)
+        whole = np.floor(shift)
+        fresh_cub.values = np.roll(fresh_cub.values, tuple(whole.astype(int)), axis=(0, 1, 2))
+        fresh_cub.origin = np.dot(shift - whole, self.vectors)
+        return fresh_cub
+
+    def vdw_vol(self, mol):
+        """Give each point in the grid a value of 1 if it is inside the vdw radius of one of the atoms in the molecule"""
+        coords, vdw = _atom_arrays(mol)
+        self.values[...] = 0
+        stamp_spheres(self.values, self.origin, self.vectors, coords, vdw)
+        return
+
+    def supergrid_unsorted(self, trans):
+        """
+        Make a supercell cube out of the original cube grid
+
+        The values of an implicit grid are always sorted, see supergrid
+
+        """
+        return self.supergrid(trans)
+
+    def supergrid(self, trans):
+        """
+        Make a supercell cube out of the original cube grid
+
+        Parameters
+        ----------
+        trans : numpy array of length 3
+            Multiplications of the primitive cell
+
+        """
+        self.values = np.tile(self.values, tuple(trans))
+        self.x_num, self.y_num, self.z_num = self.values.shape
+        self.dimension = self.values.size
+        return self
+
+    def confine_sort(self):
+        """Nothing to do, the grid is always confined and sorted"""
+        return
+
+    def confine_unordered(self):
+        """Nothing to do, the grid is always confined"""
+        return
+
+
+def cell_partition(cell, res=100, scaled=True):
+    """
+    Share the unit cell between its molecules and find where the atoms are
+
+    Every voxel of the cell is given to the molecule of the closest atom of
+    the infinite crystal, in the sense of CubeGrid.proximity, which makes a
+    periodic Voronoi partition of the cell by molecules. The vdw spheres of all
+    atoms and their images are also stamped on a second grid of the cell.
+
+    Parameters
+    ----------
+    cell : Mol object
+        Unit cell with lattice vectors, made of discrete molecules
+    res : int or array-like of 3 ints (optional)
+        Number of voxels along each lattice vector. Default 100
+    scaled : bool (optional)
+        Divide the distances by the vdw radii of the atoms. Default True
+    Returns
+    -------
+    labels_cub : ImplicitCubeGrid object
+        The molecule owning each voxel, numbered as in crystal
+    occupied_cub : ImplicitCubeGrid object
+        1 for the voxels inside a vdw sphere, otherwise 0
+    crystal : MolecularCrystal object
+        The molecules of the cell
+
+    """
+    from fromage.utils.crystal import make_crystal
+
+    crystal = make_crystal(cell)
+    lattice = crystal.lattice
+    nums = np.broadcast_to(np.asarray(res, dtype=int), (3,))
+    vectors = crystal.vectors / nums[:, np.newaxis]
+    labels_cub = ImplicitCubeGrid(vectors, *nums)
+    occupied_cub = ImplicitCubeGrid(vectors, *nums)
+
+    atom_mols = np.zeros(len(cell), dtype=int)
+    for label, atoms in enumerate(crystal.atom_indices):
+        atom_mols[atoms] = label
+    vdw = np.array(crystal.cell.radii('vdw'), dtype=float)
+    radii = vdw if scaled else np.ones(len(cell))
+
+    # the closest atom is always among the images within the scaled distance
+    # of the point to any atom times the largest radius
+    in_cell = lattice.wrap(crystal.cell.coords, reduced=True)
+    cutoff = 2 * np.max(radii)
+    while True:
+        translations = lattice.images_within(cutoff)[1]
+        images = (in_cell[np.newaxis, :, :] + translations[:, np.newaxis, :]).reshape(-1, 3)
+        engine = NearestAtoms(images, np.tile(radii, len(translations)))
+        owners = np.zeros(labels_cub.dimension, dtype=int)
+        reach = 0
+        for points, coords in labels_cub.coord_chunks():
+            chunk_owners, dist2 = engine.query(lattice.wrap(coords, reduced=True))
+            owners[points] = chunk_owners
+            reach = max(reach, np.sqrt(np.max(dist2)) * np.max(radii))
+        if reach <= cutoff:
+            break
+        cutoff = reach
+    labels_cub.values = atom_mols[owners % len(cell)].reshape(nums).astype(float)
+
+    # vdw spheres of the atoms of the cell and of the images touching it
+    in_cell = lattice.wrap(crystal.cell.coords)
+    order = np.floor(np.max(vdw) / lattice.widths).astype(int) + 1
+    translations = image_translations(lattice.image_shifts(order), crystal.vectors)
+    images = (in_cell[np.newaxis, :, :] + translations[:, np.newaxis, :]).reshape(-1, 3)
+    stamp_spheres(occupied_cub.values, occupied_cub.origin, vectors, images,
+                  np.tile(vdw, len(translations)))
+
+    return labels_cub, occupied_cub, crystal
+
+
+def molecule_volumes(labels_cub, occupied_cub, n_mol):
+    """
+    Return the volume of the region of each molecule and of its occupied part
+
+    Parameters
+    ----------
+    labels_cub : CubeGrid object
+        The molecule owning each voxel, see cell_partition
+    occupied_cub : CubeGrid object
+        Non zero for occupied voxels, same grid as labels_cub
+    n_mol : int
+        Number of molecules
+    Returns
+    -------
+    voronoi : numpy array of n_mol floats
+        Volume of the voxels of each molecule
+    occupied : numpy array of n_mol floats
+        Volume of the occupied voxels of each molecule
+
+    """
+    labels = labels_cub._flat_values().astype(int)
+    occupied = _grid_values(occupied_cub, labels_cub.dimension) != 0
+    vox_vol = abs(np.linalg.det(labels_cub.vectors))
+    voronoi = np.bincount(labels, minlength=n_mol) * vox_vol
+    occupied = np.bincount(labels[occupied], minlength=n_mol) * vox_vol
+    return voronoi, occupied